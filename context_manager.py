@@ -1,11 +1,14 @@
 # context_manager.py
 from typing import List, Dict, Any
 import json
+from services.context.app.tokens import IncrementalCounter, get_tokenizer, truncate_to_tokens
 
 class ContextManager:
     def __init__(self, max_tokens: int = 90000):
         self.max_tokens = max_tokens
         self.current_context = ""
+        self.tokenizer = get_tokenizer("claude")
+        self.context_tokens = IncrementalCounter(self.tokenizer)
         self.character_summaries = {}
         self.plot_points = []
         self.themes = []
@@ -15,6 +18,7 @@ class ContextManager:
         """Add new content to context while managing size"""
         # Simple approach: keep full recent content, summarize older content
         self.current_context += f"\n\n{new_content}"
+        self.context_tokens.append(f"\n\n{new_content}")
         self._optimize_context_size()
         
     def add_hidden_note(self, note: str) -> None:
@@ -24,9 +28,7 @@ class ContextManager:
     def _optimize_context_size(self) -> None:
         """Ensure context stays within token limit"""
         # Very simple approach: if too large, keep recent sections and summaries
-        estimated_tokens = len(self.current_context.split()) * 1.3  # Rough estimation
-        
-        if estimated_tokens > self.max_tokens:
+        if self.context_tokens.total > self.max_tokens:
             # Split into sections and keep most recent
             sections = self.current_context.split("\n\n")
             
@@ -34,13 +36,16 @@ class ContextManager:
             preserved = "\n\n".join(sections[-30:])  # Keep most recent sections
             
             # Convert older sections to summaries (in practice, you'd use AI here)
-            self.current_context = (
+            header = (
                 "STORY SUMMARY (EARLIER CHAPTERS):\n" + 
                 "[Summary would be generated here]\n\n" +
                 "CHARACTER INFORMATION:\n" + 
                 json.dumps(self.character_summaries, indent=2) + "\n\n" +
-                "RECENT STORY CONTENT:\n" + preserved
+                "RECENT STORY CONTENT:\n"
             )
+            budget = self.max_tokens - self.tokenizer.count(header)
+            self.current_context = header + truncate_to_tokens(preserved, budget, model="claude")
+            self.context_tokens = IncrementalCounter(self.tokenizer, self.current_context)
             
     def get_full_context(self, include_hidden_notes: bool = True) -> str:
         """Return optimized context for AI prompt"""
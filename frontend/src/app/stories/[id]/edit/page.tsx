@@ -58,7 +58,7 @@ export default function EditPage({ params }: EditPageProps) {
       <Card key={chapter.id}>
         <CardHeader>
           <CardTitle>{chapter.title}</CardTitle>
-          <CardDescription>Chapter {chapter.position}</CardDescription>
+          <CardDescription>Chapter {chapter.number ?? chapter.position}</CardDescription>
         </CardHeader>
         <CardContent className="space-y-4">
           {editor ? (
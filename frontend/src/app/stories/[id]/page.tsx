@@ -9,7 +9,7 @@ import { Dialog, DialogContent, DialogDescription, DialogHeader, DialogTitle, Di
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
 import { Textarea } from '@/components/ui/textarea';
-import { useStory, useStoryChapters, useGenerateChapter, useExportStory } from '@/hooks/useStories';
+import { useStory, useStoryChapterSummaries, useChapter, useGenerateChapter, useExportStory } from '@/hooks/useStories';
 import { ArrowLeft, Plus, BookOpen, Sparkles, Edit, Calendar } from 'lucide-react';
 import Link from 'next/link';
 
@@ -23,7 +23,7 @@ export default function StoryPage({ params }: StoryPageProps) {
   const router = useRouter();
   const [isGenerateDialogOpen, setIsGenerateDialogOpen] = useState(false);
   const [isReadDialogOpen, setIsReadDialogOpen] = useState(false);
-  const [selectedChapter, setSelectedChapter] = useState<any>(null);
+  const [selectedChapterId, setSelectedChapterId] = useState('');
   const [newChapter, setNewChapter] = useState({
     title: '',
     prompt: '',
@@ -31,7 +31,17 @@ export default function StoryPage({ params }: StoryPageProps) {
   });
 
   const { data: story, isLoading: storyLoading, error: storyError } = useStory(params.id);
-  const { data: chapters, isLoading: chaptersLoading } = useStoryChapters(params.id);
+  const {
+    data: chapterPages,
+    isLoading: chaptersLoading,
+    hasNextPage,
+    fetchNextPage,
+    isFetchingNextPage,
+  } = useStoryChapterSummaries(params.id);
+  const chapters = chapterPages?.pages.flatMap((page) => page.chapters);
+  // Bodies are only fetched for the chapter being read
+  const { data: selectedChapter } = useChapter(selectedChapterId);
+  const selectedNumber = chapters?.find((chapter) => chapter.id === selectedChapterId)?.number;
   const generateChapterMutation = useGenerateChapter();
   const exportStoryMutation = useExportStory();
 
@@ -52,7 +62,6 @@ export default function StoryPage({ params }: StoryPageProps) {
         title: newChapter.title,
         prompt: newChapter.prompt,
         system_prompt: newChapter.system_prompt || undefined,
-        position: (chapters?.length || 0) + 1,
       });
       
       setNewChapter({ title: '', prompt: '', system_prompt: '' });
@@ -128,7 +137,7 @@ export default function StoryPage({ params }: StoryPageProps) {
                 <Calendar className="h-4 w-4 mr-1" />
                 {new Date(story.created_at).toLocaleDateString()}
               </div>
-              <span>{chapters?.length || 0} chapters</span>
+              <span>{story.chapter_count ?? chapters?.length ?? 0} chapters</span>
             </div>
             {story.description && (
               <p className="text-muted-foreground mt-2">{story.description}</p>
@@ -225,7 +234,7 @@ export default function StoryPage({ params }: StoryPageProps) {
                         {chapter.title}
                       </CardTitle>
                       <CardDescription className="flex items-center space-x-4 mt-1">
-                        <span>Position: {chapter.position}</span>
+                        <span>Chapter {chapter.number ?? chapter.position}</span>
                         <span>Words: {chapter.word_count}</span>
                         <span>Version: {chapter.version}</span>
                       </CardDescription>
@@ -236,17 +245,12 @@ export default function StoryPage({ params }: StoryPageProps) {
                   </div>
                 </CardHeader>
                 <CardContent>
-                  <div className="prose prose-sm max-w-none">
-                    <p className="text-muted-foreground line-clamp-3">
-                      {chapter.content ? chapter.content.substring(0, 200) + '...' : 'No content available'}
-                    </p>
-                  </div>
-                  <div className="mt-4">
+                  <div>
                     <Button 
                       variant="outline" 
                       size="sm"
                       onClick={() => {
-                        setSelectedChapter(chapter);
+                        setSelectedChapterId(chapter.id);
                         setIsReadDialogOpen(true);
                       }}
                     >
@@ -256,6 +260,13 @@ export default function StoryPage({ params }: StoryPageProps) {
                 </CardContent>
               </Card>
             ))}
+          {hasNextPage && (
+            <div className="flex justify-center">
+              <Button variant="outline" onClick={() => fetchNextPage()} disabled={isFetchingNextPage}>
+                {isFetchingNextPage ? 'Loading...' : 'Load more chapters'}
+              </Button>
+            </div>
+          )}
         </div>
       ) : (
         <div className="flex items-center justify-center py-20">
@@ -279,7 +290,7 @@ export default function StoryPage({ params }: StoryPageProps) {
           <DialogHeader className="flex-shrink-0">
             <DialogTitle>{selectedChapter?.title}</DialogTitle>
             <DialogDescription>
-              Chapter {selectedChapter?.position} • {selectedChapter?.word_count} words
+              Chapter {selectedNumber ?? selectedChapter?.position} • {selectedChapter?.word_count} words
             </DialogDescription>
           </DialogHeader>
           <div className="flex-1 overflow-y-auto mt-4 pr-2">
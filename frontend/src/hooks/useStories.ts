@@ -1,6 +1,6 @@
 // React Query hooks for story management
 
-import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
+import { useInfiniteQuery, useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { api, queryKeys, Story, CreateStoryRequest, Chapter, CreateChapterRequest, GenerateChapterRequest } from '@/lib/api';
 
 // Story hooks
@@ -69,6 +69,17 @@ export function useStoryChapters(storyId: string) {
   });
 }
 
+// Chapter titles and counts without bodies, a page at a time
+export function useStoryChapterSummaries(storyId: string) {
+  return useInfiniteQuery({
+    queryKey: [...queryKeys.storyChapters(storyId), 'summary'],
+    queryFn: ({ pageParam }) => api.getStoryChapterPage(storyId, pageParam),
+    initialPageParam: undefined as string | undefined,
+    getNextPageParam: (lastPage) => lastPage.nextCursor,
+    enabled: !!storyId,
+  });
+}
+
 export function useChapter(id: string) {
   return useQuery({
     queryKey: queryKeys.chapter(id),
@@ -147,6 +158,21 @@ export function useReorderChapters() {
   });
 }
 
+// Move chapter hook
+export function useMoveChapter() {
+  const queryClient = useQueryClient();
+
+  return useMutation({
+    mutationFn: ({ chapterId, afterId }: { storyId: string; chapterId: string; afterId?: string }) =>
+      api.moveChapter(chapterId, afterId),
+    onSuccess: (_, { storyId }) => {
+      queryClient.invalidateQueries({ 
+        queryKey: queryKeys.storyChapters(storyId) 
+      });
+    },
+  });
+}
+
 export function useStoryBranches(storyId: string) {
   return useQuery({
     queryKey: queryKeys.storyBranches(storyId),
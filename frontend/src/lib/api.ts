@@ -4,6 +4,9 @@ export interface Story {
   title: string;
   genre?: string;
   description?: string;
+  chapter_count?: number;
+  word_count?: number;
+  last_modified_at?: string;
   created_at: string;
   updated_at?: string;
   story_metadata?: Record<string, any>;
@@ -22,11 +25,19 @@ export interface Chapter {
   title: string;
   content: string;
   position: number;
+  number?: number;
   word_count: number;
   created_at: string;
   updated_at?: string;
 }
 
+export type ChapterSummary = Omit<Chapter, 'content' | 'story_id'> & { version: number };
+
+export interface ChapterPage {
+  chapters: ChapterSummary[];
+  nextCursor?: string;
+}
+
 export interface CreateChapterRequest {
   story_id: string;
   title: string;
@@ -89,7 +100,7 @@ if (typeof window !== 'undefined') {
   if (savedRefresh) refreshToken = savedRefresh;
 }
 
-async function request(path: string, options: RequestInit = {}) {
+async function send(path: string, options: RequestInit = {}) {
   const doRequest = async () =>
     fetch(`${API_URL}/api/v1${path}`, {
       ...options,
@@ -110,10 +121,30 @@ async function request(path: string, options: RequestInit = {}) {
       throw new Error('Unauthorized');
     }
   }
+  return res;
+}
+
+async function request(path: string, options: RequestInit = {}) {
+  const res = await send(path, options);
   if (!res.ok) throw new Error(await res.text());
   return res.json();
 }
 
+// Listings carry an ETag; revalidate with If-None-Match and reuse the last body on 304.
+const revalidated = new Map<string, { etag: string; body: any; nextCursor: string | null }>();
+
+async function revalidate(path: string) {
+  const cached = revalidated.get(path);
+  const res = await send(path, cached ? { headers: { 'If-None-Match': cached.etag } } : {});
+  if (res.status === 304 && cached) return cached;
+  if (!res.ok) throw new Error(await res.text());
+  const entry = { etag: res.headers.get('ETag') ?? '', body: await res.json(), nextCursor: res.headers.get('X-Next-Cursor') };
+  if (entry.etag) revalidated.set(path, entry);
+  return entry;
+}
+
+export const CHAPTER_PAGE_SIZE = 50;
+
 export async function register(data: { username: string; password: string }) {
   const res = await fetch(`${API_URL}/register`, {
     method: 'POST',
@@ -160,16 +191,23 @@ export function logout() {
 export const api = {
   getStories: () => request('/stories/'),
   getStory: (id: string) => request(`/stories/${id}`),
+  getStoryStats: (id: string) => request(`/stories/${id}/stats`),
   createStory: (data: CreateStoryRequest) => request('/stories/', { method: 'POST', body: JSON.stringify(data) }),
   updateStory: (id: string, data: Partial<CreateStoryRequest>) => request(`/stories/${id}`, { method: 'PUT', body: JSON.stringify(data) }),
   deleteStory: (id: string) => request(`/stories/${id}`, { method: 'DELETE' }),
-  getStoryChapters: (storyId: string) => request(`/chapters/story/${storyId}`),
+  getStoryChapters: async (storyId: string) => (await revalidate(`/chapters/story/${storyId}`)).body,
+  getStoryChapterPage: async (storyId: string, after?: string): Promise<ChapterPage> => {
+    const cursor = after === undefined ? '' : `&after=${encodeURIComponent(after)}`;
+    const page = await revalidate(`/chapters/story/${storyId}?view=summary&limit=${CHAPTER_PAGE_SIZE}${cursor}`);
+    return { chapters: page.body, nextCursor: page.nextCursor ?? undefined };
+  },
   getChapter: (id: string) => request(`/chapters/${id}`),
   createChapter: (data: CreateChapterRequest) => request('/chapters/', { method: 'POST', body: JSON.stringify(data) }),
   updateChapter: (id: string, data: Partial<CreateChapterRequest>) => request(`/chapters/${id}`, { method: 'PUT', body: JSON.stringify(data) }),
   deleteChapter: (id: string) => request(`/chapters/${id}`, { method: 'DELETE' }),
   generateChapter: (data: GenerateChapterRequest) => request('/chapters/generate', { method: 'POST', body: JSON.stringify(data) }),
   reorderChapters: (storyId: string, positions: Record<string, number>) => request(`/chapters/story/${storyId}/reorder`, { method: 'PUT', body: JSON.stringify(positions) }),
+  moveChapter: (id: string, afterId?: string) => request(`/chapters/${id}/move`, { method: 'POST', body: JSON.stringify({ after_id: afterId ?? null }) }),
   exportStory: async (id: string) => {
     const res = await fetch(`${API_URL}/api/v1/stories/${id}/export`, {
       headers: {
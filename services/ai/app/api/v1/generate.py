@@ -1,109 +1,381 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
-import httpx
-from app.schemas.generation import GenerationRequest, GenerationResponse, StreamChunk
-from app.services.anthropic_service import anthropic_service
-from app.services.groq_service import groq_service
-from app.services.openai_service import openai_service
-import json
+from app.schemas.generation import (
+    BatchGenerationRequest,
+    BatchGenerationResponse,
+    BatchResult,
+    GenerationRequest,
+    GenerationResponse,
+)
+from app.services.provider_registry import provider_registry
+from app.services.analysis_dispatcher import analysis_dispatcher
+from app.services.response_cache import response_cache, cache_key
+from app.services.single_flight import single_flight
+from app.services.provider_limiter import provider_limiter
+from app.services.stream_hub import StreamGone, format_event, parse_event_id, stream_hub
+from app.services.prompt_cache import CACHEABLE_KINDS, current_story, prompt_cache_stats
+from app.services.rate_limiter import Lease, RateLimited, current_tenant, rate_limiter
+from app.context_packer import Piece, pack_context
+from app.tokens import IncrementalCounter, count_tokens, get_tokenizer
+from app.core import settings
+from typing import Any, Dict, List, Optional, Tuple
 import asyncio
+import hmac
+import json
 
 router = APIRouter()
 
+# Packed context text, packing report and the blocks it was built from
+Packed = Tuple[str, Optional[Dict[str, Any]], Optional[List[Dict[str, Any]]]]
+
 
 async def _run_analysis(text: str) -> None:
-    """Send generated text to the analysis service."""
+    """Queue generated text for background analysis.
+
+    The dispatcher sends it to the analysis service after the response has
+    been returned; analysis failures never block generation.
+    """
+    analysis_dispatcher.submit(text)
+
+async def get_tenant(
+    request: Request,
+    x_user_id: Optional[str] = Header(None),
+    x_service_token: Optional[str] = Header(None),
+    x_forwarded_for: Optional[str] = Header(None),
+) -> str:
+    """Who a request counts against.
+
+    ``X-User-Id`` is only honoured from internal services presenting
+    ``SERVICE_TOKEN``; from anyone else it would buy a fresh bucket per value.
+    Everything else counts against the client's address.
+    """
+    token = settings.SERVICE_TOKEN
+    if x_user_id and token and x_service_token and hmac.compare_digest(x_service_token, token):
+        return x_user_id
+    if settings.TRUST_FORWARDED_FOR and x_forwarded_for:
+        return x_forwarded_for.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "anonymous"
+
+async def _admit(tenant: str, tokens: int, requests: int = 1) -> Lease:
+    """Admit a request against the tenant's limits, or answer 429 with ``Retry-After``."""
     try:
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                "http://analysis-service:8012/api/v1/analyze/characters",
-                json={"text": text},
-                timeout=10.0,
-            )
-            await client.post(
-                "http://analysis-service:8012/api/v1/analyze/plot",
-                json={"text": text},
-                timeout=10.0,
-            )
+        lease = await rate_limiter.admit(tenant, tokens, requests)
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=e.reason, headers=e.headers)
+    # Provider slots are queued per tenant
+    current_tenant.set(tenant)
+    return lease
+
+def _input_tokens(request: GenerationRequest, model: str, system_prompt: str, context: str) -> int:
+    name = provider_registry.resolve(model)
+    return sum(count_tokens(text or "", model=name) for text in (system_prompt, context, request.prompt))
+
+def _pack_context(request: GenerationRequest, model: str, system_prompt: str) -> Packed:
+    """Pack ``context_pieces`` into what is left of the model's window.
+
+    Requests without pieces keep using ``context`` unchanged.
+    """
+    if not request.context_pieces:
+        return request.context, None, None
+
+    name = provider_registry.resolve(model)
+    budget = request.context_budget or settings.CONTEXT_TOKEN_BUDGET
+    try:
+        window = getattr(provider_registry.get(name), "max_context_length", None)
     except Exception:
-        # Analysis failures should not block generation
-        pass
+        window = None
+    if window:
+        reserved = request.max_tokens + count_tokens(system_prompt, model=name) + count_tokens(request.prompt, model=name)
+        budget = max(0, min(budget, window - reserved))
+
+    pieces = [
+        Piece(**{**piece.model_dump(), "cacheable": piece.kind in CACHEABLE_KINDS if piece.cacheable is None else piece.cacheable})
+        for piece in request.context_pieces
+    ]
+    packed = pack_context(
+        pieces,
+        budget,
+        model=name,
+        strategy=request.context_strategy,
+    )
+    return packed.text, packed.report(), packed.blocks
+
+async def _generate(
+    request: GenerationRequest,
+    model: str,
+    system_prompt: str,
+    hedge: Optional[bool],
+    packed: Optional[Packed] = None,
+    **sampling: Any,
+) -> GenerationResponse:
+    """Route a generation through the provider registry and queue analysis.
+
+    Identical requests are answered from the response cache, and identical
+    requests that arrive while one is already running share its upstream
+    call, unless the caller opts out with ``use_cache: false``. ``packed``
+    is context already packed for this model; ``sampling`` (temperature,
+    batch variant) is passed on and keyed into the cache.
+    """
+    use_cache = settings.RESPONSE_CACHE_ENABLED and request.use_cache
+    context, context_report, blocks = packed or _pack_context(request, model, system_prompt)
+    key = cache_key(
+        provider_registry.resolve(model) if model != "auto" else model,
+        system_prompt,
+        context,
+        request.prompt,
+        max_tokens=request.max_tokens,
+        **sampling,
+    )
+
+    async def produce() -> GenerationResponse:
+        async with provider_limiter.slot(provider_registry.resolve(model)):
+            result = await provider_registry.generate(
+                model,
+                prompt=request.prompt,
+                context=context,
+                system_prompt=system_prompt,
+                hedge=hedge,
+                temperature=sampling.get("temperature"),
+                context_blocks=blocks,
+            )
+        tokens_used = provider_registry.get(result.provider).estimate_tokens(result.content)
+
+        await _run_analysis(result.content)
+
+        response = GenerationResponse(
+            content=result.content,
+            tokens_used=tokens_used,
+            context_report=context_report,
+        )
+        if use_cache:
+            await response_cache.set(key, response.model_dump())
+        return response
+
+    if not use_cache:
+        response_cache.record_bypass()
+        return await produce()
+
+    cached = await response_cache.get(key)
+    if cached is not None:
+        return GenerationResponse(**cached)
+    return await single_flight.do(key, produce)
+
+async def _generate_admitted(
+    request: GenerationRequest,
+    model: str,
+    system_prompt: str,
+    hedge: Optional[bool],
+    tenant: str,
+) -> GenerationResponse:
+    """:func:`_generate` charged to ``tenant``: input plus ``max_tokens`` up
+    front, with the unused part refunded afterwards."""
+    packed = _pack_context(request, model, system_prompt)
+    input_tokens = _input_tokens(request, model, system_prompt, packed[0])
+    lease = await _admit(tenant, input_tokens + request.max_tokens)
+    used = None
+    try:
+        response = await _generate(request, model, system_prompt, hedge, packed=packed)
+        used = input_tokens + (response.tokens_used or 0)
+        return response
+    finally:
+        await lease.release(used)
 
 @router.post("/generate", response_model=GenerationResponse)
-async def generate_content(request: GenerationRequest, model: str = Query("groq", description="AI model to use: claude, groq, gpt")):
+async def generate_content(
+    request: GenerationRequest,
+    model: str = Query("groq", description="AI model to use: claude, groq, gpt, auto"),
+    hedge: Optional[bool] = Query(None, description="Fire a second provider if the first is slower than its p95"),
+    tenant: str = Depends(get_tenant),
+):
     """Generate story content using AI"""
     try:
         if request.stream:
             # For streaming, we'll use a different endpoint
             raise HTTPException(status_code=400, detail="Use /generate-stream for streaming responses")
-        
-        if model == "groq":
-            content = await groq_service.generate_content(
-                prompt=request.prompt,
-                context=request.context,
-                system_prompt=request.system_prompt
-            )
-            tokens_used = groq_service.estimate_tokens(content)
-        elif model == "gpt" or model == "openai":
-            content = await openai_service.generate_content(
-                prompt=request.prompt,
-                context=request.context,
-                system_prompt=request.system_prompt
-            )
-            tokens_used = openai_service.estimate_tokens(content)
-        else:  # default to claude
-            content = await anthropic_service.generate_content(
-                prompt=request.prompt,
-                context=request.context,
-                system_prompt=request.system_prompt
-            )
-            tokens_used = anthropic_service.estimate_tokens(content)
 
-        await _run_analysis(content)
-
-        return GenerationResponse(
-            content=content,
-            tokens_used=tokens_used
-        )
+        current_story.set(request.story_id)
+        return await _generate_admitted(request, model, request.system_prompt, hedge, tenant)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "Connection": "keep-alive", "X-Accel-Buffering": "no"}
+
+
+def _event_stream(stream_id: str, after: int = 0) -> StreamingResponse:
+    try:
+        frames = stream_hub.follow(stream_id, after)
+    except StreamGone:
+        raise HTTPException(status_code=410, detail="Stream expired; start a new generation")
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, "X-Stream-Id": stream_id},
+    )
+
 @router.post("/generate-stream")
-async def generate_content_stream(request: GenerationRequest):
-    """Generate story content using AI with streaming"""
+async def generate_content_stream(
+    request: GenerationRequest,
+    model: str = Query("claude", description="AI model to use: claude, groq, gpt, auto"),
+    last_event_id: Optional[str] = Header(None),
+    tenant: str = Depends(get_tenant),
+):
+    """Generate story content using AI with streaming.
+
+    Events carry ids of the form ``<stream id>:<n>``; sending the last one
+    seen as ``Last-Event-ID`` resumes that stream instead of starting a new
+    generation.
+    """
+    resume = parse_event_id(last_event_id)
+    if resume is not None:
+        return _event_stream(*resume)
+
+    lease: Optional[Lease] = None
     try:
-        async def generate():
-            accumulated_content = ""
-            async for chunk in anthropic_service.generate_content_stream(
-                prompt=request.prompt,
-                context=request.context,
-                system_prompt=request.system_prompt
-            ):
-                accumulated_content += chunk
-                chunk_data = StreamChunk(content=chunk, done=False)
-                yield f"data: {chunk_data.model_dump_json()}\n\n"
-                
-                # Small delay to prevent overwhelming the client
-                await asyncio.sleep(0.01)
-            
-            # Send final chunk
-            final_chunk = StreamChunk(content="", done=True)
-            yield f"data: {final_chunk.model_dump_json()}\n\n"
-        
-        return StreamingResponse(
-            generate(),
-            media_type="text/plain",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Content-Type": "text/event-stream"
-            }
+        context, _, blocks = _pack_context(request, model, request.system_prompt)
+        input_tokens = _input_tokens(request, model, request.system_prompt, context)
+        lease = await _admit(tenant, input_tokens + request.max_tokens)
+        key = cache_key(
+            provider_registry.resolve(model) if model != "auto" else model,
+            request.system_prompt,
+            context,
+            request.prompt,
+            max_tokens=request.max_tokens,
+            stream=True,
         )
+
+        async def upstream():
+            async with provider_limiter.slot(provider_registry.resolve(model)):
+                async for chunk in provider_registry.stream(
+                    model,
+                    prompt=request.prompt,
+                    context=context,
+                    system_prompt=request.system_prompt,
+                    context_blocks=blocks,
+                ):
+                    yield chunk
+
+        async def metered(source):
+            # The lease lasts as long as the stream, wherever the client is
+            # Chunk boundaries fall mid-word, so the output is counted as one
+            # growing text rather than chunk by chunk.
+            output = IncrementalCounter(get_tokenizer(provider_registry.resolve(model)))
+            try:
+                async for chunk in source:
+                    output.append(chunk)
+                    yield chunk
+            finally:
+                await lease.release(input_tokens + output.total)
+
+        # The pump task copies the current context, story and tenant included
+        current_story.set(request.story_id)
+        # Concurrent identical streams share one upstream call.
+        chunks = single_flight.stream(key, upstream) if request.use_cache else upstream()
+        return _event_stream(stream_hub.start(metered(chunks)))
+    except HTTPException:
+        raise
     except Exception as e:
+        if lease is not None:
+            await lease.release(0)
         raise HTTPException(status_code=500, detail=f"Streaming generation failed: {str(e)}")
 
+@router.get("/generate-stream/{stream_id}")
+async def resume_content_stream(stream_id: str, last_event_id: Optional[str] = Header(None)):
+    """Reattach to a running or recently finished stream, e.g. from EventSource"""
+    resume = parse_event_id(last_event_id)
+    return _event_stream(stream_id, resume[1] if resume and resume[0] == stream_id else 0)
+
+@router.post("/generate-batch", response_model=BatchGenerationResponse)
+async def generate_batch(
+    request: BatchGenerationRequest,
+    model: str = Query("groq", description="AI model to use: claude, groq, gpt, auto"),
+    stream: bool = Query(True, description="Send each result as an SSE event as soon as it is ready"),
+    hedge: Optional[bool] = Query(None, description="Fire a second provider if the first is slower than its p95"),
+    tenant: str = Depends(get_tenant),
+):
+    """Generate several candidates, e.g. branch continuations, from one context.
+
+    The shared context is packed once per provider and sent as the same
+    prefix ahead of each prompt, so providers that cache prompt prefixes
+    only process it once. Candidates run concurrently within the provider
+    slots, and the batch counts as one request per candidate against the
+    tenant's limits.
+    """
+    candidates = request.candidates()
+    if len(candidates) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"At most {settings.BATCH_MAX_ITEMS} candidates per batch")
+
+    shared = GenerationRequest(
+        prompt=max((c.prompt for c in candidates), key=len),
+        **request.model_dump(include={"story_id", "context", "system_prompt", "max_tokens", "use_cache", "context_pieces", "context_budget", "context_strategy"}),
+    )
+    packs: Dict[str, Packed] = {}
+    for candidate in candidates:
+        name = candidate.model or model
+        if name not in packs:
+            packs[name] = _pack_context(shared, name, request.system_prompt)
+    input_tokens = [
+        _input_tokens(shared.model_copy(update={"prompt": c.prompt}), c.model or model, request.system_prompt, packs[c.model or model][0])
+        for c in candidates
+    ]
+    lease = await _admit(tenant, sum(input_tokens) + shared.max_tokens * len(candidates), requests=len(candidates))
+
+    async def run(index: int) -> BatchResult:
+        candidate = candidates[index]
+        name = candidate.model or model
+        try:
+            response = await _generate(
+                shared.model_copy(update={"prompt": candidate.prompt}),
+                name,
+                request.system_prompt,
+                hedge,
+                packed=packs[name],
+                temperature=candidate.temperature,
+                variant=index,
+            )
+            return BatchResult(index=index, label=candidate.label, model=name, content=response.content, tokens_used=response.tokens_used)
+        except Exception as e:
+            return BatchResult(index=index, label=candidate.label, model=name, error=str(e))
+
+    current_story.set(request.story_id)
+    tasks = [asyncio.create_task(run(index)) for index in range(len(candidates))]
+    context_report = packs[candidates[0].model or model][1]
+
+    def used(results) -> int:
+        return sum(input_tokens[r.index] + (r.tokens_used or 0) for r in results if r.error is None)
+
+    if not stream:
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            await lease.release(used(t.result() for t in tasks if t.done() and not t.cancelled()))
+        return BatchGenerationResponse(results=list(results), context_report=context_report)
+
+    async def events():
+        finished = []
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                finished.append(result)
+                yield format_event(result.model_dump_json(), event_id=str(result.index), event="result")
+            yield format_event(json.dumps({"count": len(tasks), "context_report": context_report}), event="done")
+        finally:
+            # The client went away: stop the candidates nobody will read.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await lease.release(used(finished))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.post("/continue-story", response_model=GenerationResponse)
-async def continue_story(request: GenerationRequest, model: str = Query("groq", description="AI model to use: claude, groq, gpt")):
+async def continue_story(
+    request: GenerationRequest,
+    model: str = Query("groq", description="AI model to use: claude, groq, gpt, auto"),
+    hedge: Optional[bool] = Query(None, description="Fire a second provider if the first is slower than its p95"),
+    tenant: str = Depends(get_tenant),
+):
     """Continue an existing story with AI generation"""
     try:
         # Add specific system prompt for story continuation
@@ -114,33 +386,17 @@ async def continue_story(request: GenerationRequest, model: str = Query("groq",
         if request.system_prompt:
             story_system_prompt = f"{story_system_prompt}\n\nAdditional instructions: {request.system_prompt}"
         
-        if model == "groq":
-            content = await groq_service.generate_content(
-                prompt=request.prompt,
-                context=request.context,
-                system_prompt=story_system_prompt
-            )
-            tokens_used = groq_service.estimate_tokens(content)
-        elif model == "gpt" or model == "openai":
-            content = await openai_service.generate_content(
-                prompt=request.prompt,
-                context=request.context,
-                system_prompt=story_system_prompt
-            )
-            tokens_used = openai_service.estimate_tokens(content)
-        else:  # default to claude
-            content = await anthropic_service.generate_content(
-                prompt=request.prompt,
-                context=request.context,
-                system_prompt=story_system_prompt
-            )
-            tokens_used = anthropic_service.estimate_tokens(content)
-
-        await _run_analysis(content)
-
-        return GenerationResponse(
-            content=content,
-            tokens_used=tokens_used
-        )
+        current_story.set(request.story_id)
+        return await _generate_admitted(request, model, story_system_prompt, hedge, tenant)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Story continuation failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Story continuation failed: {str(e)}")
+
+@router.get("/prompt-cache/{story_id}")
+async def get_prompt_cache_stats(story_id: str):
+    """Prompt cache hit rate and input tokens saved for one story"""
+    stats = prompt_cache_stats.story(story_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No generations recorded for this story")
+    return stats
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""Assemble prompt context from prioritised pieces within a token budget.
+
+Callers hand over labelled pieces (story summary, character sheets,
+retrieved segments, recent chapters, hidden notes...) with a priority. The
+packer keeps the most valuable pieces that fit, trims the rest at paragraph
+or sentence boundaries rather than mid-word, and reports what was trimmed
+or dropped. Included pieces are emitted in their original order so the
+prompt still reads chronologically.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.tokens import Tokenizer, get_tokenizer
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?…\"'”’])\s+(?=\S)")
+
+
+@dataclass
+class Piece:
+    name: str
+    text: str
+    priority: int = 0
+    kind: str = "other"
+    keep: str = "end"  # which end survives trimming: "end", "start", or "none" (all or nothing)
+    cacheable: bool = False  # stable across requests, so it can sit in a cached prompt prefix
+
+
+@dataclass
+class PackResult:
+    text: str
+    budget: int
+    used_tokens: int
+    included: List[Dict[str, object]] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+    # Included pieces in prompt order: {"text", "kind", "cacheable"}
+    blocks: List[Dict[str, object]] = field(default_factory=list)
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "budget": self.budget,
+            "used_tokens": self.used_tokens,
+            "included": self.included,
+            "dropped": self.dropped,
+        }
+
+
+def _take(units: List[str], joiner: str, max_tokens: int, keep: str, tokenizer: Tokenizer) -> List[str]:
+    """Longest run of ``units`` from the kept end that fits ``max_tokens``."""
+    ordered = units[::-1] if keep == "end" else units
+    joiner_cost = tokenizer.count(joiner)
+    taken: List[str] = []
+    total = 0
+    for unit in ordered:
+        cost = tokenizer.count(unit) + (joiner_cost if taken else 0)
+        if total + cost > max_tokens:
+            break
+        taken.append(unit)
+        total += cost
+    if keep == "end":
+        taken.reverse()
+    # Per-unit counts are additive up to merges across the joiner; verify.
+    while taken and tokenizer.count(joiner.join(taken)) > max_tokens:
+        taken = taken[1:] if keep == "end" else taken[:-1]
+    return taken
+
+
+def trim_to_boundary(text: str, max_tokens: int, keep: str = "end", tokenizer: Optional[Tokenizer] = None) -> str:
+    """Shorten ``text`` to ``max_tokens`` without cutting through a sentence.
+
+    Whole paragraphs are kept first; the paragraph on the cut line is then
+    filled sentence by sentence. Returns ``""`` if not even one sentence fits.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    if tokenizer.count(text) <= max_tokens:
+        return text
+    if max_tokens <= 0 or keep == "none":
+        return ""
+
+    paragraphs = [p for p in re.split(r"\n\s*\n", text.strip()) if p.strip()]
+    kept = _take(paragraphs, "\n\n", max_tokens, keep, tokenizer)
+    remaining = max_tokens - tokenizer.count("\n\n".join(kept) + ("\n\n" if kept else ""))
+
+    if len(kept) < len(paragraphs) and remaining > 0:
+        boundary = paragraphs[len(paragraphs) - len(kept) - 1] if keep == "end" else paragraphs[len(kept)]
+        sentences = _SENTENCE_RE.split(boundary.strip())
+        partial = _take(sentences, " ", remaining, keep, tokenizer)
+        if partial:
+            kept = [" ".join(partial)] + kept if keep == "end" else kept + [" ".join(partial)]
+    return "\n\n".join(kept)
+
+
+def _knapsack(pieces: List[Piece], costs: List[int], budget: int) -> List[int]:
+    """Indices of whole pieces maximising total priority within ``budget``.
+
+    Costs are bucketed so the table stays small for 100k+ token windows.
+    """
+    scale = max(1, budget // 2000)
+    capacity = budget // scale
+    weights = [-(-cost // scale) for cost in costs]
+    best = [0] * (capacity + 1)
+    choice = [[False] * (capacity + 1) for _ in pieces]
+    for i, piece in enumerate(pieces):
+        value = max(piece.priority, 0) + 1
+        for c in range(capacity, weights[i] - 1, -1):
+            candidate = best[c - weights[i]] + value
+            if candidate > best[c]:
+                best[c] = candidate
+                choice[i][c] = True
+    chosen: List[int] = []
+    c = capacity
+    for i in range(len(pieces) - 1, -1, -1):
+        if choice[i][c]:
+            chosen.append(i)
+            c -= weights[i]
+    return chosen
+
+
+def pack_context(
+    pieces: List[Piece],
+    budget: int,
+    model: Optional[str] = None,
+    strategy: str = "greedy",
+    separator: str = "\n\n",
+) -> PackResult:
+    """Fit ``pieces`` into ``budget`` tokens.
+
+    ``greedy`` walks pieces by descending priority, trimming the first one
+    that does not fit. ``optimal`` first picks the set of whole pieces with
+    the highest total priority (0/1 knapsack), then spends what is left on
+    trimmed versions of the rest.
+    """
+    tokenizer = get_tokenizer(model)
+    sep_cost = tokenizer.count(separator)
+    costs = [tokenizer.count(p.text) + sep_cost for p in pieces]
+    texts: Dict[int, str] = {}
+    remaining = budget
+
+    by_priority = sorted(range(len(pieces)), key=lambda i: -pieces[i].priority)
+    if strategy == "optimal":
+        for i in _knapsack(pieces, costs, budget):
+            if costs[i] <= remaining:
+                texts[i] = pieces[i].text
+                remaining -= costs[i]
+
+    for i in by_priority:
+        if i in texts or not pieces[i].text:
+            continue
+        if costs[i] <= remaining:
+            texts[i] = pieces[i].text
+            remaining -= costs[i]
+            continue
+        trimmed = trim_to_boundary(pieces[i].text, remaining - sep_cost, pieces[i].keep, tokenizer)
+        if trimmed:
+            texts[i] = trimmed
+            remaining -= tokenizer.count(trimmed) + sep_cost
+
+    included: List[Dict[str, object]] = []
+    dropped: List[str] = []
+    for i, piece in enumerate(pieces):
+        if i in texts:
+            included.append({
+                "name": piece.name,
+                "kind": piece.kind,
+                "tokens": tokenizer.count(texts[i]),
+                "trimmed": texts[i] != piece.text,
+            })
+        else:
+            dropped.append(piece.name)
+
+    text = separator.join(texts[i] for i in sorted(texts))
+    return PackResult(
+        text=text,
+        budget=budget,
+        used_tokens=tokenizer.count(text),
+        included=included,
+        dropped=dropped,
+        # A trimmed piece changes with the budget, so it cannot be cached
+        blocks=[
+            {"text": texts[i], "kind": pieces[i].kind, "cacheable": pieces[i].cacheable and texts[i] == pieces[i].text}
+            for i in sorted(texts)
+        ],
+    )
@@ -1,7 +1,79 @@
 from pydantic_settings import BaseSettings
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     SERVICE_NAME: str = "ai-service"
+
+    # Upstream services
+    ANALYSIS_SERVICE_URL: str = "http://analysis-service:8012"
+
+    # Background analysis dispatch
+    ANALYSIS_QUEUE_MAXSIZE: int = 1000
+    ANALYSIS_CONCURRENCY: int = 4
+    ANALYSIS_BATCH_SIZE: int = 8
+    ANALYSIS_BATCH_WAIT: float = 0.05
+    ANALYSIS_MAX_RETRIES: int = 3
+    ANALYSIS_RETRY_BACKOFF: float = 0.5
+
+    # Generation providers
+    AI_FAKE_PROVIDERS: bool = False
+    PROVIDER_TIMEOUT: float = 120.0
+    PROVIDER_HEDGING_ENABLED: bool = False
+    PROVIDER_HEDGE_DELAY: float = 10.0
+
+    # Streaming: frames of up to STREAM_FRAME_CHARS or STREAM_FRAME_DELAY seconds of
+    # tokens; the last STREAM_REPLAY_FRAMES frames can be replayed with Last-Event-ID
+    STREAM_FRAME_CHARS: int = 64
+    STREAM_FRAME_DELAY: float = 0.05
+    STREAM_REPLAY_FRAMES: int = 512
+    STREAM_HIGH_WATER: int = 32
+    STREAM_RESUME_TIMEOUT: float = 30.0
+    STREAM_RETENTION: float = 60.0
+
+    # Batch generation: candidates per request
+    BATCH_MAX_ITEMS: int = 8
+
+    # Provider calls in flight per provider, shared round robin between tenants
+    PROVIDER_CONCURRENCY: int = 8
+    PROVIDER_CONCURRENCY_LIMITS: Dict[str, int] = {}
+
+    # Per-tenant admission: requests and tokens per minute, and generations in
+    # flight per tenant. Buckets are shared through REDIS_URL when it is set.
+    # The tenant is the X-User-Id an internal service acts for, trusted only
+    # with an X-Service-Token matching SERVICE_TOKEN. Otherwise it is the
+    # client address: with TRUST_FORWARDED_FOR (only behind the gateway) the
+    # last X-Forwarded-For hop, which the gateway appends itself.
+    SERVICE_TOKEN: Optional[str] = None
+    TRUST_FORWARDED_FOR: bool = False
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REQUESTS_PER_MINUTE: int = 60
+    RATE_LIMIT_TOKENS_PER_MINUTE: int = 400000
+    RATE_LIMIT_MAX_CONCURRENCY: int = 8
+
+    # Prompt caching: fraction of the input price saved per cached token, and
+    # the extra fraction charged for writing a token to the cache
+    PROMPT_CACHE_READ_DISCOUNT: Dict[str, float] = {"claude": 0.9, "gpt": 0.5, "groq": 0.5}
+    PROMPT_CACHE_WRITE_PREMIUM: Dict[str, float] = {"claude": 0.25}
+
+    # Context packing
+    CONTEXT_TOKEN_BUDGET: int = 16000
+
+    # Generation response cache
+    REDIS_URL: Optional[str] = None
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL: float = 3600.0
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Inter-service HTTP client pool
+    HTTP_TIMEOUT: float = 10.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = True
+    HTTP_UPSTREAM_MAX_CONNECTIONS: Dict[str, int] = {}
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -2,11 +2,24 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.core import settings
+from app.http_client import service_clients
+from app.services.analysis_dispatcher import analysis_dispatcher
+from app.services.provider_registry import provider_registry
+from app.services.response_cache import response_cache
+from app.services.single_flight import single_flight
+from app.services.stream_hub import stream_hub
+from app.services.prompt_cache import prompt_cache_stats
+from app.services.provider_limiter import provider_limiter
+from app.services.rate_limiter import rate_limiter
 from app.api.v1.generate import router as generate_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await analysis_dispatcher.start()
     yield
+    await stream_hub.stop()
+    await analysis_dispatcher.stop()
+    await service_clients.aclose()
 
 app = FastAPI(title="Quantum Writer AI Service", version="2.0.0", docs_url="/api/docs", redoc_url="/api/redoc", lifespan=lifespan)
 
@@ -19,3 +32,16 @@ app.include_router(generate_router, prefix="/api/v1", tags=["generation"])
 async def health_check():
     return {"status": "healthy", "service": settings.SERVICE_NAME}
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "analysis_queue": analysis_dispatcher.metrics(),
+        "providers": provider_registry.metrics(),
+        "response_cache": response_cache.metrics(),
+        "single_flight": single_flight.metrics(),
+        "streams": stream_hub.metrics(),
+        "provider_concurrency": provider_limiter.metrics(),
+        "rate_limits": rate_limiter.metrics(),
+        "prompt_cache": prompt_cache_stats.metrics(),
+    }
+
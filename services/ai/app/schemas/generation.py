@@ -1,17 +1,79 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Dict, List, Optional
+
+class ContextPiece(BaseModel):
+    name: str = Field(..., description="Label reported back if the piece is trimmed or dropped")
+    text: str = Field(..., description="Piece content")
+    priority: int = Field(default=0, description="Higher priorities are kept first when the budget is tight")
+    kind: str = Field(default="other", description="summary, character, segment, chapter, notes, ...")
+    keep: str = Field(default="end", pattern="^(end|start|none)$", description="Which end survives trimming; none drops the piece instead")
+    cacheable: Optional[bool] = Field(default=None, description="Stable across requests and eligible for the cached prompt prefix; defaults by kind")
+
 
 class GenerationRequest(BaseModel):
     prompt: str = Field(..., description="The prompt for content generation")
+    story_id: Optional[str] = Field(default=None, description="Story the request belongs to, for prompt cache accounting")
     context: Optional[str] = Field(default="", description="Previous story context")
     system_prompt: Optional[str] = Field(default="", description="System instructions for the AI")
     max_tokens: Optional[int] = Field(default=4000, ge=1, le=8000, description="Maximum tokens to generate")
     stream: Optional[bool] = Field(default=False, description="Whether to stream the response")
+    use_cache: Optional[bool] = Field(default=True, description="Serve identical earlier requests from the response cache")
+    context_pieces: Optional[List[ContextPiece]] = Field(default=None, description="Prioritised context packed into the token budget; replaces context")
+    context_budget: Optional[int] = Field(default=None, ge=1, description="Token budget for packed context")
+    context_strategy: Optional[str] = Field(default="greedy", pattern="^(greedy|optimal)$", description="How context pieces are packed")
 
 class GenerationResponse(BaseModel):
     content: str = Field(..., description="Generated content")
     tokens_used: Optional[int] = Field(default=None, description="Estimated tokens used")
+    context_report: Optional[Dict[str, Any]] = Field(default=None, description="Which context pieces were included, trimmed or dropped")
 
 class StreamChunk(BaseModel):
     content: str = Field(..., description="Chunk of generated content")
-    done: bool = Field(default=False, description="Whether this is the final chunk")
\ No newline at end of file
+    done: bool = Field(default=False, description="Whether this is the final chunk")
+    error: Optional[str] = Field(default=None, description="Set on the final chunk if generation failed")
+
+
+class BatchItem(BaseModel):
+    prompt: Optional[str] = Field(default=None, description="Prompt for this candidate; defaults to the batch prompt")
+    label: Optional[str] = Field(default=None, description="Echoed back with the result, e.g. a branch name")
+    model: Optional[str] = Field(default=None, description="Provider for this candidate; defaults to the batch model")
+    temperature: Optional[float] = Field(default=None, ge=0.0, le=2.0, description="Sampling temperature override")
+
+class BatchGenerationRequest(BaseModel):
+    prompt: Optional[str] = Field(default=None, description="Shared prompt for variants and items without their own")
+    story_id: Optional[str] = Field(default=None, description="Story the request belongs to, for prompt cache accounting")
+    items: List[BatchItem] = Field(default_factory=list, description="Candidates with their own prompt or sampling settings")
+    variants: int = Field(default=0, ge=0, description="Additional samples of the shared prompt")
+    context: Optional[str] = Field(default="", description="Story context shared by every candidate")
+    system_prompt: Optional[str] = Field(default="", description="System instructions for the AI")
+    max_tokens: Optional[int] = Field(default=4000, ge=1, le=8000, description="Maximum tokens to generate per candidate")
+    use_cache: Optional[bool] = Field(default=True, description="Serve identical earlier candidates from the response cache")
+    context_pieces: Optional[List[ContextPiece]] = Field(default=None, description="Prioritised context packed once for all candidates")
+    context_budget: Optional[int] = Field(default=None, ge=1, description="Token budget for packed context")
+    context_strategy: Optional[str] = Field(default="greedy", pattern="^(greedy|optimal)$", description="How context pieces are packed")
+
+    @model_validator(mode="after")
+    def _check_candidates(self):
+        if not self.items and not self.variants:
+            raise ValueError("Provide items or variants")
+        if not self.prompt and (self.variants or any(not item.prompt for item in self.items)):
+            raise ValueError("prompt is required for variants and for items without a prompt")
+        return self
+
+    def candidates(self) -> List[BatchItem]:
+        """Items with their prompts filled in, followed by the variants."""
+        items = [item.model_copy(update={"prompt": item.prompt or self.prompt}) for item in self.items]
+        items += [BatchItem(prompt=self.prompt, label=f"variant-{i + 1}") for i in range(self.variants)]
+        return items
+
+class BatchResult(BaseModel):
+    index: int = Field(..., description="Position of the candidate in the request")
+    label: Optional[str] = None
+    model: str
+    content: Optional[str] = Field(default=None, description="Generated content, unless the candidate failed")
+    tokens_used: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchGenerationResponse(BaseModel):
+    results: List[BatchResult]
+    context_report: Optional[Dict[str, Any]] = Field(default=None, description="How the shared context was packed")
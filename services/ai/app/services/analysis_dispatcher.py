@@ -0,0 +1,139 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core import settings
+from app.http_client import service_clients
+
+
+class AnalysisDispatcher:
+    """Background queue that forwards generated text to the analysis service.
+
+    Generation endpoints only enqueue; worker tasks drain the queue in batches
+    after the response has gone out. When the queue is full new work is
+    dropped rather than slowing generation down.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1000,
+        concurrency: int = 4,
+        batch_size: int = 8,
+        batch_wait: float = 0.05,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+    ):
+        self.maxsize = maxsize
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue: asyncio.Queue[Tuple[float, str]] = asyncio.Queue(maxsize=maxsize)
+        self._workers: List[asyncio.Task] = []
+        self._in_flight = 0
+        self._last_lag: Optional[float] = None
+        self._counters = {"submitted": 0, "processed": 0, "failed": 0, "dropped": 0, "retried": 0}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def submit(self, text: str) -> bool:
+        """Queue text for analysis; returns False if it was dropped."""
+        if not text:
+            return False
+        try:
+            self._queue.put_nowait((time.monotonic(), text))
+        except asyncio.QueueFull:
+            self._counters["dropped"] += 1
+            return False
+        self._counters["submitted"] += 1
+        return True
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _next_batch(self) -> List[Tuple[float, str]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _send(self, texts: List[str]) -> None:
+        client = service_clients.get("analysis")
+        response = await client.post(
+            f"{settings.ANALYSIS_SERVICE_URL}/api/v1/analyze/batch",
+            json={"texts": texts},
+        )
+        response.raise_for_status()
+
+    async def _process(self, batch: List[Tuple[float, str]]) -> None:
+        texts = [text for _, text in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._send(texts)
+                self._counters["processed"] += len(batch)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Analysis dispatch failed after {attempt + 1} attempts: {e}")
+                    self._counters["failed"] += len(batch)
+                    break
+                self._counters["retried"] += 1
+                await asyncio.sleep(self.retry_backoff * 2**attempt)
+        self._last_lag = time.monotonic() - batch[0][0]
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            self._in_flight += len(batch)
+            try:
+                await self._process(batch)
+            finally:
+                self._in_flight -= len(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def drain(self) -> None:
+        """Wait until everything queued so far has been handled."""
+        await self._queue.join()
+
+    def metrics(self) -> Dict[str, object]:
+        oldest = self._queue._queue[0][0] if self._queue.qsize() else None  # type: ignore[attr-defined]
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self.maxsize,
+            "in_flight": self._in_flight,
+            "oldest_pending_seconds": time.monotonic() - oldest if oldest is not None else 0.0,
+            "last_lag_seconds": self._last_lag,
+            **self._counters,
+        }
+
+
+# Global instance
+analysis_dispatcher = AnalysisDispatcher(
+    maxsize=settings.ANALYSIS_QUEUE_MAXSIZE,
+    concurrency=settings.ANALYSIS_CONCURRENCY,
+    batch_size=settings.ANALYSIS_BATCH_SIZE,
+    batch_wait=settings.ANALYSIS_BATCH_WAIT,
+    max_retries=settings.ANALYSIS_MAX_RETRIES,
+    retry_backoff=settings.ANALYSIS_RETRY_BACKOFF,
+)
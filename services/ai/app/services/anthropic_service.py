@@ -1,7 +1,10 @@
 import anthropic
 import os
-from typing import Dict, Any, AsyncGenerator
+from typing import Dict, Any, AsyncGenerator, List, Optional
 from app.core import settings
+from app.tokens import count_tokens, get_tokenizer
+from app.context_packer import trim_to_boundary
+from app.services.prompt_cache import anthropic_request, prompt_cache_stats
 
 class AnthropicService:
     def __init__(self):
@@ -9,70 +12,69 @@ class AnthropicService:
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable is required")
         
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        self.client = anthropic.AsyncAnthropic(api_key=self.api_key)
         self.max_context_length = 100000  # Claude's context window size
         
-    async def generate_content(self, prompt: str, context: str = "", system_prompt: str = "") -> str:
+    def _record_usage(self, usage) -> None:
+        if usage is None:
+            return
+        cached = getattr(usage, "cache_read_input_tokens", 0) or 0
+        written = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        prompt_cache_stats.record("claude", (usage.input_tokens or 0) + cached + written, cached, written)
+
+    async def generate_content(self, prompt: str, context: str = "", system_prompt: str = "", temperature: Optional[float] = None, context_blocks: Optional[List[Dict[str, Any]]] = None) -> str:
         """Generate content using Claude API"""
         try:
-            # Combine context and prompt
-            full_prompt = f"{context}\n\n{prompt}" if context else prompt
-            
             # Default system prompt if none provided
             if not system_prompt:
                 system_prompt = "You are a creative writing assistant helping to generate engaging story content."
             
-            message = self.client.messages.create(
+            # Stable story context first, marked for prompt caching; the prompt last
+            system, messages = anthropic_request(system_prompt, prompt, context, context_blocks)
+            options = {"temperature": temperature} if temperature is not None else {}
+            message = await self.client.messages.create(
                 model="claude-3-opus-20240229",
-                system=system_prompt,
+                system=system,
                 max_tokens=4000,
-                messages=[
-                    {"role": "user", "content": full_prompt}
-                ]
+                messages=messages,
+                **options
             )
+            self._record_usage(getattr(message, "usage", None))
             return message.content[0].text
         except Exception as e:
             print(f"Error generating content: {e}")
             raise e
     
-    async def generate_content_stream(self, prompt: str, context: str = "", system_prompt: str = "") -> AsyncGenerator[str, None]:
+    async def generate_content_stream(self, prompt: str, context: str = "", system_prompt: str = "", context_blocks: Optional[List[Dict[str, Any]]] = None) -> AsyncGenerator[str, None]:
         """Generate content using Claude API with streaming"""
         try:
-            # Combine context and prompt
-            full_prompt = f"{context}\n\n{prompt}" if context else prompt
-            
             # Default system prompt if none provided
             if not system_prompt:
                 system_prompt = "You are a creative writing assistant helping to generate engaging story content."
             
-            with self.client.messages.stream(
+            system, messages = anthropic_request(system_prompt, prompt, context, context_blocks)
+            async with self.client.messages.stream(
                 model="claude-3-opus-20240229",
-                system=system_prompt,
+                system=system,
                 max_tokens=4000,
-                messages=[
-                    {"role": "user", "content": full_prompt}
-                ]
+                messages=messages
             ) as stream:
-                for text in stream.text_stream:
+                async for text in stream.text_stream:
                     yield text
+                if hasattr(stream, "get_final_message"):
+                    self._record_usage(getattr(await stream.get_final_message(), "usage", None))
         except Exception as e:
             print(f"Error generating streaming content: {e}")
             raise e
     
     def estimate_tokens(self, text: str) -> int:
-        """Rough estimation of token count (4 chars = 1 token approximately)"""
-        return len(text) // 4
+        """Count tokens with the model's tokenizer"""
+        return count_tokens(text, model="claude")
     
     def truncate_context(self, context: str, max_tokens: int = 90000) -> str:
         """Truncate context to fit within token limits"""
-        estimated_tokens = self.estimate_tokens(context)
-        if estimated_tokens <= max_tokens:
-            return context
-        
-        # Truncate from the beginning, keeping the most recent context
-        ratio = max_tokens / estimated_tokens
-        truncate_point = int(len(context) * (1 - ratio))
-        return context[truncate_point:]
+        # Drop whole paragraphs/sentences from the beginning, keeping the most recent context
+        return trim_to_boundary(context, max_tokens, keep="end", tokenizer=get_tokenizer("claude"))
 
 # Global instance
 anthropic_service = AnthropicService()
\ No newline at end of file
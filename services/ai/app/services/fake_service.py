@@ -0,0 +1,66 @@
+import asyncio
+import hashlib
+from typing import Any, AsyncGenerator, Dict, List, Optional
+from app.tokens import count_tokens
+from app.services.prompt_cache import prompt_cache_stats, stable_prefix
+
+
+class FakeService:
+    """Offline provider for tests and local development without API keys.
+
+    Echoes the tail of the prompt after an optional delay, and can be told
+    to fail so failover paths can be exercised. Simulates a provider prompt
+    cache: the stable prefix of each request is remembered, and a later
+    request sharing it reports those tokens as cached.
+    """
+
+    def __init__(self, latency: float = 0.0, fail_with: Optional[Exception] = None, reply: Optional[str] = None):
+        self.latency = latency
+        self.fail_with = fail_with
+        self.reply = reply
+        self.calls = 0
+        self.max_context_length = 128000
+        self._prefixes: set = set()
+
+    def _record_usage(self, prompt: str, context: str, system_prompt: str, blocks: Optional[List[Dict[str, Any]]]) -> None:
+        if blocks is None:
+            blocks = [{"text": context, "cacheable": True}] if context else []
+        digest = hashlib.sha256()
+        cached = 0
+        matching = True
+        for text in [system_prompt] + [block["text"] for block in blocks[:stable_prefix(blocks)]]:
+            digest.update(text.encode() + b"\0")
+            key = digest.hexdigest()
+            if matching and key in self._prefixes:
+                cached += count_tokens(text)
+            else:
+                matching = False
+                self._prefixes.add(key)
+        total = count_tokens(system_prompt) + sum(count_tokens(block["text"]) for block in blocks) + count_tokens(prompt)
+        prompt_cache_stats.record("fake", total, cached)
+
+    def _content(self, prompt: str) -> str:
+        return self.reply if self.reply is not None else f"[fake] {prompt[-200:]}"
+
+    async def generate_content(self, prompt: str, context: str = "", system_prompt: str = "", temperature: Optional[float] = None, context_blocks: Optional[List[Dict[str, Any]]] = None) -> str:
+        """Return canned content after the configured latency."""
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail_with is not None:
+            raise self.fail_with
+        self._record_usage(prompt, context, system_prompt, context_blocks)
+        return self._content(prompt)
+
+    async def generate_content_stream(self, prompt: str, context: str = "", system_prompt: str = "", context_blocks: Optional[List[Dict[str, Any]]] = None) -> AsyncGenerator[str, None]:
+        """Stream canned content word by word."""
+        content = await self.generate_content(prompt, context, system_prompt, context_blocks=context_blocks)
+        for word in content.split(" "):
+            yield word + " "
+
+    def estimate_tokens(self, text: str) -> int:
+        """Count tokens with the default tokenizer"""
+        return count_tokens(text)
+
+
+# Global instance
+fake_service = FakeService()
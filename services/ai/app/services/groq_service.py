@@ -1,7 +1,9 @@
 import os
-from typing import Dict, Any, AsyncGenerator
-from groq import Groq
-import asyncio
+from typing import Dict, Any, AsyncGenerator, List, Optional
+from groq import AsyncGroq
+from app.tokens import count_tokens, get_tokenizer
+from app.context_packer import trim_to_boundary
+from app.services.prompt_cache import cached_prompt_tokens, prompt_cache_stats
 
 class GroqService:
     def __init__(self):
@@ -9,10 +11,10 @@ class GroqService:
         if not self.api_key:
             raise ValueError("GROQ_API_KEY environment variable is required")
         
-        self.client = Groq(api_key=self.api_key)
+        self.client = AsyncGroq(api_key=self.api_key)
         self.max_context_length = 128000  # Llama 3.1 8B context window
         
-    async def generate_content(self, prompt: str, context: str = "", system_prompt: str = "", model: str = "llama-3.1-8b-instant") -> str:
+    async def generate_content(self, prompt: str, context: str = "", system_prompt: str = "", model: str = "llama-3.1-8b-instant", temperature: Optional[float] = None, context_blocks: Optional[List[Dict[str, Any]]] = None) -> str:
         """Generate content using Groq API"""
         try:
             # Combine context and prompt
@@ -22,28 +24,28 @@ class GroqService:
             if not system_prompt:
                 system_prompt = "You are a creative writing assistant helping to generate engaging story content. Write compelling, original fiction."
             
-            # Groq API is synchronous, so we run it in an executor
-            def _generate():
-                completion = self.client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": full_prompt}
-                    ],
-                    max_tokens=4000,
-                    temperature=0.7,
-                    top_p=0.9
-                )
-                return completion.choices[0].message.content
+            completion = await self.client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": full_prompt}
+                ],
+                max_tokens=4000,
+                temperature=0.7 if temperature is None else temperature,
+                top_p=0.9
+            )
             
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, _generate)
+            usage = getattr(completion, "usage", None)
+            if usage is not None:
+                # The context precedes the prompt, so repeated story context is a cacheable prefix
+                prompt_cache_stats.record("groq", usage.prompt_tokens or 0, cached_prompt_tokens(usage))
+            return completion.choices[0].message.content
             
         except Exception as e:
             print(f"Error generating content with Groq: {e}")
             raise e
     
-    async def generate_content_stream(self, prompt: str, context: str = "", system_prompt: str = "", model: str = "llama-3.1-8b-instant") -> AsyncGenerator[str, None]:
+    async def generate_content_stream(self, prompt: str, context: str = "", system_prompt: str = "", model: str = "llama-3.1-8b-instant", context_blocks: Optional[List[Dict[str, Any]]] = None) -> AsyncGenerator[str, None]:
         """Generate content using Groq API with streaming"""
         try:
             # Combine context and prompt
@@ -53,23 +55,19 @@ class GroqService:
             if not system_prompt:
                 system_prompt = "You are a creative writing assistant helping to generate engaging story content. Write compelling, original fiction."
             
-            def _generate_stream():
-                return self.client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": full_prompt}
-                    ],
-                    max_tokens=4000,
-                    temperature=0.7,
-                    top_p=0.9,
-                    stream=True
-                )
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": full_prompt}
+                ],
+                max_tokens=4000,
+                temperature=0.7,
+                top_p=0.9,
+                stream=True
+            )
             
-            loop = asyncio.get_event_loop()
-            stream = await loop.run_in_executor(None, _generate_stream)
-            
-            for chunk in stream:
+            async for chunk in stream:
                 if chunk.choices[0].delta.content is not None:
                     yield chunk.choices[0].delta.content
                     
@@ -78,19 +76,13 @@ class GroqService:
             raise e
     
     def estimate_tokens(self, text: str) -> int:
-        """Rough estimation of token count (4 chars = 1 token approximately)"""
-        return len(text) // 4
+        """Count tokens with the model's tokenizer"""
+        return count_tokens(text, model="llama")
     
     def truncate_context(self, context: str, max_tokens: int = 120000) -> str:
         """Truncate context to fit within token limits"""
-        estimated_tokens = self.estimate_tokens(context)
-        if estimated_tokens <= max_tokens:
-            return context
-        
-        # Truncate from the beginning, keeping the most recent context
-        ratio = max_tokens / estimated_tokens
-        truncate_point = int(len(context) * (1 - ratio))
-        return context[truncate_point:]
+        # Drop whole paragraphs/sentences from the beginning, keeping the most recent context
+        return trim_to_boundary(context, max_tokens, keep="end", tokenizer=get_tokenizer("llama"))
 
 # Global instance
 groq_service = GroqService()
\ No newline at end of file
@@ -1,7 +1,10 @@
 import os
 import openai
-from typing import Dict, Any, AsyncGenerator
+from typing import Dict, Any, AsyncGenerator, List, Optional
 import asyncio
+from app.tokens import count_tokens, get_tokenizer
+from app.context_packer import trim_to_boundary
+from app.services.prompt_cache import cached_prompt_tokens, prompt_cache_stats
 
 class OpenAIService:
     def __init__(self):
@@ -12,7 +15,7 @@ class OpenAIService:
         self.client = openai.AsyncOpenAI(api_key=self.api_key)
         self.max_context_length = 128000  # GPT-4o-mini context window
         
-    async def generate_content(self, prompt: str, context: str = "", system_prompt: str = "", model: str = "gpt-4o-mini") -> str:
+    async def generate_content(self, prompt: str, context: str = "", system_prompt: str = "", model: str = "gpt-4o-mini", temperature: Optional[float] = None, context_blocks: Optional[List[Dict[str, Any]]] = None) -> str:
         """Generate content using OpenAI API"""
         try:
             # Combine context and prompt
@@ -29,17 +32,21 @@ class OpenAIService:
                     {"role": "user", "content": full_prompt}
                 ],
                 max_tokens=4000,
-                temperature=0.8,
+                temperature=0.8 if temperature is None else temperature,
                 top_p=0.9
             )
             
+            usage = getattr(completion, "usage", None)
+            if usage is not None:
+                # The context precedes the prompt, so repeated story context is a cacheable prefix
+                prompt_cache_stats.record("gpt", usage.prompt_tokens or 0, cached_prompt_tokens(usage))
             return completion.choices[0].message.content
             
         except Exception as e:
             print(f"Error generating content with OpenAI: {e}")
             raise e
     
-    async def generate_content_stream(self, prompt: str, context: str = "", system_prompt: str = "", model: str = "gpt-4o-mini") -> AsyncGenerator[str, None]:
+    async def generate_content_stream(self, prompt: str, context: str = "", system_prompt: str = "", model: str = "gpt-4o-mini", context_blocks: Optional[List[Dict[str, Any]]] = None) -> AsyncGenerator[str, None]:
         """Generate content using OpenAI API with streaming"""
         try:
             # Combine context and prompt
@@ -70,19 +77,13 @@ class OpenAIService:
             raise e
     
     def estimate_tokens(self, text: str) -> int:
-        """Rough estimation of token count (4 chars = 1 token approximately)"""
-        return len(text) // 4
+        """Count tokens with the model's tokenizer"""
+        return count_tokens(text, model="gpt-4o-mini")
     
     def truncate_context(self, context: str, max_tokens: int = 120000) -> str:
         """Truncate context to fit within token limits"""
-        estimated_tokens = self.estimate_tokens(context)
-        if estimated_tokens <= max_tokens:
-            return context
-        
-        # Truncate from the beginning, keeping the most recent context
-        ratio = max_tokens / estimated_tokens
-        truncate_point = int(len(context) * (1 - ratio))
-        return context[truncate_point:]
+        # Drop whole paragraphs/sentences from the beginning, keeping the most recent context
+        return trim_to_boundary(context, max_tokens, keep="end", tokenizer=get_tokenizer("gpt-4o-mini"))
 
 # Global instance
 openai_service = OpenAIService()
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""Prompt-prefix caching across providers.
+
+Requests are laid out as a stable prefix (system prompt, story bible,
+older chapters) followed by the variable tail (recent chapters, then the
+prompt), so consecutive requests for a story share the longest possible
+prefix. OpenAI and Groq cache such prefixes automatically; Anthropic needs
+``cache_control`` breakpoints, which :func:`anthropic_request` places.
+
+Providers report how many input tokens were served from cache, and
+:class:`PromptCacheStats` keeps the totals per provider and per story.
+"""
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core import settings
+
+# Piece kinds that stay the same from one request to the next.
+CACHEABLE_KINDS = frozenset({"summary", "notes", "character", "bible", "style"})
+
+# Story the current request is for; set by the endpoints, read by providers.
+current_story: ContextVar[Optional[str]] = ContextVar("current_story", default=None)
+
+_EPHEMERAL = {"type": "ephemeral"}
+
+
+def stable_prefix(blocks: Optional[List[Dict[str, Any]]]) -> int:
+    """Number of leading blocks that are cacheable.
+
+    A cacheable block after a volatile one cannot be part of a shared
+    prefix, so only the leading run counts.
+    """
+    count = 0
+    for block in blocks or []:
+        if not block.get("cacheable"):
+            break
+        count += 1
+    return count
+
+
+def anthropic_request(
+    system_prompt: str,
+    prompt: str,
+    context: str = "",
+    blocks: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """``system`` and ``messages`` for the Messages API with cache breakpoints.
+
+    Breakpoints go after the system prompt, after the last non-chapter
+    block of the stable prefix (the story bible) and after the whole stable
+    prefix, so adding a chapter still reuses the bible. Each block is its
+    own content part, which lets the API match the previous request's
+    breakpoint at a block boundary. Without blocks, a plain ``context`` is
+    treated as one cacheable block.
+    """
+    system = [{"type": "text", "text": system_prompt, "cache_control": _EPHEMERAL}]
+    if blocks is None:
+        blocks = [{"text": context, "kind": "context", "cacheable": True}] if context else []
+
+    prefix = stable_prefix(blocks)
+    breakpoints = set()
+    if prefix:
+        breakpoints.add(prefix - 1)
+        bible = [i for i in range(prefix) if blocks[i].get("kind") != "chapter"]
+        if bible:
+            breakpoints.add(bible[-1])
+
+    content: List[Dict[str, Any]] = []
+    for i, block in enumerate(blocks):
+        part: Dict[str, Any] = {"type": "text", "text": f"{block['text']}\n\n"}
+        if i in breakpoints:
+            part["cache_control"] = _EPHEMERAL
+        content.append(part)
+    content.append({"type": "text", "text": prompt})
+    return system, [{"role": "user", "content": content}]
+
+
+def cached_prompt_tokens(usage: Any) -> int:
+    """Cached input tokens from an OpenAI-compatible ``usage`` object."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return int(getattr(details, "cached_tokens", 0) or 0)
+
+
+class PromptCacheStats:
+    """Input tokens read from, and written to, provider prompt caches.
+
+    ``saved_tokens`` converts cache reads into full-price input tokens not
+    paid for, net of any premium the provider charges for cache writes.
+    """
+
+    def __init__(self, max_stories: int = 10000):
+        self.max_stories = max_stories
+        self.providers: Dict[str, Dict[str, float]] = {}
+        self.stories: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+
+    @staticmethod
+    def _empty() -> Dict[str, float]:
+        return {"requests": 0, "input_tokens": 0, "cached_tokens": 0, "cache_write_tokens": 0, "saved_tokens": 0.0}
+
+    def record(
+        self,
+        provider: str,
+        input_tokens: int,
+        cached_tokens: int = 0,
+        cache_write_tokens: int = 0,
+        story_id: Optional[str] = None,
+    ) -> None:
+        """``input_tokens`` is the whole prompt, including cached and written tokens."""
+        saved = (
+            cached_tokens * settings.PROMPT_CACHE_READ_DISCOUNT.get(provider, 0.0)
+            - cache_write_tokens * settings.PROMPT_CACHE_WRITE_PREMIUM.get(provider, 0.0)
+        )
+        story_id = story_id if story_id is not None else current_story.get()
+        targets = [self.providers.setdefault(provider, self._empty())]
+        if story_id:
+            entry = self.stories.get(story_id)
+            if entry is None:
+                entry = self.stories[story_id] = self._empty()
+                while len(self.stories) > self.max_stories:
+                    self.stories.popitem(last=False)
+            else:
+                self.stories.move_to_end(story_id)
+            targets.append(entry)
+        for totals in targets:
+            totals["requests"] += 1
+            totals["input_tokens"] += input_tokens
+            totals["cached_tokens"] += cached_tokens
+            totals["cache_write_tokens"] += cache_write_tokens
+            totals["saved_tokens"] += saved
+
+    @staticmethod
+    def _summary(totals: Dict[str, float]) -> Dict[str, float]:
+        hit_rate = totals["cached_tokens"] / totals["input_tokens"] if totals["input_tokens"] else 0.0
+        return {**totals, "saved_tokens": round(totals["saved_tokens"], 1), "hit_rate": round(hit_rate, 4)}
+
+    def story(self, story_id: str) -> Optional[Dict[str, float]]:
+        totals = self.stories.get(story_id)
+        return self._summary(totals) if totals is not None else None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "providers": {name: self._summary(totals) for name, totals in self.providers.items()},
+            "stories": len(self.stories),
+        }
+
+
+# Global instance
+prompt_cache_stats = PromptCacheStats()
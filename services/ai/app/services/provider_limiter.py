@@ -0,0 +1,98 @@
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from app.core import settings
+from app.services.rate_limiter import current_tenant
+
+
+class _Pool:
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        # Waiters per tenant, in the order tenants are to be served.
+        self.queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+
+class ProviderLimiter:
+    """Caps concurrent calls per provider and shares them fairly between tenants.
+
+    Callers beyond a provider's cap wait in per-tenant queues that are served
+    round robin, so a tenant with a hundred queued requests gets one slot in
+    turn with a tenant that has one, instead of holding every slot until its
+    backlog drains. A freed slot is handed straight to the next waiter.
+    """
+
+    def __init__(self, default: int = 8, limits: Optional[Dict[str, int]] = None):
+        self.default = default
+        self.limits = limits or {}
+        self._pools: Dict[str, _Pool] = {}
+
+    def _pool(self, name: str) -> _Pool:
+        pool = self._pools.get(name)
+        if pool is None:
+            pool = self._pools[name] = _Pool(self.limits.get(name, self.default))
+        return pool
+
+    async def _acquire(self, pool: _Pool, tenant: str) -> None:
+        if pool.active < pool.limit and not pool.queues:
+            pool.active += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        pool.queues.setdefault(tenant, deque()).append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled: pass it on.
+                self._release(pool)
+            else:
+                queue = pool.queues.get(tenant)
+                if queue is not None and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del pool.queues[tenant]
+            raise
+
+    def _release(self, pool: _Pool) -> None:
+        while pool.queues:
+            tenant, queue = next(iter(pool.queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                pool.queues.move_to_end(tenant)
+            else:
+                del pool.queues[tenant]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        pool.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, name: str, tenant: Optional[str] = None) -> AsyncIterator[None]:
+        """Hold one of ``name``'s slots; ``tenant`` defaults to the current request's."""
+        pool = self._pool(name)
+        await self._acquire(pool, tenant if tenant is not None else current_tenant.get())
+        try:
+            yield
+        finally:
+            self._release(pool)
+
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {
+                "limit": pool.limit,
+                "active": pool.active,
+                "waiting": pool.waiting,
+                "waiting_tenants": len(pool.queues),
+            }
+            for name, pool in self._pools.items()
+        }
+
+
+# Global instance
+provider_limiter = ProviderLimiter(settings.PROVIDER_CONCURRENCY, settings.PROVIDER_CONCURRENCY_LIMITS)
@@ -0,0 +1,284 @@
+import asyncio
+import importlib
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Callable, Deque, Dict, List, Optional, Protocol
+
+from app.core import settings
+
+
+class Provider(Protocol):
+    """Interface shared by every generation backend."""
+
+    async def generate_content(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: str = "",
+        temperature: Optional[float] = None,
+        context_blocks: Optional[List[Dict[str, Any]]] = None,
+    ) -> str:
+        ...
+
+    def generate_content_stream(
+        self,
+        prompt: str,
+        context: str = "",
+        system_prompt: str = "",
+        context_blocks: Optional[List[Dict[str, Any]]] = None,
+    ) -> AsyncGenerator[str, None]:
+        ...
+
+    def estimate_tokens(self, text: str) -> int:
+        ...
+
+
+@dataclass
+class ProviderResult:
+    content: str
+    provider: str
+    latency: float
+
+
+class ProviderStats:
+    """Rolling latency and error window for one provider."""
+
+    def __init__(self, window: int = 100):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+
+    def record_failure(self) -> None:
+        self.outcomes.append(False)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        return {
+            "samples": len(self.latencies),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "error_rate": self.error_rate,
+        }
+
+
+class ProviderRegistry:
+    """Named generation providers with latency-aware routing and failover.
+
+    Providers are registered as factories so a backend whose API key is
+    missing only fails when it is actually selected, which lets the router
+    fall through to the next one. Tests and local development can replace
+    any entry with a fake backend via :meth:`register`.
+    """
+
+    def __init__(self, default: str = "claude"):
+        self.default = default
+        self._factories: Dict[str, Callable[[], Provider]] = {}
+        self._instances: Dict[str, Provider] = {}
+        self._aliases: Dict[str, str] = {}
+        self.stats: Dict[str, ProviderStats] = {}
+
+    def register(self, name: str, provider: Provider | Callable[[], Provider], aliases: tuple = ()) -> None:
+        """Register a provider instance or a zero-argument factory for one."""
+        if callable(provider) and not hasattr(provider, "generate_content"):
+            self._factories[name] = provider
+            self._instances.pop(name, None)
+        else:
+            self._instances[name] = provider  # type: ignore[assignment]
+        self.stats.setdefault(name, ProviderStats())
+        for alias in aliases:
+            self._aliases[alias] = name
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.stats)
+
+    def resolve(self, name: Optional[str]) -> str:
+        """Map a requested model name or alias onto a registered provider."""
+        if name == "auto":
+            return self.route(None)[0]
+        name = self._aliases.get(name or "", name)
+        return name if name in self.stats else self.default
+
+    def get(self, name: str) -> Provider:
+        name = self.resolve(name)
+        if name not in self._instances:
+            self._instances[name] = self._factories[name]()
+        return self._instances[name]
+
+    def route(self, requested: Optional[str]) -> List[str]:
+        """Return providers to try: the requested one first, then the rest
+        ordered by observed error rate and median latency."""
+        primary = self.resolve(requested) if requested and requested != "auto" else None
+
+        def score(name: str):
+            stats = self.stats[name]
+            p50 = stats.percentile(50)
+            return (stats.error_rate > 0.5, p50 if p50 is not None else float("inf"))
+
+        rest = sorted((n for n in self.stats if n != primary), key=score)
+        return [primary, *rest] if primary else rest
+
+    async def _call(self, name: str, prompt: str, context: str, system_prompt: str, **options) -> ProviderResult:
+        start = time.monotonic()
+        try:
+            provider = self.get(name)
+            content = await asyncio.wait_for(
+                provider.generate_content(prompt=prompt, context=context, system_prompt=system_prompt, **options),
+                timeout=settings.PROVIDER_TIMEOUT,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.stats[name].record_failure()
+            raise
+        latency = time.monotonic() - start
+        self.stats[name].record_success(latency)
+        return ProviderResult(content=content, provider=name, latency=latency)
+
+    async def _hedged(self, primary: str, secondary: str, started: List[str], **kwargs) -> ProviderResult:
+        """Start ``primary``; if it has not finished by its p95 latency, also
+        start ``secondary`` and return whichever succeeds first.
+
+        ``secondary`` is appended to ``started`` only once it is launched, so
+        the caller knows whether it still has to be tried as a fallback.
+        """
+        delay = self.stats[primary].percentile(95) or settings.PROVIDER_HEDGE_DELAY
+        first = asyncio.create_task(self._call(primary, **kwargs))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        started.append(secondary)
+        pending = {first, asyncio.create_task(self._call(secondary, **kwargs))}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        raise error  # type: ignore[misc]
+
+    async def generate(
+        self,
+        model: Optional[str],
+        prompt: str,
+        context: str = "",
+        system_prompt: str = "",
+        hedge: Optional[bool] = None,
+        fallback: bool = True,
+        temperature: Optional[float] = None,
+        context_blocks: Optional[List[Dict[str, Any]]] = None,
+    ) -> ProviderResult:
+        """Generate with the requested provider, failing over on errors or
+        timeouts and optionally hedging against slow responses.
+
+        ``context_blocks`` is ``context`` split into packed pieces, which
+        providers use to lay out prompt-cache breakpoints.
+        """
+        hedge = settings.PROVIDER_HEDGING_ENABLED if hedge is None else hedge
+        order = self.route(model)
+        if not fallback:
+            order = order[:1]
+        kwargs = {"prompt": prompt, "context": context or "", "system_prompt": system_prompt or ""}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if context_blocks is not None:
+            kwargs["context_blocks"] = context_blocks
+
+        last_error: Optional[Exception] = None
+        index = 0
+        while index < len(order):
+            name = order[index]
+            secondary = order[index + 1] if hedge and index + 1 < len(order) else None
+            started: List[str] = []
+            try:
+                if secondary:
+                    return await self._hedged(name, secondary, started, **kwargs)
+                return await self._call(name, **kwargs)
+            except Exception as e:
+                print(f"Provider {name} failed: {e!r}")
+                last_error = e
+            # Skip the hedge partner only if it already ran alongside.
+            index += 2 if started else 1
+        raise last_error or RuntimeError("No generation providers registered")
+
+    async def stream(
+        self,
+        model: Optional[str],
+        prompt: str,
+        context: str = "",
+        system_prompt: str = "",
+        fallback: bool = True,
+        context_blocks: Optional[List[Dict[str, Any]]] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Stream from the requested provider, failing over to the next one
+        if it errors before producing any text. Once text has been sent an
+        error propagates, since another provider would start over."""
+        order = self.route(model)
+        if not fallback:
+            order = order[:1]
+        kwargs = {"prompt": prompt, "context": context or "", "system_prompt": system_prompt or ""}
+        if context_blocks is not None:
+            kwargs["context_blocks"] = context_blocks
+
+        last_error: Optional[Exception] = None
+        for name in order:
+            start = time.monotonic()
+            started = False
+            try:
+                async for chunk in self.get(name).generate_content_stream(**kwargs):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self.stats[name].record_failure()
+                if started:
+                    raise
+                print(f"Provider {name} stream failed: {e!r}")
+                last_error = e
+                continue
+            self.stats[name].record_success(time.monotonic() - start)
+            return
+        raise last_error or RuntimeError("No generation providers registered")
+
+    def metrics(self) -> Dict[str, Dict[str, Optional[float]]]:
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+
+def _lazy(module: str, attr: str) -> Callable[[], Provider]:
+    def factory() -> Provider:
+        return getattr(importlib.import_module(module), attr)
+    return factory
+
+
+# Global instance
+provider_registry = ProviderRegistry(default="claude")
+if settings.AI_FAKE_PROVIDERS:
+    provider_registry.register("groq", _lazy("app.services.fake_service", "fake_service"))
+    provider_registry.register("gpt", _lazy("app.services.fake_service", "fake_service"), aliases=("openai",))
+    provider_registry.register("claude", _lazy("app.services.fake_service", "fake_service"), aliases=("anthropic",))
+else:
+    provider_registry.register("groq", _lazy("app.services.groq_service", "groq_service"))
+    provider_registry.register("gpt", _lazy("app.services.openai_service", "openai_service"), aliases=("openai",))
+    provider_registry.register("claude", _lazy("app.services.anthropic_service", "anthropic_service"), aliases=("anthropic",))
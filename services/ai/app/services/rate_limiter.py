@@ -0,0 +1,228 @@
+"""Per-tenant admission control for generation requests.
+
+Each tenant has two token buckets, refilled continuously: one counted in
+requests and one in model tokens. Both hold a minute's worth and a request
+is only admitted if both can pay for it, so a burst can use up a minute's
+allowance but not more. The token charge is an estimate (input plus
+``max_tokens``); whatever the generation did not use is refunded when its
+lease is released. A tenant also has a cap on generations in flight.
+
+Buckets live in process memory, or in Redis when it is configured so every
+replica shares them. If Redis fails, the in-memory buckets take over.
+"""
+import math
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - optional dependency
+    aioredis = None  # type: ignore
+
+# Tenant the current request is for; set by the endpoints, read by the provider limiter.
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default="anonymous")
+
+# Bucket = (key, capacity, refill per second, cost). Negative costs refund.
+Bucket = Tuple[str, float, float, float]
+
+
+class RateLimited(Exception):
+    """A tenant is over one of its limits; retry after ``retry_after`` seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class MemoryBuckets:
+    """Token buckets in process memory."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._levels: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def _level(self, key: str, capacity: float, rate: float, now: float) -> float:
+        tokens, updated = self._levels.get(key, (capacity, now))
+        return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+    async def take(self, buckets: Sequence[Bucket], now: float) -> float:
+        """Charge every bucket, or none; returns 0 or the seconds until all could pay."""
+        levels = [self._level(key, capacity, rate, now) for key, capacity, rate, _ in buckets]
+        wait = max(
+            ((cost - level) / rate for (_, _, rate, cost), level in zip(buckets, levels) if cost > level),
+            default=0.0,
+        )
+        if wait:
+            return wait
+        for (key, capacity, _, cost), level in zip(buckets, levels):
+            self._levels[key] = (min(capacity, level - cost), now)
+            self._levels.move_to_end(key)
+        while len(self._levels) > self.max_keys:
+            # Least recently charged buckets have most likely refilled anyway.
+            self._levels.popitem(last=False)
+        return 0.0
+
+
+# KEYS: bucket keys; ARGV: now, then capacity, rate, cost per key.
+_TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local cost = tonumber(ARGV[i * 3 + 1])
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(state[1]) or capacity
+  local ts = tonumber(state[2]) or now
+  levels[i] = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+  if cost > levels[i] then
+    wait = math.max(wait, (cost - levels[i]) / rate)
+  end
+end
+if wait > 0 then
+  return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local cost = tonumber(ARGV[i * 3 + 1])
+  redis.call('HSET', key, 'tokens', math.min(capacity, levels[i] - cost), 'ts', now)
+  redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return '0'
+"""
+
+
+class RedisBuckets:
+    """Token buckets shared through Redis; each take is one atomic script call."""
+
+    def __init__(self, client: Any, prefix: str = "ai:ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, buckets: Sequence[Bucket], now: float) -> float:
+        args: List[float] = [now]
+        for _, capacity, rate, cost in buckets:
+            args.extend((capacity, rate, cost))
+        wait = await self._script(keys=[self.prefix + key for key, *_ in buckets], args=args)
+        return float(wait)
+
+
+class Lease:
+    """An admitted request; release it once the generation has finished."""
+
+    def __init__(self, limiter: "RateLimiter", tenant: str, tokens: int):
+        self.limiter = limiter
+        self.tenant = tenant
+        self.tokens = tokens
+        self.released = False
+
+    async def release(self, used_tokens: Optional[int] = None) -> None:
+        """Free the concurrency slot and refund tokens charged but not used."""
+        if self.released:
+            return
+        self.released = True
+        self.limiter._finish(self.tenant)
+        if used_tokens is not None and used_tokens < self.tokens:
+            await self.limiter._refund(self.tenant, self.tokens - used_tokens)
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        requests_per_minute: int = 60,
+        tokens_per_minute: int = 400000,
+        max_concurrency: int = 8,
+        redis_url: Optional[str] = None,
+        enabled: bool = True,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.enabled = enabled
+        self.memory = MemoryBuckets()
+        self.redis = RedisBuckets(aioredis.from_url(redis_url)) if aioredis is not None and redis_url else None
+        self.in_flight: Dict[str, int] = {}
+        self.counters = {"admitted": 0, "rejected_rate": 0, "rejected_concurrency": 0, "redis_errors": 0}
+
+    def _buckets(self, tenant: str, requests: int, tokens: int) -> List[Bucket]:
+        buckets: List[Bucket] = []
+        if requests and self.requests_per_minute > 0:
+            capacity = float(self.requests_per_minute)
+            buckets.append((f"{tenant}:requests", capacity, capacity / 60, min(requests, capacity)))
+        if tokens and self.tokens_per_minute > 0:
+            capacity = float(self.tokens_per_minute)
+            # A request larger than the whole bucket waits for a full one rather than forever.
+            buckets.append((f"{tenant}:tokens", capacity, capacity / 60, min(tokens, capacity)))
+        return buckets
+
+    async def _take(self, buckets: List[Bucket]) -> float:
+        if not buckets:
+            return 0.0
+        now = time.time()
+        if self.redis is not None:
+            try:
+                return await self.redis.take(buckets, now)
+            except Exception as e:
+                self.counters["redis_errors"] += 1
+                print(f"Rate limiter redis call failed, using local buckets: {e}")
+        return await self.memory.take(buckets, now)
+
+    async def admit(self, tenant: str, tokens: int, requests: int = 1) -> Lease:
+        """Admit ``requests`` calls costing an estimated ``tokens`` or raise :class:`RateLimited`."""
+        lease = Lease(self, tenant, tokens)
+        if not self.enabled:
+            lease.released = True
+            return lease
+        if self.max_concurrency > 0 and self.in_flight.get(tenant, 0) >= self.max_concurrency:
+            self.counters["rejected_concurrency"] += 1
+            raise RateLimited("Too many generations in progress", 1.0)
+
+        wait = await self._take(self._buckets(tenant, requests, tokens))
+        if wait:
+            self.counters["rejected_rate"] += 1
+            raise RateLimited("Rate limit exceeded", wait)
+
+        self.in_flight[tenant] = self.in_flight.get(tenant, 0) + 1
+        self.counters["admitted"] += 1
+        return lease
+
+    def _finish(self, tenant: str) -> None:
+        remaining = self.in_flight.get(tenant, 0) - 1
+        if remaining > 0:
+            self.in_flight[tenant] = remaining
+        else:
+            self.in_flight.pop(tenant, None)
+
+    async def _refund(self, tenant: str, tokens: int) -> None:
+        if self.tokens_per_minute <= 0:
+            return
+        await self._take([(f"{tenant}:tokens", float(self.tokens_per_minute), self.tokens_per_minute / 60, -tokens)])
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "backend": "redis" if self.redis is not None else "memory",
+            "tenants_in_flight": len(self.in_flight),
+        }
+
+
+# Global instance
+rate_limiter = RateLimiter(
+    requests_per_minute=settings.RATE_LIMIT_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.RATE_LIMIT_TOKENS_PER_MINUTE,
+    max_concurrency=settings.RATE_LIMIT_MAX_CONCURRENCY,
+    redis_url=settings.REDIS_URL,
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
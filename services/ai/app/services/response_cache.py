@@ -0,0 +1,156 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - optional dependency
+    aioredis = None  # type: ignore
+
+
+def _normalize(text: Optional[str]) -> str:
+    return "\n".join(line.rstrip() for line in (text or "").replace("\r\n", "\n").split("\n")).strip()
+
+
+def cache_key(model: str, system_prompt: str, context: str, prompt: str, **params: Any) -> str:
+    """Content address for a generation request.
+
+    Whitespace differences that do not change what the provider sees are
+    normalised away so retried and double-submitted requests collide.
+    """
+    payload = {
+        "model": model,
+        "system_prompt": _normalize(system_prompt),
+        "context": _normalize(context),
+        "prompt": _normalize(prompt),
+        "params": params,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class MemoryLRU:
+    """In-process LRU with per-entry TTL and entry/byte limits."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self.bytes -= len(value)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+
+class ResponseCache:
+    """Two-tier cache of completed generation responses.
+
+    The memory tier is always on; a Redis tier is used when ``REDIS_URL`` is
+    configured and the client library is installed, so replicas share hits.
+    Redis errors are logged and treated as misses.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, ttl: float = 3600.0, redis_url: Optional[str] = None):
+        self.ttl = ttl
+        self.memory = MemoryLRU(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+        self.redis = aioredis.from_url(redis_url) if aioredis is not None and redis_url else None
+        self.counters = {"hits": 0, "memory_hits": 0, "redis_hits": 0, "misses": 0, "stores": 0, "bypassed": 0}
+
+    @staticmethod
+    def _redis_key(key: str) -> str:
+        return f"ai:response:{key}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self.memory.get(key)
+        if raw is not None:
+            self.counters["hits"] += 1
+            self.counters["memory_hits"] += 1
+            return json.loads(raw)
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(self._redis_key(key))
+            except Exception as e:
+                print(f"Response cache redis get failed: {e}")
+                raw = None
+            if raw is not None:
+                raw = raw.decode() if isinstance(raw, bytes) else raw
+                self.memory.set(key, raw)
+                self.counters["hits"] += 1
+                self.counters["redis_hits"] += 1
+                return json.loads(raw)
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        raw = json.dumps(value)
+        self.memory.set(key, raw)
+        self.counters["stores"] += 1
+        if self.redis is not None:
+            try:
+                await self.redis.set(self._redis_key(key), raw, ex=int(self.ttl))
+            except Exception as e:
+                print(f"Response cache redis set failed: {e}")
+
+    def record_bypass(self) -> None:
+        self.counters["bypassed"] += 1
+
+    def clear(self) -> None:
+        self.memory.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": self.counters["hits"] / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+            "bytes": self.memory.bytes,
+            "evictions": self.memory.evictions,
+            "redis": self.redis is not None,
+        }
+
+
+# Global instance
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    ttl=settings.RESPONSE_CACHE_TTL,
+    redis_url=settings.REDIS_URL,
+)
@@ -0,0 +1,122 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Broadcast:
+    """Buffered token stream that any number of subscribers can replay."""
+
+    def __init__(self) -> None:
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._cond = asyncio.Condition()
+
+    async def publish(self, chunk: str) -> None:
+        async with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    async def close(self, error: Optional[BaseException] = None) -> None:
+        async with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """Yield every chunk from the start of the stream, then follow it live."""
+        self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                async with self._cond:
+                    await self._cond.wait_for(lambda: index < len(self.chunks) or self.done)
+                    pending = self.chunks[index:]
+                    finished = self.done
+                for chunk in pending:
+                    yield chunk
+                index += len(pending)
+                if finished and index >= len(self.chunks):
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            self.subscribers -= 1
+            # Nobody is listening any more: stop paying for the upstream call.
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                self.task.cancel()
+
+
+class SingleFlight:
+    """Coalesce concurrent identical upstream calls into one.
+
+    The first caller for a key starts the work in its own task; callers that
+    arrive while it is running await the same task. A waiter going away does
+    not cancel the shared call for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self.counters = {"leaders": 0, "coalesced": 0, "stream_leaders": 0, "stream_joins": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            self.counters["leaders"] += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish_call(key, t))
+        else:
+            self.counters["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finish_call(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every waiter has gone
+
+    def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Fan one upstream token stream out to every concurrent subscriber.
+
+        Late joiners receive the chunks produced so far before following the
+        live stream.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            self.counters["stream_leaders"] += 1
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.ensure_future(self._pump(key, broadcast, factory))
+        else:
+            self.counters["stream_joins"] += 1
+        return broadcast.subscribe()
+
+    async def _pump(self, key: str, broadcast: _Broadcast, factory: Callable[[], AsyncIterator[str]]) -> None:
+        error: Optional[BaseException] = None
+        try:
+            async for chunk in factory():
+                await broadcast.publish(chunk)
+        except asyncio.CancelledError as e:
+            error = e
+        except Exception as e:
+            error = e
+        finally:
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+            await broadcast.close(error)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            "in_flight": len(self._calls),
+            "streams_in_flight": len(self._streams),
+        }
+
+
+# Global instance
+single_flight = SingleFlight()
@@ -0,0 +1,248 @@
+import asyncio
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from app.core import settings
+from app.schemas.generation import StreamChunk
+
+
+def format_event(data: str, event_id: Optional[str] = None, event: Optional[str] = None) -> str:
+    """Encode one server-sent event; multi-line data becomes several ``data:`` fields."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_event_id(value: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Split a ``Last-Event-ID`` of the form ``<stream id>:<sequence>``."""
+    if not value or ":" not in value:
+        return None
+    stream_id, _, seq = value.rpartition(":")
+    try:
+        return stream_id, int(seq)
+    except ValueError:
+        return None
+
+
+class StreamGone(Exception):
+    """The requested events are no longer in the replay buffer."""
+
+
+class _Abandoned(Exception):
+    """No client came back for a stream within the resume timeout."""
+
+
+class _Stream:
+    def __init__(self, stream_id: str, replay_frames: int):
+        self.id = stream_id
+        self.frames: Deque[Tuple[int, str]] = deque(maxlen=replay_frames)
+        self.last_seq = 0
+        self.delivered = 0  # furthest sequence any client has been sent
+        self.listeners: Dict[int, int] = {}  # listener -> last sequence sent to it
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def changed(self) -> None:
+        await self._changed.wait()
+
+    def append(self, data: str, event: Optional[str] = None) -> None:
+        self.last_seq += 1
+        self.frames.append((self.last_seq, format_event(data, f"{self.id}:{self.last_seq}", event)))
+        self.notify()
+
+    def finish(self) -> None:
+        self.done = True
+        self.finished_at = time.monotonic()
+        self.notify()
+
+
+class StreamHub:
+    """Generation streams that outlive the connection that started them.
+
+    A pump task reads the provider stream, coalesces tokens into frames of
+    ``frame_chars`` characters or whatever arrived within ``frame_delay``
+    seconds, and appends them to a per-stream ring of the last
+    ``replay_frames`` frames. Each connection follows the ring with its
+    own cursor, so a client that reconnects with ``Last-Event-ID`` gets the
+    frames it missed and then the live stream.
+
+    Backpressure: a frame is only handed to the server once the previous
+    one has been written to the socket, and the pump stops reading from the
+    provider while the slowest client is ``high_water`` frames behind. With
+    no client attached it waits up to ``resume_timeout`` seconds for one to
+    come back before abandoning the upstream call.
+    """
+
+    def __init__(
+        self,
+        replay_frames: int = 512,
+        high_water: int = 32,
+        frame_chars: int = 64,
+        frame_delay: float = 0.05,
+        resume_timeout: float = 30.0,
+        retention: float = 60.0,
+    ):
+        self.replay_frames = max(replay_frames, high_water + 1)
+        self.high_water = high_water
+        self.frame_chars = frame_chars
+        self.frame_delay = frame_delay
+        self.resume_timeout = resume_timeout
+        self.retention = retention
+        self._streams: Dict[str, _Stream] = {}
+        self._listener_ids = 0
+        self.counters = {"started": 0, "resumed": 0, "frames": 0, "abandoned": 0, "backpressure_waits": 0}
+
+    def start(self, source: AsyncIterator[str]) -> str:
+        """Begin pumping ``source`` into a new stream and return its id."""
+        self._evict()
+        stream = _Stream(uuid.uuid4().hex, self.replay_frames)
+        self._streams[stream.id] = stream
+        stream.task = asyncio.create_task(self._pump(stream, source))
+        self.counters["started"] += 1
+        return stream.id
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for stream_id, stream in list(self._streams.items()):
+            if stream.done and not stream.listeners and now - stream.finished_at > self.retention:
+                del self._streams[stream_id]
+
+    async def _pump(self, stream: _Stream, source: AsyncIterator[str]) -> None:
+        loop = asyncio.get_running_loop()
+        buffer: list = []
+        size = 0
+        timer: Optional[asyncio.TimerHandle] = None
+
+        def flush() -> None:
+            nonlocal size, timer
+            if timer is not None:
+                timer.cancel()
+                timer = None
+            if buffer:
+                stream.append(StreamChunk(content="".join(buffer), done=False).model_dump_json())
+                self.counters["frames"] += 1
+                buffer.clear()
+                size = 0
+
+        try:
+            async for chunk in source:
+                if not chunk:
+                    continue
+                buffer.append(chunk)
+                size += len(chunk)
+                if size >= self.frame_chars:
+                    flush()
+                    await self._wait_for_room(stream)
+                elif timer is None:
+                    # A slow provider still gets each token out within frame_delay.
+                    timer = loop.call_later(self.frame_delay, flush)
+            flush()
+            stream.append(StreamChunk(content="", done=True).model_dump_json())
+        except (asyncio.CancelledError, _Abandoned):
+            flush()
+            self.counters["abandoned"] += 1
+        except Exception as e:
+            flush()
+            stream.append(StreamChunk(content="", done=True, error=str(e)).model_dump_json(), event="error")
+        finally:
+            if timer is not None:
+                timer.cancel()
+            stream.finish()
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def _wait_for_room(self, stream: _Stream) -> None:
+        while True:
+            behind = min(stream.listeners.values()) if stream.listeners else stream.delivered
+            if stream.last_seq - behind < self.high_water:
+                return
+            self.counters["backpressure_waits"] += 1
+            if stream.listeners:
+                await stream.changed()
+                continue
+            try:
+                await asyncio.wait_for(stream.changed(), timeout=self.resume_timeout)
+            except asyncio.TimeoutError:
+                # Nobody came back for it: stop paying for the upstream call.
+                raise _Abandoned(stream.id)
+
+    def exists(self, stream_id: str) -> bool:
+        return stream_id in self._streams
+
+    def follow(self, stream_id: str, after: int = 0) -> AsyncIterator[str]:
+        """Encoded frames of ``stream_id`` with sequence numbers above ``after``.
+
+        Raises :class:`StreamGone` right away if the stream is unknown or
+        those frames have left the replay buffer.
+        """
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            raise StreamGone(stream_id)
+        oldest = stream.frames[0][0] if stream.frames else stream.last_seq + 1
+        if after < stream.last_seq and after + 1 < oldest:
+            raise StreamGone(stream_id)
+        if after:
+            self.counters["resumed"] += 1
+        return self._follow(stream, after)
+
+    async def _follow(self, stream: _Stream, after: int) -> AsyncIterator[str]:
+        self._listener_ids += 1
+        listener = self._listener_ids
+        stream.listeners[listener] = after
+        stream.notify()
+        cursor = after
+        try:
+            while True:
+                pending = [(seq, frame) for seq, frame in stream.frames if seq > cursor]
+                if not pending:
+                    if stream.done:
+                        return
+                    await stream.changed()
+                    continue
+                for seq, frame in pending:
+                    # Resumes only after the server has written the frame.
+                    yield frame
+                    cursor = stream.listeners[listener] = seq
+                    stream.delivered = max(stream.delivered, seq)
+                    stream.notify()
+        finally:
+            stream.listeners.pop(listener, None)
+            stream.notify()
+
+    async def stop(self) -> None:
+        tasks = [s.task for s in self._streams.values() if s.task is not None and not s.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            "active": sum(1 for s in self._streams.values() if not s.done),
+            "retained": len(self._streams),
+            "listeners": sum(len(s.listeners) for s in self._streams.values()),
+        }
+
+
+# Global instance
+stream_hub = StreamHub(
+    replay_frames=settings.STREAM_REPLAY_FRAMES,
+    high_water=settings.STREAM_HIGH_WATER,
+    frame_chars=settings.STREAM_FRAME_CHARS,
+    frame_delay=settings.STREAM_FRAME_DELAY,
+    resume_timeout=settings.STREAM_RESUME_TIMEOUT,
+    retention=settings.STREAM_RETENTION,
+)
@@ -0,0 +1,215 @@
+"""Token counting shared by every truncation and summarisation path.
+
+Counts come from the model's real BPE vocabulary when it is available
+offline: ``tiktoken`` is installed and ``TOKENIZER_VOCAB_DIR`` contains the
+``<encoding>.tiktoken`` rank file. Nothing is ever downloaded at request
+time. Without a vocabulary the same pre-tokenisation regex is used with a
+per-piece estimate, which tracks real counts far better than character or
+word ratios (including for non-Latin scripts).
+
+Counts are memoised per text hash, and :class:`IncrementalCounter` keeps a
+running total for text that only ever grows.
+"""
+import hashlib
+import math
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+    from tiktoken.load import load_tiktoken_bpe
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None  # type: ignore
+    load_tiktoken_bpe = None  # type: ignore
+
+# Pre-tokenisation patterns of the published encodings.
+_ENCODING_PATTERNS = {
+    "cl100k_base": r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|\s*[\r\n]|\s+(?!\S)|\s""",
+    "o200k_base": "|".join(
+        [
+            r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]*[\p{Ll}\p{Lm}\p{Lo}\p{M}]+(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+            r"""[^\r\n\p{L}\p{N}]?[\p{Lu}\p{Lt}\p{Lm}\p{Lo}\p{M}]+[\p{Ll}\p{Lm}\p{Lo}\p{M}]*(?i:'s|'t|'re|'ve|'m|'ll|'d)?""",
+            r"""\p{N}{1,3}""",
+            r""" ?[^\s\p{L}\p{N}]+[\r\n/]*""",
+            r"""\s*[\r\n]+""",
+            r"""\s+(?!\S)""",
+            r"""\s+""",
+        ]
+    ),
+}
+
+# Model name prefixes mapped to the vocabulary that best matches them.
+# Anthropic and Llama models do not ship an offline tokenizer; cl100k is
+# the closest public BPE for English prose.
+MODEL_ENCODINGS: List[Tuple[str, str]] = [
+    ("gpt-4o", "o200k_base"),
+    ("gpt", "o200k_base"),
+    ("openai", "o200k_base"),
+    ("o1", "o200k_base"),
+    ("claude", "cl100k_base"),
+    ("llama", "cl100k_base"),
+    ("groq", "cl100k_base"),
+]
+DEFAULT_ENCODING = "cl100k_base"
+
+# Approximation of the cl100k pre-tokeniser using the stdlib ``re`` module.
+_PIECE_RE = re.compile(
+    r"""'(?:[sdmtSDMT]|ll|ve|re)|[^\r\n\w]?[^\W\d_]+|\d{1,3}| ?[^\s\w]+[\r\n]*|\s*[\r\n]|\s+(?!\S)|\s+"""
+)
+
+
+def _estimate_piece(piece: str) -> int:
+    letters = piece.lstrip(" ")
+    if not letters:
+        return 1
+    if letters[0].isalpha():
+        if not letters.isascii():
+            # CJK and most non-Latin scripts cost roughly a token per character.
+            return len(letters)
+        # Common English words are single tokens; long ones split into ~5 char subwords.
+        return 1 if len(letters) <= 8 else math.ceil(len(letters) / 5)
+    if letters.isspace():
+        return 1
+    if letters.isdigit():
+        return 1
+    return math.ceil(len(letters.strip()) / 3) or 1
+
+
+class Tokenizer:
+    """Counts tokens for one vocabulary, with an LRU cache keyed by text hash."""
+
+    def __init__(self, name: str, cache_size: int = 4096):
+        self.name = name
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self.encoding = self._load_encoding(name)
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    @staticmethod
+    def _load_encoding(name: str):
+        vocab_dir = os.environ.get("TOKENIZER_VOCAB_DIR")
+        if tiktoken is None or not vocab_dir or name not in _ENCODING_PATTERNS:
+            return None
+        path = os.path.join(vocab_dir, f"{name}.tiktoken")
+        if not os.path.exists(path):
+            return None
+        try:
+            return tiktoken.Encoding(
+                name=name,
+                pat_str=_ENCODING_PATTERNS[name],
+                mergeable_ranks=load_tiktoken_bpe(path),
+                special_tokens={},
+            )
+        except Exception as e:
+            print(f"Failed to load tokenizer vocabulary {path}: {e}")
+            return None
+
+    def _count_uncached(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode_ordinary(text))
+        return sum(_estimate_piece(piece) for piece in _PIECE_RE.findall(text))
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+        count = self._count_uncached(text)
+        self._cache[key] = count
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return count
+
+    def truncate(self, text: str, max_tokens: int, keep: str = "end") -> str:
+        """Cut ``text`` to at most ``max_tokens``, keeping its end (most
+        recent content) or its start."""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is not None:
+            tokens = self.encoding.encode_ordinary(text)
+            kept = tokens[-max_tokens:] if keep == "end" else tokens[:max_tokens]
+            return self.encoding.decode(kept)
+
+        pieces = _PIECE_RE.findall(text)
+        ordered = reversed(pieces) if keep == "end" else iter(pieces)
+        kept_pieces: List[str] = []
+        total = 0
+        for piece in ordered:
+            cost = _estimate_piece(piece)
+            if total + cost > max_tokens:
+                break
+            kept_pieces.append(piece)
+            total += cost
+        if keep == "end":
+            kept_pieces.reverse()
+        return "".join(kept_pieces)
+
+
+class IncrementalCounter:
+    """Running token count for text that is only ever appended to.
+
+    Everything before the last word boundary is counted once and never
+    revisited; only the unfinished tail is re-counted on each append.
+    """
+
+    def __init__(self, tokenizer: "Tokenizer", text: str = ""):
+        self.tokenizer = tokenizer
+        self._committed = 0
+        self._tail = ""
+        if text:
+            self.append(text)
+
+    def append(self, text: str) -> int:
+        tail = self._tail + text
+        boundary = max(tail.rfind(" "), tail.rfind("\n"))
+        # Leave whitespace runs in the tail so they merge the way the
+        # tokenizer would merge them.
+        while boundary > 0 and tail[boundary - 1].isspace():
+            boundary -= 1
+        if boundary > 0:
+            self._committed += self.tokenizer.count(tail[:boundary])
+            tail = tail[boundary:]
+        self._tail = tail
+        return self.total
+
+    @property
+    def total(self) -> int:
+        return self._committed + self.tokenizer.count(self._tail)
+
+
+_tokenizers: Dict[str, Tokenizer] = {}
+
+
+def encoding_for_model(model: Optional[str]) -> str:
+    lowered = (model or "").lower()
+    for prefix, encoding in MODEL_ENCODINGS:
+        if lowered.startswith(prefix):
+            return encoding
+    return DEFAULT_ENCODING
+
+
+def get_tokenizer(model: Optional[str] = None) -> Tokenizer:
+    name = encoding_for_model(model)
+    tokenizer = _tokenizers.get(name)
+    if tokenizer is None:
+        tokenizer = Tokenizer(name)
+        _tokenizers[name] = tokenizer
+    return tokenizer
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    return get_tokenizer(model).count(text)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None, keep: str = "end") -> str:
+    return get_tokenizer(model).truncate(text, max_tokens, keep=keep)
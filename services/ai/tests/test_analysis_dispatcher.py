@@ -0,0 +1,56 @@
+import pytest
+from httpx import AsyncClient
+
+from app.services.analysis_dispatcher import AnalysisDispatcher
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_batches_and_retries(monkeypatch):
+    dispatcher = AnalysisDispatcher(concurrency=1, batch_size=10, batch_wait=0.01, retry_backoff=0)
+    sent = []
+    failures = {"left": 1}
+
+    async def fake_send(texts):
+        if failures["left"]:
+            failures["left"] -= 1
+            raise RuntimeError("analysis down")
+        sent.append(list(texts))
+
+    monkeypatch.setattr(dispatcher, "_send", fake_send)
+    for i in range(3):
+        assert dispatcher.submit(f"text {i}")
+
+    await dispatcher.start()
+    await dispatcher.drain()
+    await dispatcher.stop()
+
+    assert sent == [["text 0", "text 1", "text 2"]]
+    metrics = dispatcher.metrics()
+    assert metrics["processed"] == 3
+    assert metrics["retried"] == 1
+    assert metrics["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_drops_when_full():
+    dispatcher = AnalysisDispatcher(maxsize=2)
+    assert dispatcher.submit("a")
+    assert dispatcher.submit("b")
+    assert not dispatcher.submit("c")
+    metrics = dispatcher.metrics()
+    assert metrics["dropped"] == 1
+    assert metrics["queue_depth"] == 2
+    assert metrics["oldest_pending_seconds"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    from app.main import app
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.get("/metrics")
+    assert resp.status_code == 200
+    assert "queue_depth" in resp.json()["analysis_queue"]
@@ -0,0 +1,93 @@
+import pytest
+from httpx import AsyncClient
+
+from app.context_packer import Piece, pack_context, trim_to_boundary
+from app.tokens import count_tokens
+
+TEXT = (
+    "First paragraph opens. It has two sentences.\n\n"
+    "Second paragraph continues. It adds more detail. And a third sentence.\n\n"
+    "Final paragraph. The very end."
+)
+
+
+def test_trim_keeps_whole_sentences_from_the_kept_end():
+    end = trim_to_boundary(TEXT, 12)
+    assert TEXT.endswith(end)
+    assert end.startswith(("Final", "And", "It", "Second"))
+    assert count_tokens(end) <= 12
+
+    start = trim_to_boundary(TEXT, 12, keep="start")
+    assert TEXT.startswith(start)
+    assert start.endswith(".")
+
+    assert trim_to_boundary(TEXT, 1000) == TEXT
+    assert trim_to_boundary(TEXT, 12, keep="none") == ""
+
+
+def test_greedy_pack_respects_priority_and_reports_drops():
+    pieces = [
+        Piece("old", "Old chapter text. " * 50, priority=10, kind="chapter"),
+        Piece("recent", "Recent chapter text. " * 20, priority=90, kind="chapter"),
+        Piece("notes", "Secret note. " * 30, priority=50, kind="notes", keep="none"),
+    ]
+    result = pack_context(pieces, budget=100)
+    report = result.report()
+
+    assert result.used_tokens <= 100
+    assert "notes" in report["dropped"]
+    names = [p["name"] for p in report["included"]]
+    assert "recent" in names
+    assert result.text.index("Old") < result.text.index("Recent")  # original order kept
+    recent = next(p for p in report["included"] if p["name"] == "recent")
+    assert recent["trimmed"] is False
+
+
+def test_optimal_pack_beats_greedy_on_whole_pieces():
+    pieces = [
+        Piece("big", "word " * 60, priority=50, keep="none"),
+        Piece("a", "word " * 45, priority=40, keep="none"),
+        Piece("b", "word " * 45, priority=40, keep="none"),
+    ]
+    greedy = pack_context(pieces, budget=100)
+    optimal = pack_context(pieces, budget=100, strategy="optimal")
+    assert [p["name"] for p in greedy.included] == ["big"]
+    assert [p["name"] for p in optimal.included] == ["a", "b"]
+    assert optimal.used_tokens <= 100
+
+
+@pytest.mark.asyncio
+async def test_generate_packs_context_pieces(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    from app.main import app
+    from app.services.groq_service import groq_service
+
+    seen = {}
+
+    async def fake_generate_content(prompt, context="", system_prompt="", context_blocks=None):
+        seen["context"] = context
+        seen["blocks"] = context_blocks
+        return "Generated"
+
+    monkeypatch.setattr(groq_service, "generate_content", fake_generate_content)
+
+    payload = {
+        "prompt": "Continue",
+        "use_cache": False,
+        "context_budget": 40,
+        "context_pieces": [
+            {"name": "summary", "text": "A heist in a floating city.", "priority": 80, "kind": "summary"},
+            {"name": "chapter:1", "text": "Long ago. " * 100, "priority": 10, "kind": "chapter", "keep": "none"},
+            {"name": "chapter:2", "text": "The vault door opened.", "priority": 90, "kind": "chapter"},
+        ],
+    }
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/api/v1/generate?model=groq", json=payload)
+
+    assert response.status_code == 200
+    report = response.json()["context_report"]
+    assert report["dropped"] == ["chapter:1"]
+    assert seen["context"] == "A heist in a floating city.\n\nThe vault door opened."
+    assert [(b["kind"], b["cacheable"]) for b in seen["blocks"]] == [("summary", True), ("chapter", False)]
@@ -53,3 +53,92 @@ async def test_continue_story_endpoint(ai_app):
     assert resp.status_code == 200
     data = resp.json()
     assert data["content"] == "Generated"
+
+@pytest.mark.asyncio
+async def test_generate_stream_uses_requested_provider_and_resumes(ai_app, monkeypatch):
+    from app.services.groq_service import groq_service
+
+    async def fake_stream(*args, **kwargs):
+        for word in ["The ", "night ", "was ", "long."]:
+            yield word
+
+    monkeypatch.setattr(groq_service, "generate_content_stream", fake_stream)
+    async with AsyncClient(app=ai_app, base_url="http://test") as ac:
+        resp = await ac.post(
+            "/api/v1/generate-stream",
+            params={"model": "groq"},
+            json={"prompt": "Go", "use_cache": False},
+        )
+        stream_id = resp.headers["x-stream-id"]
+        resumed = await ac.post(
+            "/api/v1/generate-stream",
+            json={"prompt": "Go"},
+            headers={"Last-Event-ID": f"{stream_id}:1"},
+        )
+        gone = await ac.get("/api/v1/generate-stream/unknown")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    frames = [f for f in resp.text.split("\n\n") if f]
+    assert frames[0].startswith(f"id: {stream_id}:1\n")
+    assert '"content":"The night was long."' in frames[0]
+    assert '"done":true' in frames[-1]
+    assert resumed.text.split("\n\n")[0].startswith(f"id: {stream_id}:2\n")
+    assert gone.status_code == 410
+
+@pytest.mark.asyncio
+async def test_generate_batch_streams_results_as_they_finish(ai_app, monkeypatch):
+    import asyncio
+    import json
+    from app.services.groq_service import groq_service
+    from app.services.provider_limiter import provider_limiter
+
+    active = 0
+    peak = 0
+    calls = []
+
+    async def fake_generate_content(prompt, context="", system_prompt="", temperature=None):
+        nonlocal active, peak
+        calls.append((prompt, context, temperature))
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05 if prompt == "slow" else 0.01)
+        active -= 1
+        return f"{prompt}!"
+
+    monkeypatch.setattr(groq_service, "generate_content", fake_generate_content)
+    monkeypatch.setattr(provider_limiter, "limits", {"groq": 2})
+    monkeypatch.setattr(provider_limiter, "_pools", {})
+
+    async with AsyncClient(app=ai_app, base_url="http://test") as ac:
+        resp = await ac.post(
+            "/api/v1/generate-batch",
+            params={"model": "groq"},
+            json={
+                "prompt": "shared",
+                "context": "Once upon a time.",
+                "items": [{"prompt": "slow", "label": "a"}, {"label": "b", "temperature": 1.1}],
+                "variants": 2,
+                "use_cache": False,
+            },
+        )
+        whole = await ac.post(
+            "/api/v1/generate-batch",
+            params={"model": "groq", "stream": False},
+            json={"prompt": "again", "variants": 2, "use_cache": False},
+        )
+        invalid = await ac.post("/api/v1/generate-batch", json={"items": [{"label": "no prompt"}]})
+
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [e for e in resp.text.split("\n\n") if e]
+    results = [json.loads(e.split("data: ", 1)[1]) for e in events if "event: result" in e]
+    assert [r["label"] for r in results][-1] == "a"  # the slow one arrives last
+    assert sorted(r["index"] for r in results) == [0, 1, 2, 3]
+    assert {r["content"] for r in results} == {"slow!", "shared!"}
+    assert "event: done" in events[-1]
+    assert peak <= 2
+    assert all(context == "Once upon a time." for _, context, _ in calls[:4])
+    assert ("shared", "Once upon a time.", 1.1) in calls
+
+    assert [r["label"] for r in whole.json()["results"]] == ["variant-1", "variant-2"]
+    assert invalid.status_code == 422
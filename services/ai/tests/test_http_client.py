@@ -0,0 +1,20 @@
+import pytest
+
+from app.core import settings
+from app.http_client import ServiceClients
+
+
+@pytest.mark.asyncio
+async def test_clients_are_pooled_per_upstream(monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_UPSTREAM_MAX_CONNECTIONS", {"analysis": 4})
+    clients = ServiceClients()
+
+    analysis = clients.get("analysis")
+    assert clients.get("analysis") is analysis
+    assert clients.get("other") is not analysis
+    assert analysis._transport._pool._max_connections == 4
+
+    await clients.aclose()
+    assert analysis.is_closed
+    assert clients.get("analysis") is not analysis
+    await clients.aclose()
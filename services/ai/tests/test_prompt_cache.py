@@ -0,0 +1,88 @@
+import pytest
+from httpx import AsyncClient
+
+from app.core import settings
+from app.services.fake_service import FakeService
+from app.services.prompt_cache import PromptCacheStats, anthropic_request, stable_prefix
+
+
+def blocks(*specs):
+    return [{"text": text, "kind": kind, "cacheable": cacheable} for text, kind, cacheable in specs]
+
+
+def test_anthropic_request_places_breakpoints_on_stable_prefix():
+    context = blocks(
+        ("World bible", "bible", True),
+        ("Chapter 1", "chapter", True),
+        ("Chapter 2", "chapter", True),
+        ("Chapter 3", "chapter", False),
+    )
+    system, messages = anthropic_request("Be helpful", "Continue", blocks=context)
+
+    assert system[0]["cache_control"] == {"type": "ephemeral"}
+    content = messages[0]["content"]
+    marked = [part["text"].strip() for part in content if "cache_control" in part]
+    # After the bible and after the last stable chapter; never on volatile text
+    assert marked == ["World bible", "Chapter 2"]
+    assert content[-1] == {"type": "text", "text": "Continue"}
+
+
+def test_stable_prefix_stops_at_first_volatile_block():
+    assert stable_prefix(blocks(("a", "bible", True), ("b", "chapter", False), ("c", "notes", True))) == 1
+    assert stable_prefix(None) == 0
+
+
+def test_stats_savings_and_hit_rate(monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_CACHE_READ_DISCOUNT", {"claude": 0.9})
+    monkeypatch.setattr(settings, "PROMPT_CACHE_WRITE_PREMIUM", {"claude": 0.25})
+    stats = PromptCacheStats(max_stories=1)
+
+    stats.record("claude", 1000, cache_write_tokens=800, story_id="s1")
+    stats.record("claude", 1000, cached_tokens=800, story_id="s1")
+    totals = stats.metrics()["providers"]["claude"]
+    assert totals["requests"] == 2
+    assert totals["hit_rate"] == 0.4
+    assert totals["saved_tokens"] == 800 * 0.9 - 800 * 0.25
+
+    stats.record("claude", 10, story_id="s2")
+    assert stats.story("s1") is None  # evicted past max_stories
+    assert stats.story("s2")["requests"] == 1
+
+
+@pytest.mark.asyncio
+async def test_repeat_generation_for_story_reads_prefix_from_cache(monkeypatch):
+    from app.main import app
+    from app.api.v1 import generate as generate_module
+    from app.services.provider_registry import provider_registry
+
+    async def fake_run_analysis(text: str):
+        return None
+
+    fake = FakeService(reply="Generated")
+    monkeypatch.setattr(generate_module, "_run_analysis", fake_run_analysis)
+    monkeypatch.setitem(provider_registry._instances, "groq", fake)
+
+    def request(prompt, latest):
+        return {
+            "prompt": prompt,
+            "story_id": "story-cache",
+            "use_cache": False,
+            "context_pieces": [
+                {"name": "bible", "text": "The kingdom of Ash. " * 50, "kind": "bible", "priority": 5},
+                {"name": "ch1", "text": "Chapter one. " * 50, "kind": "chapter", "cacheable": True},
+                {"name": "latest", "text": latest, "kind": "chapter"},
+            ],
+        }
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        first = await ac.post("/api/v1/generate?model=groq", json=request("Write on", "Chapter two."))
+        second = await ac.post("/api/v1/generate?model=groq", json=request("Write more", "Chapter two, revised."))
+        stats = await ac.get("/api/v1/prompt-cache/story-cache")
+        missing = await ac.get("/api/v1/prompt-cache/unknown-story")
+
+    assert first.status_code == 200 and second.status_code == 200
+    data = stats.json()
+    assert data["requests"] == 2
+    # Only the second request can reuse the bible and first chapter
+    assert 0 < data["cached_tokens"] < data["input_tokens"] / 2
+    assert missing.status_code == 404
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+LATENCY = 0.2
+PARALLEL = 8
+
+
+class FakeChatStream:
+    def __init__(self, pieces):
+        self._pieces = list(pieces)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._pieces:
+            raise StopAsyncIteration
+        await asyncio.sleep(LATENCY / 4)
+        piece = self._pieces.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+
+class FakeChatCompletions:
+    async def create(self, stream=False, **kwargs):
+        if stream:
+            return FakeChatStream(["Once ", "upon ", "a ", "time"])
+        await asyncio.sleep(LATENCY)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Generated"))])
+
+
+class FakeMessageStream:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for piece in ["Once ", "upon ", "a ", "time"]:
+            await asyncio.sleep(LATENCY / 4)
+            yield piece
+
+
+class FakeMessages:
+    async def create(self, **kwargs):
+        await asyncio.sleep(LATENCY)
+        return SimpleNamespace(content=[SimpleNamespace(text="Generated")])
+
+    def stream(self, **kwargs):
+        return FakeMessageStream()
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+
+    from app.services.anthropic_service import anthropic_service
+    from app.services.groq_service import groq_service
+    from app.services.openai_service import openai_service
+
+    chat_client = SimpleNamespace(chat=SimpleNamespace(completions=FakeChatCompletions()))
+    monkeypatch.setattr(groq_service, "client", chat_client)
+    monkeypatch.setattr(openai_service, "client", chat_client)
+    monkeypatch.setattr(anthropic_service, "client", SimpleNamespace(messages=FakeMessages()))
+    return [groq_service, openai_service, anthropic_service]
+
+
+async def _collect(stream):
+    return "".join([piece async for piece in stream])
+
+
+@pytest.mark.asyncio
+async def test_parallel_generations_do_not_serialize(providers):
+    for service in providers:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(service.generate_content(prompt=f"prompt {i}") for i in range(PARALLEL))
+        )
+        elapsed = time.perf_counter() - start
+        assert results == ["Generated"] * PARALLEL
+        # Serialized calls would take PARALLEL * LATENCY; concurrent ones about LATENCY.
+        assert elapsed < LATENCY * PARALLEL / 2, f"{type(service).__name__} took {elapsed:.2f}s"
+
+
+@pytest.mark.asyncio
+async def test_parallel_streams_do_not_block_event_loop(providers):
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker_task = asyncio.create_task(ticker())
+    try:
+        for service in providers:
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(_collect(service.generate_content_stream(prompt="p")) for _ in range(PARALLEL))
+            )
+            elapsed = time.perf_counter() - start
+            assert results == ["Once upon a time"] * PARALLEL
+            assert elapsed < LATENCY * PARALLEL / 2, f"{type(service).__name__} took {elapsed:.2f}s"
+    finally:
+        ticker_task.cancel()
+    # The loop kept servicing other tasks while the streams were running.
+    assert ticks > 10
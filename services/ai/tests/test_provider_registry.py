@@ -0,0 +1,97 @@
+import pytest
+
+from app.core import settings
+from app.services.fake_service import FakeService
+from app.services.provider_registry import ProviderRegistry
+
+
+def make_registry(**providers):
+    registry = ProviderRegistry(default="claude")
+    for name, provider in providers.items():
+        registry.register(name, provider)
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_aliases_and_unknown_names_resolve():
+    registry = make_registry(gpt=FakeService(), claude=FakeService())
+    registry.register("gpt", registry.get("gpt"), aliases=("openai",))
+    assert registry.resolve("openai") == "gpt"
+    assert registry.resolve("something-else") == "claude"
+
+
+@pytest.mark.asyncio
+async def test_failover_to_next_provider():
+    broken = FakeService(fail_with=RuntimeError("boom"))
+    healthy = FakeService(reply="from claude")
+    registry = make_registry(groq=broken, claude=healthy)
+
+    result = await registry.generate("groq", prompt="Hi")
+    assert result.provider == "claude"
+    assert result.content == "from claude"
+    assert registry.stats["groq"].error_rate == 1.0
+
+
+@pytest.mark.asyncio
+async def test_failover_on_timeout(monkeypatch):
+    monkeypatch.setattr(settings, "PROVIDER_TIMEOUT", 0.05)
+    registry = make_registry(groq=FakeService(latency=1.0), claude=FakeService(reply="fast"))
+
+    result = await registry.generate("groq", prompt="Hi")
+    assert result.provider == "claude"
+
+
+@pytest.mark.asyncio
+async def test_no_fallback_raises():
+    registry = make_registry(groq=FakeService(fail_with=RuntimeError("boom")), claude=FakeService())
+    with pytest.raises(RuntimeError):
+        await registry.generate("groq", prompt="Hi", fallback=False)
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_takes_faster_provider(monkeypatch):
+    monkeypatch.setattr(settings, "PROVIDER_HEDGE_DELAY", 0.05)
+    slow = FakeService(latency=1.0, reply="slow")
+    fast = FakeService(latency=0.01, reply="fast")
+    registry = make_registry(groq=slow, claude=fast)
+
+    result = await registry.generate("groq", prompt="Hi", hedge=True)
+    assert result.provider == "claude"
+    assert result.content == "fast"
+    assert slow.calls == 1 and fast.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_not_fired_when_primary_is_fast(monkeypatch):
+    monkeypatch.setattr(settings, "PROVIDER_HEDGE_DELAY", 0.5)
+    primary = FakeService(reply="primary")
+    backup = FakeService(reply="backup")
+    registry = make_registry(groq=primary, claude=backup)
+
+    result = await registry.generate("groq", prompt="Hi", hedge=True)
+    assert result.provider == "groq"
+    assert backup.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_hedge_partner_is_tried_when_primary_fails_fast(monkeypatch):
+    monkeypatch.setattr(settings, "PROVIDER_HEDGE_DELAY", 0.5)
+    broken = FakeService(fail_with=RuntimeError("boom"))
+    backup = FakeService(reply="backup")
+    registry = make_registry(groq=broken, claude=backup)
+
+    result = await registry.generate("groq", prompt="Hi", hedge=True)
+    assert result.provider == "claude"
+    assert result.content == "backup"
+    assert broken.calls == 1 and backup.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_auto_routes_to_fastest_observed_provider():
+    registry = make_registry(groq=FakeService(latency=0.05), gpt=FakeService(latency=0.0), claude=FakeService(latency=0.02))
+    for name in ("groq", "gpt", "claude"):
+        await registry.generate(name, prompt="warmup", fallback=False)
+
+    assert registry.route("auto") == ["gpt", "claude", "groq"]
+    result = await registry.generate("auto", prompt="Hi")
+    assert result.provider == "gpt"
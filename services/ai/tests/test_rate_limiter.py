@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from app.core import settings
+from app.services.provider_limiter import ProviderLimiter
+from app.services.rate_limiter import MemoryBuckets, RateLimited, RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_buckets_charge_all_or_nothing_and_refill():
+    buckets = MemoryBuckets()
+    requests = ("t:requests", 2.0, 1.0, 1.0)
+
+    assert await buckets.take([requests, ("t:tokens", 100.0, 10.0, 60.0)], now=0) == 0
+    # The token bucket cannot pay, so the request bucket is not charged either
+    assert await buckets.take([requests, ("t:tokens", 100.0, 10.0, 60.0)], now=0) == pytest.approx(2.0)
+    assert await buckets.take([requests], now=0) == 0
+    assert await buckets.take([requests], now=0) == pytest.approx(1.0)
+    assert await buckets.take([requests], now=1.0) == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_refunds_unused_tokens_and_caps_concurrency():
+    limiter = RateLimiter(requests_per_minute=100, tokens_per_minute=6000, max_concurrency=1)
+
+    lease = await limiter.admit("alice", tokens=5000)
+    with pytest.raises(RateLimited) as exc:
+        await limiter.admit("alice", tokens=10)
+    assert exc.value.headers == {"Retry-After": "1"}
+    await limiter.admit("bob", tokens=10)  # other tenants are unaffected
+
+    await lease.release(used_tokens=1000)
+    second = await limiter.admit("alice", tokens=5000)  # fits again after the refund
+    await second.release()
+    with pytest.raises(RateLimited) as exc:
+        await limiter.admit("alice", tokens=5000)
+    assert exc.value.retry_after > 30
+
+
+@pytest.mark.asyncio
+async def test_limiter_falls_back_to_memory_when_redis_fails():
+    class BrokenRedis:
+        async def take(self, buckets, now):
+            raise ConnectionError("redis down")
+
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=0)
+    limiter.redis = BrokenRedis()
+    await (await limiter.admit("alice", tokens=0)).release()
+    with pytest.raises(RateLimited):
+        await limiter.admit("alice", tokens=0)
+    assert limiter.counters["redis_errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_provider_slots_are_shared_round_robin_between_tenants():
+    limiter = ProviderLimiter(default=1)
+    served = []
+    release = asyncio.Event()
+
+    async def call(tenant, label):
+        async with limiter.slot("groq", tenant):
+            served.append(label)
+            if label == "a0":
+                await release.wait()
+
+    first = asyncio.create_task(call("a", "a0"))
+    await asyncio.sleep(0)
+    queued = [asyncio.create_task(call("a", f"a{i}")) for i in (1, 2, 3)]
+    await asyncio.sleep(0)
+    queued.append(asyncio.create_task(call("b", "b1")))
+    await asyncio.sleep(0)
+    assert limiter.metrics()["groq"]["waiting"] == 4
+
+    release.set()
+    await asyncio.gather(first, *queued)
+    assert served == ["a0", "a1", "b1", "a2", "a3"]
+    assert limiter.metrics()["groq"]["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_generate_rejects_over_limit_with_retry_after(monkeypatch):
+    from app.main import app
+    from app.api.v1 import generate as generate_module
+    from app.services.fake_service import FakeService
+    from app.services.provider_registry import provider_registry
+
+    async def fake_run_analysis(text: str):
+        return None
+
+    monkeypatch.setattr(generate_module, "_run_analysis", fake_run_analysis)
+    monkeypatch.setattr(generate_module, "rate_limiter", RateLimiter(requests_per_minute=1))
+    monkeypatch.setattr(settings, "SERVICE_TOKEN", "internal")
+    monkeypatch.setitem(provider_registry._instances, "groq", FakeService(reply="ok"))
+
+    body = {"prompt": "Hello", "use_cache": False}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        def as_user(user):
+            return {"X-User-Id": user, "X-Service-Token": "internal"}
+
+        first = await ac.post("/api/v1/generate?model=groq", json=body, headers=as_user("alice"))
+        limited = await ac.post("/api/v1/generate?model=groq", json=body, headers=as_user("alice"))
+        other = await ac.post("/api/v1/generate?model=groq", json=body, headers=as_user("bob"))
+
+    assert first.status_code == 200
+    assert limited.status_code == 429
+    assert 1 <= int(limited.headers["Retry-After"]) <= 60
+    assert other.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_tenant_ignores_user_header_without_service_token(monkeypatch):
+    from app.main import app
+    from app.api.v1 import generate as generate_module
+    from app.services.fake_service import FakeService
+    from app.services.provider_registry import provider_registry
+
+    async def fake_run_analysis(text: str):
+        return None
+
+    monkeypatch.setattr(generate_module, "_run_analysis", fake_run_analysis)
+    monkeypatch.setattr(generate_module, "rate_limiter", RateLimiter(requests_per_minute=1))
+    monkeypatch.setattr(settings, "SERVICE_TOKEN", "internal")
+    monkeypatch.setattr(settings, "TRUST_FORWARDED_FOR", True)
+    monkeypatch.setitem(provider_registry._instances, "groq", FakeService(reply="ok"))
+
+    body = {"prompt": "Hello", "use_cache": False}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        first = await ac.post("/api/v1/generate?model=groq", json=body, headers={
+            "X-User-Id": "alice", "X-Service-Token": "guess", "X-Forwarded-For": "10.0.0.7",
+        })
+        # A rotated user id and a spoofed first hop still land on the gateway's last hop
+        rotated = await ac.post("/api/v1/generate?model=groq", json=body, headers={
+            "X-User-Id": "mallory", "X-Forwarded-For": "1.2.3.4, 10.0.0.7",
+        })
+        neighbour = await ac.post("/api/v1/generate?model=groq", json=body, headers={"X-Forwarded-For": "10.0.0.8"})
+
+    assert first.status_code == 200
+    assert rotated.status_code == 429
+    assert neighbour.status_code == 200
@@ -0,0 +1,70 @@
+import pytest
+from httpx import AsyncClient
+
+from app.services.response_cache import MemoryLRU, ResponseCache, cache_key
+
+
+def test_cache_key_normalizes_whitespace():
+    a = cache_key("groq", "sys", "ctx\r\nline  ", "prompt ", max_tokens=10)
+    b = cache_key("groq", "sys", "ctx\nline", "prompt", max_tokens=10)
+    assert a == b
+    assert a != cache_key("groq", "sys", "ctx\nline", "prompt", max_tokens=20)
+    assert a != cache_key("claude", "sys", "ctx\nline", "prompt", max_tokens=10)
+
+
+def test_memory_lru_evicts_by_size_and_ttl():
+    lru = MemoryLRU(max_entries=2, max_bytes=100, ttl=60)
+    lru.set("a", "1")
+    lru.set("b", "2")
+    assert lru.get("a") == "1"
+    lru.set("c", "3")
+    assert lru.get("b") is None
+    assert lru.evictions == 1
+
+    lru.set("big", "x" * 99)
+    assert lru.get("a") is None
+    assert lru.get("big") is not None
+    assert lru.bytes <= 100
+
+    expired = MemoryLRU(max_entries=2, max_bytes=100, ttl=-1)
+    expired.set("a", "1")
+    assert expired.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_response_cache_counters():
+    cache = ResponseCache(max_entries=4)
+    assert await cache.get("k") is None
+    await cache.set("k", {"content": "x"})
+    assert await cache.get("k") == {"content": "x"}
+    metrics = cache.metrics()
+    assert metrics["hits"] == 1 and metrics["misses"] == 1 and metrics["hit_ratio"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_generate_serves_repeat_requests_from_cache(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    from app.main import app
+    from app.services.groq_service import groq_service
+    from app.services.response_cache import response_cache
+
+    calls = []
+
+    async def fake_generate_content(*args, **kwargs):
+        calls.append(kwargs)
+        return "Cached content"
+
+    monkeypatch.setattr(groq_service, "generate_content", fake_generate_content)
+    response_cache.clear()
+
+    body = {"prompt": "Cache me", "context": "Earlier"}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        first = await ac.post("/api/v1/generate", json=body)
+        second = await ac.post("/api/v1/generate", json={**body, "prompt": "Cache me  "})
+        bypass = await ac.post("/api/v1/generate", json={**body, "use_cache": False})
+
+    assert first.json() == second.json() == bypass.json()
+    assert len(calls) == 2
+    response_cache.clear()
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from app.services.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("key", upstream) for _ in range(10)))
+    assert results == ["result"] * 10
+    assert calls == 1
+    assert flight.metrics()["coalesced"] == 9
+    assert flight.metrics()["in_flight"] == 0
+
+    await flight.do("key", upstream)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters():
+    flight = SingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    results = await asyncio.gather(*(flight.do("key", upstream) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.create_task(flight.do("key", upstream))
+    second = asyncio.create_task(flight.do("key", upstream))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == "done"
+
+
+@pytest.mark.asyncio
+async def test_late_stream_joiner_gets_stream_from_start():
+    flight = SingleFlight()
+    starts = 0
+
+    async def upstream():
+        nonlocal starts
+        starts += 1
+        for token in ["a", "b", "c", "d"]:
+            await asyncio.sleep(0.02)
+            yield token
+
+    async def collect(stream):
+        return [chunk async for chunk in stream]
+
+    early = asyncio.create_task(collect(flight.stream("key", upstream)))
+    await asyncio.sleep(0.05)
+    late = asyncio.create_task(collect(flight.stream("key", upstream)))
+
+    assert await early == ["a", "b", "c", "d"]
+    assert await late == ["a", "b", "c", "d"]
+    assert starts == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_upstream_cancelled_when_all_subscribers_leave():
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def upstream():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield "tok"
+        finally:
+            cancelled.set()
+
+    stream = flight.stream("key", upstream)
+    assert await stream.__anext__() == "tok"
+    await stream.aclose()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert flight.metrics()["streams_in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_generate_endpoint_coalesces_duplicates(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    from app.main import app
+    from app.services.groq_service import groq_service
+    from app.services.response_cache import response_cache
+
+    calls = 0
+
+    async def slow_generate(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "Shared"
+
+    monkeypatch.setattr(groq_service, "generate_content", slow_generate)
+    response_cache.clear()
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        responses = await asyncio.gather(
+            *(ac.post("/api/v1/generate", json={"prompt": "Burst"}) for _ in range(5))
+        )
+
+    assert [r.json()["content"] for r in responses] == ["Shared"] * 5
+    assert calls == 1
+    response_cache.clear()
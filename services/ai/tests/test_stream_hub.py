@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.services.stream_hub import StreamGone, StreamHub, format_event, parse_event_id
+
+
+async def tokens(words, delay=0.0, fail=None):
+    for word in words:
+        if delay:
+            await asyncio.sleep(delay)
+        yield word
+    if fail:
+        raise fail
+
+
+def test_event_framing_and_ids():
+    assert format_event("a\nb", event_id="s:3", event="error") == "id: s:3\nevent: error\ndata: a\ndata: b\n\n"
+    assert parse_event_id("abc:12") == ("abc", 12)
+    assert parse_event_id("abc") is None
+    assert parse_event_id(None) is None
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_coalesced_into_frames():
+    hub = StreamHub(frame_chars=10, frame_delay=1.0)
+    stream_id = hub.start(tokens(["ab", "cd", "ef", "gh", "ij", "k"]))
+    frames = [frame async for frame in hub.follow(stream_id)]
+
+    assert frames[0].startswith(f"id: {stream_id}:1\n")
+    assert '"content":"abcdefghij"' in frames[0]
+    assert '"content":"k"' in frames[1]
+    assert '"done":true' in frames[-1]
+    assert len(frames) == 3
+
+
+@pytest.mark.asyncio
+async def test_slow_tokens_are_flushed_after_the_delay():
+    hub = StreamHub(frame_chars=1000, frame_delay=0.01)
+    stream_id = hub.start(tokens(["one ", "two "], delay=0.05))
+    frames = [frame async for frame in hub.follow(stream_id)]
+    assert [f for f in frames if '"done":false' in f] == [frames[0], frames[1]]
+
+
+@pytest.mark.asyncio
+async def test_resume_replays_missed_frames_and_pump_waits_for_reader():
+    hub = StreamHub(frame_chars=1, high_water=2, replay_frames=8)
+    stream_id = hub.start(tokens(list("abcdef")))
+
+    first = hub.follow(stream_id)
+    seen = [await first.__anext__(), await first.__anext__()]
+    await first.aclose()  # client drops after two frames
+    await asyncio.sleep(0.01)
+    # The pump ran at most high_water frames ahead of what was delivered.
+    assert hub._streams[stream_id].last_seq <= 4
+
+    rest = [frame async for frame in hub.follow(stream_id, after=2)]
+    contents = [f for f in seen + rest if '"done":false' in f]
+    assert [c.split('"content":"')[1][0] for c in contents] == list("abcdef")
+    assert hub.metrics()["resumed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_or_expired_streams_are_gone_and_errors_are_framed():
+    hub = StreamHub(frame_chars=1, high_water=1, replay_frames=2)
+    with pytest.raises(StreamGone):
+        hub.follow("missing")
+
+    stream_id = hub.start(tokens(list("xyz"), fail=RuntimeError("provider down")))
+    frames = [frame async for frame in hub.follow(stream_id)]
+    assert "event: error" in frames[-1] and "provider down" in frames[-1]
+    with pytest.raises(StreamGone):
+        hub.follow(stream_id, after=0)  # early frames rotated out of the ring
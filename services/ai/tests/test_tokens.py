@@ -0,0 +1,67 @@
+import base64
+
+import pytest
+
+from app import tokens
+from app.tokens import IncrementalCounter, Tokenizer, count_tokens, encoding_for_model, truncate_to_tokens
+
+PROSE = (
+    "Mira stepped into the observatory. The lenses hummed, and the quantum "
+    "anomaly flickered across the extraordinarily polished brass.\n\n"
+    "\"It's waking up,\" she whispered. 隐藏指导 remained hidden."
+)
+
+
+def test_models_map_to_encodings():
+    assert encoding_for_model("gpt-4o-mini") == "o200k_base"
+    assert encoding_for_model("claude-3-opus-20240229") == "cl100k_base"
+    assert encoding_for_model(None) == tokens.DEFAULT_ENCODING
+
+
+def test_estimate_is_close_to_word_based_reality():
+    count = count_tokens(PROSE)
+    words = len(PROSE.split())
+    assert words <= count <= words * 2
+    assert count_tokens("") == 0
+
+
+def test_counts_are_cached_by_text_hash():
+    tokenizer = Tokenizer("cl100k_base", cache_size=2)
+    tokenizer.count("one")
+    tokenizer.count("two")
+    tokenizer.count("three")
+    assert len(tokenizer._cache) == 2
+
+
+def test_incremental_counter_matches_full_count():
+    tokenizer = Tokenizer("cl100k_base")
+    counter = IncrementalCounter(tokenizer)
+    for word in PROSE.split(" "):
+        counter.append(word + " ")
+    assert counter.total == tokenizer.count(PROSE + " ")
+
+
+def test_truncate_keeps_most_recent_text_within_budget():
+    truncated = truncate_to_tokens(PROSE, 10)
+    assert PROSE.endswith(truncated)
+    assert count_tokens(truncated) <= 10
+    assert truncate_to_tokens(PROSE, 10, keep="start") == PROSE[: len(truncate_to_tokens(PROSE, 10, keep="start"))]
+    assert truncate_to_tokens("short", 100) == "short"
+
+
+def test_exact_counts_from_offline_vocabulary(tmp_path, monkeypatch):
+    pytest.importorskip("tiktoken")
+    # A byte-level vocabulary: every byte is its own token.
+    lines = [f"{base64.b64encode(bytes([b])).decode()} {b}" for b in range(256)]
+    (tmp_path / "cl100k_base.tiktoken").write_text("\n".join(lines) + "\n")
+    monkeypatch.setenv("TOKENIZER_VOCAB_DIR", str(tmp_path))
+
+    tokenizer = Tokenizer("cl100k_base")
+    assert tokenizer.exact
+    assert tokenizer.count("hello") == 5
+    assert tokenizer.truncate("hello world", 5) == "world"
+
+    counter = IncrementalCounter(tokenizer)
+    counter.append("hello ")
+    counter.append("world")
+    assert counter.total == 11
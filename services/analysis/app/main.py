@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.core import settings
 from pydantic import BaseModel
+from typing import List
 from app.services.analysis_engine import AnalysisEngine
 
 @asynccontextmanager
@@ -22,6 +23,10 @@ class TextRequest(BaseModel):
     text: str
 
 
+class BatchRequest(BaseModel):
+    texts: List[str]
+
+
 @app.post("/api/v1/analyze/characters")
 async def analyze_characters(request: TextRequest):
     try:
@@ -38,3 +43,20 @@ async def analyze_plot(request: TextRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+
+@app.post("/api/v1/analyze/batch")
+async def analyze_batch(request: BatchRequest):
+    """Run character and plot analysis over several texts in one call."""
+    try:
+        return {
+            "results": [
+                {
+                    "characters": AnalysisEngine.extract_characters(text),
+                    "plot": AnalysisEngine.analyze_plot(text),
+                }
+                for text in request.texts
+            ]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
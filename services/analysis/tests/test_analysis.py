@@ -20,3 +20,14 @@ async def test_plot_analysis():
     data = resp.json()
     assert "summary" in data and data["summary"]
     assert data["sentence_count"] == 3
+
+@pytest.mark.asyncio
+async def test_batch_analysis():
+    texts = ["Alice met Bob. They talked.", "Charlie left."]
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.post("/api/v1/analyze/batch", json={"texts": texts})
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert len(results) == 2
+    assert "Alice" in results[0]["characters"]
+    assert results[1]["plot"]["sentence_count"] == 1
@@ -1,13 +1,13 @@
 import time
 from typing import Any, Dict, Iterable
 
-import httpx
 from fastapi import HTTPException
 from jose import jwk, jwt
 from jose.exceptions import JWTError
 from jose.utils import base64url_decode
 
 from app.core import settings
+from app.http_client import service_clients
 
 _JWKS_CACHE: Dict[str, Any] | None = None
 _JWKS_EXPIRES_AT: float = 0.0
@@ -20,10 +20,9 @@ async def _fetch_jwks() -> Dict[str, Any]:
     if not settings.CLOUDFLARE_ACCESS_TEAM_DOMAIN:
         raise HTTPException(status_code=503, detail="Cloudflare Access team domain not configured")
     url = f"https://{settings.CLOUDFLARE_ACCESS_TEAM_DOMAIN}/cdn-cgi/access/certs"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, timeout=10.0)
-        response.raise_for_status()
-        data = response.json()
+    response = await service_clients.get("cloudflare").get(url)
+    response.raise_for_status()
+    data = response.json()
     _JWKS_CACHE = data
     _JWKS_EXPIRES_AT = time.time() + 3600
     return data
@@ -21,6 +21,13 @@ class Settings(BaseSettings):
     CLOUDFLARE_ACCESS_EMAIL_CLAIM: str = "email"
     CLOUDFLARE_ACCESS_ALLOWED_EMAILS: list[str] = Field(default_factory=list)
     CLOUDFLARE_ACCESS_ALLOWED_DOMAINS: list[str] = Field(default_factory=list)
+    HTTP_TIMEOUT: float = 10.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = True
+    HTTP_UPSTREAM_MAX_CONNECTIONS: dict[str, int] = Field(default_factory=dict)
 
     @field_validator(
         "CLOUDFLARE_ACCESS_ALLOWED_EMAILS", "CLOUDFLARE_ACCESS_ALLOWED_DOMAINS", mode="before"
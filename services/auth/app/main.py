@@ -11,6 +11,7 @@ from uuid import uuid4
 
 from app.core import settings
 from app.cloudflare import verify_access_token
+from app.http_client import service_clients
 from app.schemas import UserCreate, Token
 from app.db.database import Base, engine, get_db
 from app.models.user import User
@@ -20,6 +21,7 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield
+    await service_clients.aclose()
 
 app = FastAPI(title="Quantum Writer Auth Service", version="2.0.0", docs_url="/api/docs", redoc_url="/api/redoc", lifespan=lifespan)
 
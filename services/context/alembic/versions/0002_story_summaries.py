@@ -0,0 +1,29 @@
+"""Hierarchical story summaries"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'story_summaries',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('story_id', sa.String(), nullable=False),
+        sa.Column('level', sa.String(length=16), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('base', sa.Text()),
+        sa.Column('token_count', sa.Integer(), nullable=False),
+        sa.Column('source_tokens', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True)),
+        sa.UniqueConstraint('story_id', 'level', 'position', name='uq_story_summary_node'),
+    )
+    op.create_index('ix_story_summaries_story_id', 'story_summaries', ['story_id'])
+
+def downgrade():
+    op.drop_index('ix_story_summaries_story_id', table_name='story_summaries')
+    op.drop_table('story_summaries')
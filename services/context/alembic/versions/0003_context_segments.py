@@ -0,0 +1,26 @@
+"""Append-only context segment log"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'context_segments',
+        sa.Column('seq', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('story_id', sa.String(), nullable=False),
+        sa.Column('chapter', sa.Integer()),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('token_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_context_segments_story_seq', 'context_segments', ['story_id', 'seq'])
+    op.add_column('story_contexts', sa.Column('compacted_seq', sa.BigInteger(), nullable=False, server_default='0'))
+
+def downgrade():
+    op.drop_column('story_contexts', 'compacted_seq')
+    op.drop_index('ix_context_segments_story_seq', table_name='context_segments')
+    op.drop_table('context_segments')
@@ -0,0 +1,29 @@
+"""Per-segment compacted flag
+
+Compaction used a per-story high-water mark, which skips a segment whose
+transaction commits after one with a higher seq was folded. Segments are
+now marked individually; everything at or below the old mark is marked
+compacted.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('context_segments', sa.Column('compacted', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.execute("""
+        UPDATE context_segments SET compacted = true
+        WHERE seq <= (SELECT compacted_seq FROM story_contexts WHERE story_contexts.story_id = context_segments.story_id)
+    """)
+    op.create_index(
+        'ix_context_segments_pending', 'context_segments', ['story_id', 'seq'],
+        postgresql_where=sa.text('NOT compacted'), sqlite_where=sa.text('NOT compacted'),
+    )
+
+def downgrade():
+    op.drop_index('ix_context_segments_pending', table_name='context_segments')
+    op.drop_column('context_segments', 'compacted')
@@ -0,0 +1,110 @@
+"""Circuit breaker guarding calls to the external vector store.
+
+``closed``
+    Calls go through; ``failure_threshold`` consecutive failures open it.
+``open``
+    Calls are refused until the backoff expires. Each failed probe doubles
+    the backoff up to ``max_delay``, with jitter so replicas do not probe
+    in lockstep.
+``half_open``
+    Exactly one probe call is let through. Success closes the breaker;
+    failure opens it again with a longer backoff. A probe that has not
+    reported back within ``probe_timeout`` (cancelled, or lost on an error
+    path) counts as a failure, so the breaker cannot stick half open.
+"""
+from __future__ import annotations
+
+import random
+import time
+from typing import Callable, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        jitter: float = 0.2,
+        probe_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.probe_timeout = probe_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.reopened = 0  # failed probes since the breaker last closed
+        self.retry_at = 0.0
+        self.probe_deadline = 0.0
+        self.last_error: Optional[str] = None
+        self.counters = {"opened": 0, "probes": 0, "recovered": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        """Whether a call may go to the vector store now.
+
+        In ``open`` state, the first caller after the backoff becomes the
+        probe; everyone else is refused until it reports back.
+        """
+        if self.state == CLOSED:
+            return True
+        now = self.clock()
+        if self.state == HALF_OPEN and now >= self.probe_deadline:
+            self.last_error = "probe did not report back"
+            self.reopened += 1
+            self._open()
+        if self.state == OPEN and now >= self.retry_at:
+            self.state = HALF_OPEN
+            self.probe_deadline = now + self.probe_timeout
+            self.counters["probes"] += 1
+            return True
+        self.counters["rejected"] += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            self.counters["recovered"] += 1
+        self.state = CLOSED
+        self.failures = 0
+        self.reopened = 0
+        self.last_error = None
+
+    def record_failure(self, error: Optional[BaseException] = None) -> None:
+        self.failures += 1
+        if error is not None:
+            self.last_error = str(error) or type(error).__name__
+        if self.state == HALF_OPEN:
+            self.reopened += 1
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def trip(self, error: Optional[BaseException] = None) -> None:
+        """Open immediately, e.g. when the store is unreachable at startup."""
+        if error is not None:
+            self.last_error = str(error) or type(error).__name__
+        if self.state != OPEN:
+            self._open()
+
+    def _open(self) -> None:
+        delay = min(self.max_delay, self.base_delay * (2 ** self.reopened))
+        delay *= 1 + random.uniform(0, self.jitter)
+        self.state = OPEN
+        self.retry_at = self.clock() + delay
+        self.counters["opened"] += 1
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            **self.counters,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in": max(0.0, round(self.retry_at - self.clock(), 3)) if self.state == OPEN else 0.0,
+            "last_error": self.last_error,
+        }
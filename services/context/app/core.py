@@ -2,12 +2,15 @@ from __future__ import annotations
 
 from pydantic_settings import BaseSettings
 
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
 import asyncio
-import hashlib
 import logging
 import uuid
 
+from app.breaker import CLOSED, CircuitBreaker
+from app.lexical import fuse, lexical_index
+from app.outbox import Outbox
+
 try:
     from qdrant_client import AsyncQdrantClient
     from qdrant_client.http import models as qmodels
@@ -26,7 +29,51 @@ class Settings(BaseSettings):
     MAX_CONTEXT_TOKENS: int = 4096
     VECTOR_DB_URL: Optional[str] = "http://localhost:6333"
     QDRANT_COLLECTION: str = "story_context"
-    EMBEDDING_SIZE: int = 8
+    # Embeddings: "hashing" (no model file), "onnx" or "sentence-transformers"
+    EMBEDDING_BACKEND: str = "hashing"
+    EMBEDDING_SIZE: int = 384  # hashing backend only; model backends use their own width
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_MODEL_PATH: Optional[str] = None
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_CACHE_SIZE: int = 10000
+
+    # In-process fallback vector index
+    VECTOR_INDEX_DIR: Optional[str] = "data/vector_index"
+    VECTOR_INDEX_IVF_THRESHOLD: int = 4096
+    VECTOR_INDEX_NPROBE: int = 8
+    VECTOR_INDEX_SNAPSHOT_INTERVAL: float = 30.0
+
+    # Qdrant circuit breaker and outbox of upserts made while it is down
+    VECTOR_STORE_FAILURE_THRESHOLD: int = 3
+    VECTOR_STORE_RETRY_DELAY: float = 1.0
+    VECTOR_STORE_MAX_RETRY_DELAY: float = 60.0
+    VECTOR_STORE_RECOVERY_INTERVAL: float = 5.0
+    VECTOR_STORE_PROBE_TIMEOUT: float = 30.0
+    VECTOR_OUTBOX_PATH: Optional[str] = "data/vector_outbox.jsonl"
+
+    # Hybrid search: "rrf" (reciprocal rank fusion) or "weighted"
+    SEARCH_FUSION: str = "rrf"
+    SEARCH_VECTOR_WEIGHT: float = 0.5
+    SEARCH_CANDIDATES: int = 4  # per-retriever candidates, as a multiple of the limit
+
+    # Bulk ingestion
+    INGEST_CHUNK_TOKENS: int = 512
+    INGEST_UPSERT_BATCH_SIZE: int = 256
+    INGEST_UPSERT_CONCURRENCY: int = 4
+    INGEST_MAX_SEGMENTS: int = 20000
+
+    # Hierarchical summaries
+    SUMMARIZER: str = "extractive"  # or "llm" to summarise through the AI service
+    SUMMARIZER_MODEL: str = "groq"
+    AI_SERVICE_URL: str = "http://ai-service:8000"
+    CHAPTERS_PER_ARC: int = 5
+    CHAPTER_SUMMARY_TOKENS: int = 400
+    ARC_SUMMARY_TOKENS: int = 600
+    STORY_SUMMARY_TOKENS: int = 800
+
+    # Segment log compaction
+    COMPACTION_BATCH_SIZE: int = 100
+    COMPACTION_DELAY: float = 1.0
 
     class Config:
         env_file = ".env"
@@ -35,8 +82,12 @@ class Settings(BaseSettings):
 settings = Settings()
 
 
-_fallback_segments: Dict[str, List[Dict[str, str]]] = {}
-_fallback_lock = asyncio.Lock()
+# Collection actually in use; suffixed when the configured one was created
+# with a different vector width.
+collection_name = settings.QDRANT_COLLECTION
+
+_fallback_index = None
+_outbox = None
 
 if AsyncQdrantClient is not None and settings.VECTOR_DB_URL:
     qdrant_client: Optional[AsyncQdrantClient] = AsyncQdrantClient(url=settings.VECTOR_DB_URL)
@@ -44,87 +95,193 @@ else:  # pragma: no cover - exercised when dependency missing
     qdrant_client = None
 
 
-async def _disable_qdrant(reason: str, exc: Optional[Exception] = None) -> None:
-    """Tear down the Qdrant client and fall back to the in-memory store."""
-    global qdrant_client
+breaker = CircuitBreaker(
+    failure_threshold=settings.VECTOR_STORE_FAILURE_THRESHOLD,
+    base_delay=settings.VECTOR_STORE_RETRY_DELAY,
+    max_delay=settings.VECTOR_STORE_MAX_RETRY_DELAY,
+    probe_timeout=settings.VECTOR_STORE_PROBE_TIMEOUT,
+)
+
+
+def _vector_store():
+    """The Qdrant client if it may be called now, else ``None``."""
     client = qdrant_client
-    if client is not None:
-        try:
-            await client.close()  # type: ignore[func-returns-value]
-        except Exception:  # pragma: no cover - best effort cleanup
-            pass
-    qdrant_client = None
-    if exc is not None:
-        logger.warning("Qdrant disabled (%s): %s", reason, exc)
+    if client is None or qmodels is None or not breaker.allow():
+        return None
+    return client
+
+
+def _record_failure(reason: str, exc: Exception) -> None:
+    """Count a failed Qdrant call; callers fall back for this request only."""
+    state = breaker.state
+    breaker.record_failure(exc)
+    if breaker.state != state:
+        logger.warning("Qdrant circuit %s (%s): %s", breaker.state, reason, exc)
     else:
-        logger.warning("Qdrant disabled (%s)", reason)
+        logger.info("Qdrant call failed (%s): %s", reason, exc)
 
 
-async def _store_fallback_segment(story_id: str, text: str, point_id: Optional[str] = None) -> str:
-    point_id = point_id or str(uuid.uuid4())
-    async with _fallback_lock:
-        segments = _fallback_segments.setdefault(story_id, [])
-        segments.append({"id": point_id, "text": text})
-    return point_id
+def get_outbox() -> Outbox:
+    global _outbox
+    if _outbox is None:
+        _outbox = Outbox(settings.VECTOR_OUTBOX_PATH)
+    return _outbox
 
 
-async def _search_fallback_segments(story_id: str, query: str, limit: int) -> List[Dict[str, float | str]]:
-    lowered = query.lower()
-    async with _fallback_lock:
-        segments = list(_fallback_segments.get(story_id, []))
-    scored = [
-        {"text": segment["text"], "score": 1.0 if lowered in segment["text"].lower() else 0.0}
-        for segment in segments
-    ]
-    scored.sort(key=lambda item: item["score"], reverse=True)
-    return scored[:limit]
+def get_fallback_index():
+    """In-process vector index serving searches while Qdrant is unavailable."""
+    global _fallback_index
+    if _fallback_index is None:
+        from app.embeddings import embedder
+        from app.vector_index import VectorIndex
+
+        _fallback_index = VectorIndex(
+            dimension=embedder.dimension,
+            snapshot_dir=settings.VECTOR_INDEX_DIR,
+            ivf_threshold=settings.VECTOR_INDEX_IVF_THRESHOLD,
+            nprobe=settings.VECTOR_INDEX_NPROBE,
+        )
+    return _fallback_index
+
+
+async def _store_degraded(story_id: str, texts: List[str], vectors: List[List[float]], point_ids: List[str]) -> None:
+    """Index in the fallback, and queue for Qdrant if one is configured."""
+    get_fallback_index().add(story_id, point_ids, texts, vectors)
+    if qdrant_client is not None and qmodels is not None:
+        await get_outbox().add(story_id, point_ids, texts)
+
+
+async def _search_fallback_segments(story_id: str, vector: List[float], limit: int) -> List[Dict[str, float | str]]:
+    results = get_fallback_index().search(story_id, vector, limit)
+    return [{"text": r["text"], "score": r["score"]} for r in results]
+
+
+async def snapshot_fallback_index(interval: Optional[float] = None) -> None:
+    """Persist the fallback index once, or every ``interval`` seconds until cancelled."""
+    while True:
+        if _fallback_index is not None:
+            pending = _fallback_index.collect_dirty()
+            await asyncio.to_thread(_fallback_index.write_snapshots, pending)
+        if interval is None:
+            return
+        await asyncio.sleep(interval)
 
 
 async def init_vector_store() -> None:
-    """Ensure the Qdrant collection exists or fall back to the in-memory store."""
+    """Ensure the Qdrant collection exists; open the breaker if it cannot."""
     client = qdrant_client
     if client is None or not settings.VECTOR_DB_URL or qmodels is None:
         logger.info("Vector store initialisation skipped; using in-memory fallback.")
         return
+    try:
+        await _ensure_collection(client)
+    except Exception as exc:
+        breaker.trip(exc)
+        logger.warning("Qdrant unavailable at startup, will retry: %s", exc)
+
 
+async def _ensure_collection(client) -> None:
+    global collection_name
+    from app.embeddings import embedder
+
+    dimension = embedder.dimension
     try:
-        await client.get_collection(settings.QDRANT_COLLECTION)
+        info = await client.get_collection(settings.QDRANT_COLLECTION)
+        existing = getattr(info.config.params.vectors, "size", None)
+        if existing != dimension:
+            # Vectors of different widths cannot share a collection; keep the
+            # old one intact and write to one named after the backend.
+            collection_name = f"{settings.QDRANT_COLLECTION}_{embedder.name}_{dimension}"
+            logger.warning(
+                "Collection %s has %s-d vectors but the %s embedder produces %s-d; using %s",
+                settings.QDRANT_COLLECTION, existing, embedder.name, dimension, collection_name,
+            )
+            await client.get_collection(collection_name)
     except Exception as exc:
         logger.debug("Qdrant collection lookup failed: %s", exc)
+        await client.create_collection(
+            collection_name=collection_name,
+            vectors_config=qmodels.VectorParams(
+                size=dimension,
+                distance=qmodels.Distance.COSINE,
+            ),
+        )
+
+
+async def _upsert_outbox_batch(entries: List[Dict[str, str]]) -> None:
+    vectors = await embed_texts([entry["text"] for entry in entries])
+    await qdrant_client.upsert(
+        collection_name=collection_name,
+        wait=True,
+        points=[
+            qmodels.PointStruct(id=e["id"], vector=v, payload={"story_id": e["story_id"], "text": e["text"]})
+            for e, v in zip(entries, vectors)
+        ],
+    )
+
+
+async def recover_vector_store() -> int:
+    """Probe Qdrant if the breaker allows it, then replay the outbox.
+
+    The probe re-checks the collection, recreating it if Qdrant came back
+    empty. Returns the number of replayed upserts.
+    """
+    outbox = get_outbox()
+    probing = breaker.state != CLOSED
+    if not probing and not len(outbox):
+        return 0
+    client = _vector_store()
+    if client is None:
+        return 0
+    try:
+        if probing:
+            await _ensure_collection(client)
+            breaker.record_success()
+            logger.info("Qdrant reachable again; circuit closed")
+        sent = await outbox.replay(_upsert_outbox_batch, batch_size=settings.INGEST_UPSERT_BATCH_SIZE)
+    except Exception as exc:
+        _record_failure("outbox replay", exc)
+        return 0
+    if sent:
+        logger.info("Replayed %s queued upserts to Qdrant", sent)
+    return sent
+
+
+async def run_vector_store_recovery(interval: float) -> None:
+    """Call :func:`recover_vector_store` every ``interval`` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
         try:
-            await client.create_collection(
-                collection_name=settings.QDRANT_COLLECTION,
-                vectors_config=qmodels.VectorParams(
-                    size=settings.EMBEDDING_SIZE,
-                    distance=qmodels.Distance.COSINE,
-                ),
-            )
-        except Exception as create_exc:
-            await _disable_qdrant("initialisation failed", create_exc)
+            await recover_vector_store()
+        except Exception as exc:  # pragma: no cover - keep the loop alive
+            logger.warning("Vector store recovery pass failed: %s", exc)
 
 
-def embed_text(text: str) -> List[float]:
-    """Deterministically embed text into a fixed-size vector."""
-    digest = hashlib.sha256(text.encode()).digest()
-    vec = [
-        int.from_bytes(digest[i * 4 : (i + 1) * 4], "little") / 2**32
-        for i in range(settings.EMBEDDING_SIZE)
-    ]
-    return vec
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embed a batch of texts with the configured backend."""
+    from app.embeddings import embedder
+
+    return await embedder.embed(texts)
+
+
+async def embed_text(text: str) -> List[float]:
+    return (await embed_texts([text]))[0]
 
 
 async def store_context_segment(story_id: str, text: str) -> str:
     """Store a single context segment and return its identifier."""
     point_id = str(uuid.uuid4())
-    client = qdrant_client
+    lexical_index.add(story_id, text)
+    vector = await embed_text(text)
 
-    if client is None or qmodels is None:
-        return await _store_fallback_segment(story_id, text, point_id)
+    client = _vector_store()
+    if client is None:
+        await _store_degraded(story_id, [text], [vector], [point_id])
+        return point_id
 
-    vector = embed_text(text)
     try:
         await client.upsert(
-            collection_name=settings.QDRANT_COLLECTION,
+            collection_name=collection_name,
             wait=True,
             points=[
                 qmodels.PointStruct(
@@ -134,36 +291,136 @@ async def store_context_segment(story_id: str, text: str) -> str:
                 )
             ],
         )
+        breaker.record_success()
+        return point_id
+    except Exception as exc:
+        _record_failure("upsert", exc)
+        await _store_degraded(story_id, [text], [vector], [point_id])
         return point_id
+
+
+async def store_context_segments(
+    story_id: str,
+    texts: List[str],
+    on_progress: Optional[Callable[[str, int], None]] = None,
+) -> List[str]:
+    """Store many segments: embed in batches and pipeline the upserts.
+
+    Every batch but the last is sent with ``wait=False`` (at most
+    ``INGEST_UPSERT_CONCURRENCY`` in flight). The last one goes with
+    ``wait=True`` once the others are acknowledged. Qdrant applies a
+    collection's updates in order, so that upsert is a barrier for the
+    whole set. ``on_progress(stage, count)`` reports ``embedded`` and
+    ``indexed`` counts as batches complete.
+    """
+    point_ids = [str(uuid.uuid4()) for _ in texts]
+    for text in texts:
+        lexical_index.add(story_id, text)
+
+    batch_size = settings.EMBEDDING_BATCH_SIZE
+    vectors: List[List[float]] = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(await embed_texts(texts[start : start + batch_size]))
+        if on_progress:
+            on_progress("embedded", len(vectors))
+
+    async def fallback() -> List[str]:
+        await _store_degraded(story_id, texts, vectors, point_ids)
+        if on_progress:
+            on_progress("indexed", len(texts))
+        return point_ids
+
+    client = _vector_store()
+    if client is None:
+        return await fallback()
+
+    batches = [
+        [
+            qmodels.PointStruct(id=point_ids[i], vector=vectors[i], payload={"story_id": story_id, "text": texts[i]})
+            for i in range(start, min(start + settings.INGEST_UPSERT_BATCH_SIZE, len(texts)))
+        ]
+        for start in range(0, len(texts), settings.INGEST_UPSERT_BATCH_SIZE)
+    ]
+    if not batches:
+        return point_ids
+    semaphore = asyncio.Semaphore(settings.INGEST_UPSERT_CONCURRENCY)
+    indexed = 0
+
+    async def upsert(points, wait: bool) -> None:
+        nonlocal indexed
+        async with semaphore:
+            await client.upsert(collection_name=collection_name, wait=wait, points=points)
+        indexed += len(points)
+        if on_progress:
+            on_progress("indexed", indexed)
+
+    try:
+        await asyncio.gather(*(upsert(points, wait=False) for points in batches[:-1]))
+        await upsert(batches[-1], wait=True)
+        breaker.record_success()
+        return point_ids
     except Exception as exc:
-        await _disable_qdrant("upsert failed", exc)
-        return await _store_fallback_segment(story_id, text, point_id)
+        _record_failure("batch upsert", exc)
+        return await fallback()
 
 
 async def search_story_segments(story_id: str, query: str, limit: int = 5):
     """Return the most similar segments for the given query."""
-    client = qdrant_client
+    vector = await embed_text(query)
 
-    if client is None or qmodels is None:
-        return await _search_fallback_segments(story_id, query, limit)
+    client = _vector_store()
+    if client is None:
+        return await _search_fallback_segments(story_id, vector, limit)
 
-    vector = embed_text(query)
     flt = qmodels.Filter(
         must=[qmodels.FieldCondition(key="story_id", match=qmodels.MatchValue(value=story_id))]
     )
     try:
         results = await client.search(
-            collection_name=settings.QDRANT_COLLECTION,
+            collection_name=collection_name,
             query_vector=vector,
             query_filter=flt,
             limit=limit,
             with_payload=True,
         )
+        breaker.record_success()
         return [
             {"text": r.payload.get("text", ""), "score": r.score}
             for r in results
         ]
     except Exception as exc:
-        await _disable_qdrant("search failed", exc)
-        return await _search_fallback_segments(story_id, query, limit)
-
+        _record_failure("search", exc)
+        return await _search_fallback_segments(story_id, vector, limit)
+
+
+
+async def hybrid_search(
+    story_id: str,
+    query: str,
+    limit: int = 5,
+    mode: str = "hybrid",
+    loader: Optional[Callable[[], Awaitable[Iterable[str]]]] = None,
+):
+    """Search segments by ``vector``, ``lexical`` (BM25) or fused ``hybrid`` ranking.
+
+    ``loader`` returns the story's segment texts and builds the BM25 shard
+    the first time a story is searched after a restart.
+    """
+    if mode == "vector":
+        return await search_story_segments(story_id, query, limit)
+
+    if loader is not None:
+        await lexical_index.ensure_loaded(story_id, loader)
+    candidates = limit * settings.SEARCH_CANDIDATES
+    lexical = lexical_index.search(story_id, query, candidates)
+    if mode == "lexical":
+        return lexical[:limit]
+
+    vector = await search_story_segments(story_id, query, candidates)
+    return fuse(
+        vector,
+        lexical,
+        limit,
+        method=settings.SEARCH_FUSION,
+        vector_weight=settings.SEARCH_VECTOR_WEIGHT,
+    )
@@ -0,0 +1,230 @@
+"""Local, batched text embeddings for segment search.
+
+Backends, selected by ``settings.EMBEDDING_BACKEND``:
+
+``hashing``
+    Signed feature hashing of words, word bigrams and character trigrams.
+    Needs no model file and no extra dependencies; captures lexical and
+    spelling similarity, not meaning.
+``onnx``
+    A sentence-embedding model exported to ONNX (for example
+    all-MiniLM-L6-v2), run on CPU with ``onnxruntime``; ``EMBEDDING_MODEL_PATH``
+    must contain ``model.onnx`` and ``tokenizer.json``.
+``sentence-transformers``
+    The same models through the ``sentence_transformers`` package.
+
+Model backends fall back to hashing if their dependencies or files are
+missing. Every backend is wrapped in a cache keyed by text hash, so
+re-embedding unchanged text is free.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import re
+import zlib
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from app.core import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer as HFTokenizer
+except ImportError:  # pragma: no cover - optional dependency
+    onnxruntime = None  # type: ignore
+    HFTokenizer = None  # type: ignore
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # pragma: no cover - optional dependency
+    SentenceTransformer = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else vector
+
+
+class Embedder:
+    """Turns texts into fixed-size, L2-normalised vectors."""
+
+    name = "base"
+    dimension: int
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def embed_one(self, text: str) -> List[float]:
+        return (await self.embed([text]))[0]
+
+
+class HashingEmbedder(Embedder):
+    name = "hashing"
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def _features(self, text: str) -> Counter:
+        words = [w.lower() for w in _WORD_RE.findall(text)]
+        features: Counter = Counter()
+        for word in words:
+            features["w:" + word] += 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                features["c:" + padded[i : i + 3]] += 0.25
+        for first, second in zip(words, words[1:]):
+            features[f"b:{first}_{second}"] += 0.5
+        return features
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for feature, weight in self._features(text).items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            vector[h % self.dimension] += sign * (1.0 + math.log(weight)) if weight >= 1 else sign * weight
+        return _normalize(vector)
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+
+class OnnxEmbedder(Embedder):
+    """Mean-pooled sentence embeddings from an ONNX transformer on CPU."""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, batch_size: int = 32, max_length: int = 256):
+        self.batch_size = batch_size
+        self.tokenizer = HFTokenizer.from_file(os.path.join(model_path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = max(1, (os.cpu_count() or 2) // 2)
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_path, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self.dimension = int(self.session.get_outputs()[0].shape[-1])
+
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feeds)[0]
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode_batch(texts[start : start + self.batch_size]))
+        return vectors
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        # Inference is CPU bound; keep it off the event loop.
+        return await asyncio.to_thread(self._encode, texts)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dimension = int(self.model.get_sentence_embedding_dimension())
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True).tolist()
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self._encode, texts)
+
+
+class CachedEmbedder(Embedder):
+    """LRU of vectors by text hash in front of another embedder.
+
+    A batch only sends its cache misses (deduplicated) to the backend.
+    """
+
+    def __init__(self, inner: Embedder, max_entries: int = 10000):
+        self.inner = inner
+        self.name = inner.name
+        self.dimension = inner.dimension
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "batches": 0}
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        # Hits are copied out before misses are inserted, since inserting a
+        # large batch can evict entries this same batch already hit.
+        found: Dict[bytes, List[float]] = {}
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                found[key] = self._cache[key]
+                self.counters["hits"] += 1
+            elif key not in missing:
+                missing[key] = text
+                self.counters["misses"] += 1
+            else:
+                self.counters["hits"] += 1
+
+        if missing:
+            self.counters["batches"] += 1
+            vectors = await self.inner.embed(list(missing.values()))
+            for key, vector in zip(missing, vectors):
+                found[key] = vector
+                self._cache[key] = vector
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return [found[key] for key in keys]
+
+    def metrics(self) -> Dict[str, object]:
+        return {**self.counters, "backend": self.name, "dimension": self.dimension, "entries": len(self._cache)}
+
+
+def create_embedder(backend: Optional[str] = None) -> Embedder:
+    backend = backend or settings.EMBEDDING_BACKEND
+    inner: Optional[Embedder] = None
+    try:
+        if backend == "onnx":
+            if onnxruntime is None or np is None or not settings.EMBEDDING_MODEL_PATH:
+                raise RuntimeError("onnxruntime, tokenizers, numpy and EMBEDDING_MODEL_PATH are required")
+            inner = OnnxEmbedder(settings.EMBEDDING_MODEL_PATH, batch_size=settings.EMBEDDING_BATCH_SIZE)
+        elif backend == "sentence-transformers":
+            if SentenceTransformer is None:
+                raise RuntimeError("sentence_transformers is not installed")
+            inner = SentenceTransformerEmbedder(settings.EMBEDDING_MODEL, batch_size=settings.EMBEDDING_BATCH_SIZE)
+    except Exception as exc:
+        logger.warning("Embedding backend %s unavailable, using hashing: %s", backend, exc)
+    if inner is None:
+        inner = HashingEmbedder(settings.EMBEDDING_SIZE)
+    return CachedEmbedder(inner, max_entries=settings.EMBEDDING_CACHE_SIZE)
+
+
+# Global instance
+embedder = create_embedder()
@@ -0,0 +1,158 @@
+"""Bulk ingestion of many segments or whole documents.
+
+The request handler chunks the input and appends every chunk to the
+segment log in one transaction, so the text is durable before the call
+returns. Embedding and vector indexing then run as a background job whose
+progress can be polled.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from app import core
+from app.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+
+
+def _split_oversized(unit: str, max_tokens: int) -> List[str]:
+    """Split one unit that exceeds ``max_tokens`` on word boundaries."""
+    pieces: List[str] = []
+    current: List[str] = []
+    size = 0
+    for word in unit.split():
+        cost = count_tokens(" " + word)
+        if current and size + cost > max_tokens:
+            pieces.append(" ".join(current))
+            current, size = [], 0
+        current.append(word)
+        size += cost
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int = 512, mode: str = "paragraph", overlap_tokens: int = 0) -> List[str]:
+    """Split ``text`` into chunks of at most ``max_tokens`` tokens.
+
+    ``paragraph`` packs whole paragraphs; ``tokens`` packs sentences into a
+    token window. Units longer than a chunk are split on words. With
+    ``overlap_tokens``, each chunk repeats the trailing units of the
+    previous one up to that many tokens.
+    """
+    splitter, joiner = (_PARAGRAPH_RE, "\n\n") if mode == "paragraph" else (_SENTENCE_RE, " ")
+    units: List[str] = []
+    for unit in splitter.split(text.strip()):
+        unit = unit.strip()
+        if not unit:
+            continue
+        if count_tokens(unit) > max_tokens:
+            units.extend(_split_oversized(unit, max_tokens))
+        else:
+            units.append(unit)
+
+    chunks: List[str] = []
+    current: List[str] = []
+    costs: List[int] = []
+    for unit in units:
+        cost = count_tokens(unit)
+        if current and sum(costs) + cost > max_tokens:
+            chunks.append(joiner.join(current))
+            # Carry the tail of the previous chunk into the next one.
+            keep = 0
+            while keep < len(current) and sum(costs[len(costs) - keep - 1 :]) <= overlap_tokens:
+                keep += 1
+            current, costs = (current[-keep:], costs[-keep:]) if keep else ([], [])
+            while current and sum(costs) + cost > max_tokens:
+                current.pop(0)
+                costs.pop(0)
+        current.append(unit)
+        costs.append(cost)
+    if current:
+        chunks.append(joiner.join(current))
+    return chunks
+
+
+@dataclass
+class IngestionJob:
+    story_id: str
+    total: int
+    job_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = "pending"
+    embedded: int = 0
+    indexed: int = 0
+    first_seq: Optional[int] = None
+    last_seq: Optional[int] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def progress(self, stage: str, count: int) -> None:
+        setattr(self, stage, count)
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+class Ingestor:
+    """Runs indexing jobs in the background and remembers recent ones."""
+
+    def __init__(self, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, job: IngestionJob, chunks: List[str]) -> IngestionJob:
+        self.jobs[job.job_id] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+        task = asyncio.create_task(self._run(job, chunks))
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+        return job
+
+    async def _run(self, job: IngestionJob, chunks: List[str]) -> None:
+        job.status = "running"
+        try:
+            await core.store_context_segments(job.story_id, chunks, on_progress=job.progress)
+            job.status = "completed"
+        except Exception as exc:
+            logger.warning("Ingestion job %s failed: %s", job.job_id, exc)
+            job.status = "failed"
+            job.error = str(exc)
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    async def wait(self, job_id: str) -> None:
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def metrics(self) -> Dict[str, int]:
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {"running": len(self._tasks), **statuses}
+
+
+# Global instance
+ingestor = Ingestor()
@@ -0,0 +1,182 @@
+"""Incremental BM25 index over story segments, and rank fusion with vectors.
+
+Names, places and quoted phrases are where lexical matching matters most,
+so terms are matched exactly (case-folded) and a query that appears
+verbatim in a segment gets a small bonus. Each story is its own shard with
+its own document frequencies; adding a segment only touches the postings
+of its terms.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Iterable, List
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have he her his i in is it its of on or "
+    "she that the their them they this to was were with you".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in (w.lower() for w in _TERM_RE.findall(text)) if t not in _STOPWORDS]
+
+
+def _doc_key(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=12).hexdigest()
+
+
+class BM25Shard:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.lengths: List[int] = []
+        self.texts: List[str] = []
+        self.keys: Dict[str, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add(self, text: str) -> bool:
+        """Index ``text``; identical texts are stored once."""
+        key = _doc_key(text)
+        if key in self.keys:
+            return False
+        doc = len(self.texts)
+        terms = tokenize(text)
+        for term, tf in Counter(terms).items():
+            self.postings.setdefault(term, {})[doc] = tf
+        self.keys[key] = doc
+        self.texts.append(text)
+        self.lengths.append(len(terms))
+        self.total_length += len(terms)
+        return True
+
+    def search(self, query: str, k: int) -> List[Dict[str, object]]:
+        n = len(self.texts)
+        if not n:
+            return []
+        avgdl = self.total_length / n or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[doc] / avgdl)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        phrase = query.strip().lower()
+        ranked = heapq.nlargest(k * 2, scores.items(), key=lambda item: item[1])
+        if " " in phrase:
+            # Exact phrase matches beat documents that merely share the words.
+            ranked = [(doc, score * (1.5 if phrase in self.texts[doc].lower() else 1.0)) for doc, score in ranked]
+            ranked.sort(key=lambda item: -item[1])
+        return [{"text": self.texts[doc], "score": score} for doc, score in ranked[:k]]
+
+
+class LexicalIndex:
+    """Per-story BM25 shards, built lazily from the segment log."""
+
+    def __init__(self) -> None:
+        self._shards: Dict[str, BM25Shard] = {}
+        self._loading: Dict[str, asyncio.Lock] = {}
+        # Segments added while a story's shard is being built from the log
+        self._buffered: Dict[str, List[str]] = {}
+
+    def loaded(self, story_id: str) -> bool:
+        return story_id in self._shards
+
+    def add(self, story_id: str, text: str) -> None:
+        """Index a new, already committed segment.
+
+        Unloaded shards pick the segment up from the log when first searched;
+        a shard being loaded gets it when it is published.
+        """
+        shard = self._shards.get(story_id)
+        if shard is not None:
+            shard.add(text)
+        elif story_id in self._buffered:
+            self._buffered[story_id].append(text)
+
+    async def ensure_loaded(self, story_id: str, loader: Callable[[], Awaitable[Iterable[str]]]) -> BM25Shard:
+        shard = self._shards.get(story_id)
+        if shard is not None:
+            return shard
+        lock = self._loading.setdefault(story_id, asyncio.Lock())
+        async with lock:
+            shard = self._shards.get(story_id)
+            if shard is None:
+                # Start buffering before the snapshot is read, so a segment
+                # committed after the loader's query is not lost.
+                self._buffered[story_id] = []
+                try:
+                    shard = BM25Shard()
+                    for text in await loader():
+                        shard.add(text)
+                    for text in self._buffered[story_id]:
+                        shard.add(text)  # already in the snapshot: stored once
+                    self._shards[story_id] = shard
+                finally:
+                    self._buffered.pop(story_id, None)
+        self._loading.pop(story_id, None)
+        return shard
+
+    def search(self, story_id: str, query: str, k: int) -> List[Dict[str, object]]:
+        shard = self._shards.get(story_id)
+        return shard.search(query, k) if shard is not None else []
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "stories": len(self._shards),
+            "documents": sum(len(s) for s in self._shards.values()),
+            "terms": sum(len(s.postings) for s in self._shards.values()),
+        }
+
+
+def fuse(
+    vector: List[Dict[str, object]],
+    lexical: List[Dict[str, object]],
+    limit: int,
+    method: str = "rrf",
+    vector_weight: float = 0.5,
+    rrf_k: int = 60,
+) -> List[Dict[str, object]]:
+    """Merge two ranked lists of ``{"text", "score"}`` by segment text.
+
+    ``rrf`` sums ``1 / (rrf_k + rank)`` across lists and ignores raw score
+    scales. ``weighted`` min-max normalises each list and mixes them with
+    ``vector_weight``.
+    """
+    fused: Dict[str, Dict[str, object]] = {}
+
+    def contribute(results: List[Dict[str, object]], weight: float, source: str) -> None:
+        if not results:
+            return
+        scores = [float(r["score"]) for r in results]
+        low, high = min(scores), max(scores)
+        for rank, result in enumerate(results):
+            key = _doc_key(str(result["text"]))
+            entry = fused.setdefault(key, {"text": result["text"], "score": 0.0, "sources": []})
+            if method == "weighted":
+                norm = (float(result["score"]) - low) / (high - low) if high > low else 1.0
+                entry["score"] += weight * norm
+            else:
+                entry["score"] += 1.0 / (rrf_k + rank + 1)
+            entry["sources"].append(source)
+
+    contribute(vector, vector_weight, "vector")
+    contribute(lexical, 1.0 - vector_weight, "lexical")
+    return sorted(fused.values(), key=lambda r: -float(r["score"]))[:limit]
+
+
+# Global instance
+lexical_index = LexicalIndex()
@@ -1,6 +1,7 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -8,32 +9,39 @@ from app.core import (
     settings,
     init_vector_store,
     store_context_segment,
-    search_story_segments,
+    hybrid_search,
+    snapshot_fallback_index,
+    get_fallback_index,
+    get_outbox,
+    breaker,
+    run_vector_store_recovery,
 )
 from app.db.database import engine, Base, get_db
-from app.models import StoryContext
-from app.schemas import ContextCreate, ContextResponse
-
-def summarize_content(content: str, max_tokens: int) -> str:
-    """Naive summarization to keep content within token limits."""
-    estimated_tokens = int(len(content.split()) * 1.3)
-    if estimated_tokens <= max_tokens:
-        return content
-
-    sections = content.split("\n\n")
-    preserved = "\n\n".join(sections[-30:])
-    summary = (
-        "STORY SUMMARY (TRUNCATED):\n[Summary would be generated here]\n\n" 
-        "RECENT CONTENT:\n" + preserved
-    )
-    return summary
+from app.models import ContextSegment
+from app.schemas import ContextCreate, ContextResponse, IngestJobResponse, IngestRequest, SegmentResponse, SummaryTree
+from app.segments import segment_log
+from app.embeddings import embedder
+from app.lexical import lexical_index
+from app.ingest import IngestionJob, chunk_text, ingestor
+from app.summaries import summary_store
+from app.summarizer import summarizer
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     await init_vector_store()
+    await segment_log.start()
+    snapshots = asyncio.create_task(snapshot_fallback_index(settings.VECTOR_INDEX_SNAPSHOT_INTERVAL))
+    recovery = asyncio.create_task(run_vector_store_recovery(settings.VECTOR_STORE_RECOVERY_INTERVAL))
     yield
+    snapshots.cancel()
+    recovery.cancel()
+    await asyncio.gather(snapshots, recovery, return_exceptions=True)
+    await snapshot_fallback_index()
+    await ingestor.stop()
+    await segment_log.stop()
+    await summarizer.aclose()
     await engine.dispose()
 
 app = FastAPI(title="Quantum Writer Context Service", version="2.0.0", docs_url="/api/docs", redoc_url="/api/redoc", lifespan=lifespan)
@@ -45,31 +53,68 @@ async def health_check():
     return {"status": "healthy", "service": settings.SERVICE_NAME}
 
 
-@app.post("/api/v1/context/{story_id}", response_model=ContextResponse)
+@app.get("/metrics")
+async def metrics():
+    return {
+        "segment_log": segment_log.metrics(),
+        "embeddings": embedder.metrics(),
+        "fallback_index": get_fallback_index().metrics(),
+        "lexical_index": lexical_index.metrics(),
+        "ingestion": ingestor.metrics(),
+        "vector_store": {"circuit": breaker.metrics(), "outbox": get_outbox().metrics()},
+    }
+
+
+@app.post("/api/v1/context/{story_id}", response_model=SegmentResponse)
 async def save_context(
     story_id: str,
     context: ContextCreate,
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(StoryContext).where(StoryContext.story_id == story_id))
-    ctx = result.scalar_one_or_none()
-
-    if ctx:
-        new_content = ctx.content + "\n\n" + context.content
-        ctx.content = summarize_content(new_content, settings.MAX_CONTEXT_TOKENS)
-    else:
-        ctx = StoryContext(
-            story_id=story_id,
-            content=summarize_content(context.content, settings.MAX_CONTEXT_TOKENS),
-        )
-        db.add(ctx)
+    # Appending never reads or rewrites the story's existing context; the
+    # compacted view catches up in the background or on the next read.
+    segment = await segment_log.append(db, story_id, context.content, chapter=context.chapter)
+    await db.commit()
+    segment_log.schedule(story_id)
 
-    # Store embedding for the new content segment
+    # Index only once committed: a lexical shard loaded from the log from
+    # now on already sees the segment.
     await store_context_segment(story_id, context.content)
+    return segment
+
 
+@app.post("/api/v1/context/{story_id}/ingest", response_model=IngestJobResponse, status_code=202)
+async def ingest_context(
+    story_id: str,
+    request: IngestRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """Append many segments at once and index them in the background."""
+    max_tokens = request.chunk_tokens or settings.INGEST_CHUNK_TOKENS
+    chunks: list = []
+    for segment in request.segments or []:
+        chunks.extend(chunk_text(segment, max_tokens, request.chunking, request.overlap_tokens))
+    if request.document:
+        chunks.extend(chunk_text(request.document, max_tokens, request.chunking, request.overlap_tokens))
+    if not chunks:
+        raise HTTPException(status_code=422, detail="Nothing to ingest")
+    if len(chunks) > settings.INGEST_MAX_SEGMENTS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.INGEST_MAX_SEGMENTS} segments per request")
+
+    segments = await segment_log.append_many(db, story_id, chunks, chapter=request.chapter)
     await db.commit()
-    await db.refresh(ctx)
-    return ctx
+    segment_log.schedule(story_id)
+
+    job = IngestionJob(story_id=story_id, total=len(chunks), first_seq=segments[0].seq, last_seq=segments[-1].seq)
+    return ingestor.submit(job, chunks).to_dict()
+
+
+@app.get("/api/v1/ingest/{job_id}", response_model=IngestJobResponse)
+async def get_ingest_job(job_id: str):
+    job = ingestor.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job.to_dict()
 
 
 @app.get("/api/v1/context/{story_id}", response_model=ContextResponse)
@@ -77,15 +122,37 @@ async def get_context(
     story_id: str,
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(StoryContext).where(StoryContext.story_id == story_id))
-    ctx = result.scalar_one_or_none()
+    ctx = await segment_log.compact(db, story_id)
     if not ctx:
         raise HTTPException(status_code=404, detail="Context not found")
     return ctx
 
 
+@app.get("/api/v1/context/{story_id}/summaries", response_model=SummaryTree)
+async def get_summaries(
+    story_id: str,
+    db: AsyncSession = Depends(get_db),
+):
+    await segment_log.compact(db, story_id)
+    nodes = await summary_store.get_tree(db, story_id)
+    if not nodes:
+        raise HTTPException(status_code=404, detail="Context not found")
+    return {"story_id": story_id, "nodes": nodes}
+
+
 @app.get("/api/v1/context/{story_id}/search")
-async def search_context(story_id: str, query: str, limit: int = 5):
-    results = await search_story_segments(story_id, query, limit)
-    return {"results": results}
+async def search_context(
+    story_id: str,
+    query: str,
+    limit: int = 5,
+    mode: str = Query("hybrid", pattern="^(hybrid|vector|lexical)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    async def load_segments():
+        result = await db.execute(
+            select(ContextSegment.content).where(ContextSegment.story_id == story_id).order_by(ContextSegment.seq)
+        )
+        return result.scalars().all()
 
+    results = await hybrid_search(story_id, query, limit, mode=mode, loader=load_segments)
+    return {"results": results}
@@ -1,3 +1,5 @@
 from .context import StoryContext
+from .segment import ContextSegment
+from .summary import StorySummary
 
-__all__ = ["StoryContext"]
+__all__ = ["StoryContext", "ContextSegment", "StorySummary"]
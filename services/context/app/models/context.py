@@ -1,13 +1,16 @@
-from sqlalchemy import Column, String, Text, DateTime
+from sqlalchemy import BigInteger, Column, String, Text, DateTime
 from sqlalchemy.sql import func
 from app.db.database import Base
 import uuid
 
 class StoryContext(Base):
+    """Compacted view of a story's segment log, rebuilt lazily."""
     __tablename__ = "story_contexts"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     story_id = Column(String, nullable=False, unique=True)
     content = Column(Text, nullable=False)
+    # Highest seq folded in so far; informational, segments carry their own flag
+    compacted_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -0,0 +1,29 @@
+from sqlalchemy import BigInteger, Boolean, Column, Integer, String, Text, DateTime, Index, false
+from sqlalchemy.sql import func, text
+from app.db.database import Base
+
+class ContextSegment(Base):
+    """One appended piece of story context; only ``compacted`` is ever updated.
+
+    ``seq`` comes from the database sequence, so concurrent appends never
+    contend and a story's segments are ordered by it. Seqs can commit out
+    of order, so compaction marks each segment it folds rather than
+    trusting a high-water mark.
+    """
+    __tablename__ = "context_segments"
+    __table_args__ = (
+        Index("ix_context_segments_story_seq", "story_id", "seq"),
+        # Segments still waiting to be folded into the story's view
+        Index(
+            "ix_context_segments_pending", "story_id", "seq",
+            postgresql_where=text("NOT compacted"), sqlite_where=text("NOT compacted"),
+        ),
+    )
+
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    story_id = Column(String, nullable=False)
+    chapter = Column(Integer)
+    content = Column(Text, nullable=False)
+    token_count = Column(Integer, nullable=False, default=0)
+    compacted = Column(Boolean, nullable=False, default=False, server_default=false())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, Text, Integer, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.database import Base
+import uuid
+
+class StorySummary(Base):
+    """One node of a story's summary hierarchy.
+
+    ``level`` is ``chapter``, ``arc`` or ``story`` (plus ``recent`` for the
+    raw tail of the latest content); ``position`` is the chapter or arc
+    number. ``base`` holds the already-closed part a rolling summary builds on.
+    """
+    __tablename__ = "story_summaries"
+    __table_args__ = (UniqueConstraint("story_id", "level", "position", name="uq_story_summary_node"),)
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    story_id = Column(String, nullable=False, index=True)
+    level = Column(String(16), nullable=False)
+    position = Column(Integer, nullable=False, default=0)
+    content = Column(Text, nullable=False, default="")
+    base = Column(Text)
+    token_count = Column(Integer, nullable=False, default=0)
+    source_tokens = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
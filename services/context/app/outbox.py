@@ -0,0 +1,100 @@
+"""Durable queue of vector upserts that could not reach Qdrant.
+
+Entries are ``{"id", "story_id", "text"}`` lines in a JSONL file, appended
+and fsynced before the write is acknowledged, so they survive a restart.
+Vectors are not stored: replay re-embeds the text, which keeps the file
+small and picks up the embedder in use at replay time. Upserts are keyed
+by point id, so replaying an entry that did reach Qdrant is harmless.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._loaded = False
+        self.counters = {"queued": 0, "replayed": 0, "replay_errors": 0}
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._entries)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                    self._entries[entry["id"]] = entry
+                except (ValueError, KeyError):
+                    # A torn last line from a crash mid-write.
+                    logger.warning("Skipping unreadable outbox line in %s", self.path)
+
+    def _append(self, entries: List[Dict[str, str]]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def _rewrite(self, entries: List[Dict[str, str]]) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+
+    async def add(self, story_id: str, ids: List[str], texts: List[str]) -> None:
+        entries = [{"id": point_id, "story_id": story_id, "text": text} for point_id, text in zip(ids, texts)]
+        async with self._lock:
+            self._load()
+            if self.path:
+                await asyncio.to_thread(self._append, entries)
+            for entry in entries:
+                self._entries[entry["id"]] = entry
+            self.counters["queued"] += len(entries)
+
+    async def replay(self, send: Callable[[List[Dict[str, str]]], Awaitable[None]], batch_size: int = 256) -> int:
+        """Send queued entries oldest first, dropping each batch once sent.
+
+        Stops at the first batch ``send`` raises on and re-raises, leaving
+        that batch and everything after it queued.
+        """
+        self._load()
+        sent = 0
+        while self._entries:
+            batch = list(self._entries.values())[:batch_size]
+            try:
+                await send(batch)
+            except Exception:
+                self.counters["replay_errors"] += 1
+                raise
+            async with self._lock:
+                for entry in batch:
+                    # Re-queued with new text while the send was in flight: keep the newer entry.
+                    if self._entries.get(entry["id"]) is entry:
+                        del self._entries[entry["id"]]
+                if self.path:
+                    await asyncio.to_thread(self._rewrite, list(self._entries.values()))
+            sent += len(batch)
+            self.counters["replayed"] += len(batch)
+        return sent
+
+    def metrics(self) -> Dict[str, int]:
+        return {**self.counters, "pending": len(self)}
@@ -1,3 +1,19 @@
-from .context import ContextCreate, ContextResponse
+from .context import (
+    ContextCreate,
+    ContextResponse,
+    IngestJobResponse,
+    IngestRequest,
+    SegmentResponse,
+    SummaryNode,
+    SummaryTree,
+)
 
-__all__ = ["ContextCreate", "ContextResponse"]
+__all__ = [
+    "ContextCreate",
+    "ContextResponse",
+    "IngestJobResponse",
+    "IngestRequest",
+    "SegmentResponse",
+    "SummaryNode",
+    "SummaryTree",
+]
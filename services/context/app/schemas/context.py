@@ -1,9 +1,10 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from typing import List, Optional
 from datetime import datetime
 
 class ContextCreate(BaseModel):
     content: str
+    chapter: Optional[int] = Field(default=None, ge=1, description="Chapter the segment belongs to; defaults to the latest one")
 
 class ContextResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -13,3 +14,51 @@ class ContextResponse(BaseModel):
     content: str
     created_at: datetime
     updated_at: Optional[datetime] = None
+
+class SegmentResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    seq: int
+    story_id: str
+    chapter: Optional[int] = None
+    token_count: int
+    created_at: Optional[datetime] = None
+
+class SummaryNode(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    level: str
+    position: int
+    content: str
+    token_count: int
+    source_tokens: int
+    updated_at: Optional[datetime] = None
+
+class SummaryTree(BaseModel):
+    story_id: str
+    nodes: List[SummaryNode]
+
+class IngestRequest(BaseModel):
+    segments: Optional[List[str]] = Field(default=None, description="Pre-split segments, stored as given unless larger than chunk_tokens")
+    document: Optional[str] = Field(default=None, description="Whole document to chunk")
+    chapter: Optional[int] = Field(default=None, ge=1)
+    chunking: str = Field(default="paragraph", pattern="^(paragraph|tokens)$")
+    chunk_tokens: Optional[int] = Field(default=None, ge=16, le=8192)
+    overlap_tokens: int = Field(default=0, ge=0)
+
+    @model_validator(mode="after")
+    def _require_content(self):
+        if not self.segments and not self.document:
+            raise ValueError("Provide segments or document")
+        return self
+
+class IngestJobResponse(BaseModel):
+    job_id: str
+    story_id: str
+    status: str
+    total: int
+    embedded: int
+    indexed: int
+    first_seq: Optional[int] = None
+    last_seq: Optional[int] = None
+    error: Optional[str] = None
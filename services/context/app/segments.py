@@ -0,0 +1,175 @@
+"""Append-only segment log with a lazily compacted per-story view.
+
+Saving context inserts one ``ContextSegment`` row and nothing else, so
+appends are O(1) and concurrent writers never overwrite each other.
+``StoryContext`` is a materialised view: compaction folds the segments not
+yet marked ``compacted`` into the summary hierarchy and marks them, in the
+same transaction. It runs in the background after writes and on read if
+the view is stale.
+
+Seqs are handed out before their transactions commit, so a segment can
+become visible after one with a higher seq was already folded. Marking
+segments individually means such a late segment is still picked up by the
+next pass instead of being skipped by a watermark.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import weakref
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import settings
+from app.db import database
+from app.models.context import StoryContext
+from app.models.segment import ContextSegment
+from app.summaries import summary_store
+from app.summarizer import LLMSummarizer
+from app.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentLog:
+    def __init__(self, batch_size: int = 100, delay: float = 1.0):
+        self.batch_size = batch_size
+        self.delay = delay
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self._pending: Dict[str, None] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.counters = {"appended": 0, "compactions": 0, "compacted_segments": 0, "compaction_errors": 0}
+
+    def _lock(self, story_id: str) -> asyncio.Lock:
+        lock = self._locks.get(story_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[story_id] = lock
+        return lock
+
+    async def append(self, db: AsyncSession, story_id: str, content: str, chapter: Optional[int] = None) -> ContextSegment:
+        """Insert a segment; the caller commits. Reads nothing."""
+        segment = ContextSegment(story_id=story_id, chapter=chapter, content=content, token_count=count_tokens(content))
+        db.add(segment)
+        await db.flush()
+        self.counters["appended"] += 1
+        return segment
+
+    async def append_many(self, db: AsyncSession, story_id: str, contents: List[str], chapter: Optional[int] = None) -> List[ContextSegment]:
+        """Insert many segments in one flush, in order; the caller commits."""
+        segments = [
+            ContextSegment(story_id=story_id, chapter=chapter, content=content, token_count=count_tokens(content))
+            for content in contents
+        ]
+        db.add_all(segments)
+        await db.flush()
+        self.counters["appended"] += len(segments)
+        return segments
+
+    async def compact(self, db: AsyncSession, story_id: str) -> Optional[StoryContext]:
+        """Fold the story's uncompacted segments into its view.
+
+        Serialised per story in-process, and across replicas by the row lock
+        on ``story_contexts``. Returns ``None`` for unknown stories.
+        """
+        async with self._lock(story_id):
+            for attempt in range(2):
+                try:
+                    return await self._compact(db, story_id)
+                except IntegrityError:
+                    # Another replica created the view first; retry against it.
+                    await db.rollback()
+                    if attempt:
+                        raise
+        return None
+
+    def _batch_limit(self) -> int:
+        # An LLM summariser makes HTTP calls per segment; keep the row lock
+        # held for one segment at a time rather than a whole batch.
+        return 1 if isinstance(summary_store.summarizer, LLMSummarizer) else self.batch_size
+
+    async def _compact(self, db: AsyncSession, story_id: str) -> Optional[StoryContext]:
+        while True:
+            result = await db.execute(
+                select(StoryContext).where(StoryContext.story_id == story_id).with_for_update()
+            )
+            ctx = result.scalar_one_or_none()
+            result = await db.execute(
+                select(ContextSegment)
+                .where(ContextSegment.story_id == story_id, ContextSegment.compacted.is_(False))
+                .order_by(ContextSegment.seq)
+                .limit(self._batch_limit())
+            )
+            segments = list(result.scalars().all())
+            if not segments:
+                return ctx
+
+            if ctx is not None and ctx.content and not await summary_store.has_tree(db, story_id):
+                # Context saved before the summary tree existed: fold it in first
+                # so the story keeps what it had accumulated.
+                await summary_store.add_segment(db, story_id, ctx.content)
+            for segment in segments:
+                content = await summary_store.add_segment(db, story_id, segment.content, chapter=segment.chapter)
+            await db.execute(
+                update(ContextSegment)
+                .where(ContextSegment.seq.in_([segment.seq for segment in segments]))
+                .values(compacted=True)
+                .execution_options(synchronize_session=False)
+            )
+            highest = max(segment.seq for segment in segments)
+            if ctx is None:
+                ctx = StoryContext(story_id=story_id, content=content, compacted_seq=highest)
+                db.add(ctx)
+            else:
+                ctx.content = content
+                ctx.compacted_seq = max(ctx.compacted_seq or 0, highest)
+            await db.commit()
+            await db.refresh(ctx)
+            self.counters["compactions"] += 1
+            self.counters["compacted_segments"] += len(segments)
+
+    def schedule(self, story_id: str) -> None:
+        """Ask the background worker to compact ``story_id`` soon."""
+        self._pending[story_id] = None
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._worker is None:
+            self._wakeup = asyncio.Event()
+            if self._pending:
+                self._wakeup.set()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+            self._wakeup = None
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Let a burst of appends land so one pass compacts all of them.
+            await asyncio.sleep(self.delay)
+            self._wakeup.clear()
+            stories, self._pending = list(self._pending), {}
+            for story_id in stories:
+                try:
+                    async with database.AsyncSessionLocal() as db:
+                        await self.compact(db, story_id)
+                except Exception as exc:
+                    self.counters["compaction_errors"] += 1
+                    logger.warning("Compaction failed for story %s: %s", story_id, exc)
+
+    def metrics(self) -> Dict[str, int]:
+        return {**self.counters, "pending_stories": len(self._pending)}
+
+
+# Global instance
+segment_log = SegmentLog(batch_size=settings.COMPACTION_BATCH_SIZE, delay=settings.COMPACTION_DELAY)
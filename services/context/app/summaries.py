@@ -0,0 +1,192 @@
+"""Rolling hierarchical summaries of a story.
+
+Each saved segment updates only the nodes it touches: its chapter summary,
+that chapter's arc summary and the story summary, plus a raw tail of the
+most recent content. Every update reads the new segment and bounded-size
+summaries, so saving costs O(new content) however long the story gets.
+"""
+from __future__ import annotations
+
+from typing import List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import settings
+from app.models.summary import StorySummary
+from app.summarizer import Summarizer, summarizer as default_summarizer
+from app.tokens import count_tokens, truncate_to_tokens
+
+SECTION_HEADERS = {
+    "story": "STORY SO FAR:\n",
+    "arc": "CURRENT ARC:\n",
+    "chapter": "CURRENT CHAPTER:\n",
+    "recent": "RECENT CONTENT:\n",
+}
+
+
+def recent_token_budget() -> int:
+    """Tokens left for raw recent content once the summaries are reserved."""
+    reserved = settings.STORY_SUMMARY_TOKENS + settings.ARC_SUMMARY_TOKENS + settings.CHAPTER_SUMMARY_TOKENS
+    headers = sum(count_tokens(h) + 1 for h in SECTION_HEADERS.values())
+    return max(256, settings.MAX_CONTEXT_TOKENS - reserved - headers)
+
+
+def arc_for_chapter(chapter: int) -> int:
+    return (max(chapter, 1) - 1) // settings.CHAPTERS_PER_ARC + 1
+
+
+class SummaryStore:
+    """Maintains the chapter → arc → story summary tree per story."""
+
+    def __init__(self, summarizer: Optional[Summarizer] = None):
+        self._summarizer = summarizer
+
+    @property
+    def summarizer(self) -> Summarizer:
+        return self._summarizer or default_summarizer
+
+    async def _node(self, db: AsyncSession, story_id: str, level: str, position: Optional[int]) -> StorySummary:
+        """Fetch or create a node; ``position=None`` matches the level's only node."""
+        query = select(StorySummary).where(StorySummary.story_id == story_id, StorySummary.level == level)
+        if position is not None:
+            query = query.where(StorySummary.position == position)
+        node = (await db.execute(query)).scalar_one_or_none()
+        if node is None:
+            node = StorySummary(story_id=story_id, level=level, position=position or 0, content="", token_count=0, source_tokens=0)
+            db.add(node)
+        return node
+
+    async def has_tree(self, db: AsyncSession, story_id: str) -> bool:
+        result = await db.execute(select(StorySummary.id).where(StorySummary.story_id == story_id).limit(1))
+        return result.first() is not None
+
+    async def current_chapter(self, db: AsyncSession, story_id: str) -> int:
+        result = await db.execute(
+            select(func.max(StorySummary.position)).where(
+                StorySummary.story_id == story_id, StorySummary.level == "chapter"
+            )
+        )
+        return result.scalar() or 1
+
+    @staticmethod
+    def _set(node: StorySummary, content: str) -> None:
+        node.content = content
+        node.token_count = count_tokens(content)
+
+    async def _update_chapter(self, db: AsyncSession, story_id: str, chapter: int, text: str, new_tokens: int) -> StorySummary:
+        node = await self._node(db, story_id, "chapter", chapter)
+        merged = f"{node.content}\n\n{text}" if node.content else text
+        self._set(node, await self.summarizer.summarize(merged, settings.CHAPTER_SUMMARY_TOKENS))
+        node.source_tokens = (node.source_tokens or 0) + new_tokens
+        return node
+
+    async def _update_arc(self, db: AsyncSession, story_id: str, arc: int) -> StorySummary:
+        first = (arc - 1) * settings.CHAPTERS_PER_ARC + 1
+        result = await db.execute(
+            select(StorySummary)
+            .where(
+                StorySummary.story_id == story_id,
+                StorySummary.level == "chapter",
+                StorySummary.position.between(first, first + settings.CHAPTERS_PER_ARC - 1),
+            )
+            .order_by(StorySummary.position)
+        )
+        chapters = list(result.scalars().all())
+        node = await self._node(db, story_id, "arc", arc)
+        if len(chapters) == 1:
+            self._set(node, chapters[0].content)
+        else:
+            text = "\n\n".join(f"Chapter {c.position}: {c.content}" for c in chapters)
+            self._set(node, await self.summarizer.summarize(text, settings.ARC_SUMMARY_TOKENS))
+        node.source_tokens = sum(c.source_tokens or 0 for c in chapters)
+        return node
+
+    async def _update_story(self, db: AsyncSession, story_id: str, arc: StorySummary) -> StorySummary:
+        # The story node's position tracks the latest arc it has absorbed.
+        node = await self._node(db, story_id, "story", None)
+        latest = arc
+        if not node.position or arc.position == node.position:
+            node.position = arc.position
+        elif arc.position > node.position:
+            # The previous arc is closed: what the story summary held so far
+            # becomes the fixed base the new arc is appended to.
+            node.base = node.content
+            node.position = arc.position
+        else:
+            # An earlier arc changed; rebuild the closed part from arc summaries.
+            node.base = await self._closed_arcs(db, story_id, node.position)
+            latest = await self._node(db, story_id, "arc", node.position)
+
+        if node.base:
+            text = f"{node.base}\n\n{latest.content}"
+            self._set(node, await self.summarizer.summarize(text, settings.STORY_SUMMARY_TOKENS))
+        else:
+            self._set(node, latest.content)
+        return node
+
+    async def _closed_arcs(self, db: AsyncSession, story_id: str, current_arc: int) -> str:
+        result = await db.execute(
+            select(StorySummary)
+            .where(
+                StorySummary.story_id == story_id,
+                StorySummary.level == "arc",
+                StorySummary.position < current_arc,
+            )
+            .order_by(StorySummary.position)
+        )
+        arcs = "\n\n".join(a.content for a in result.scalars().all())
+        return await self.summarizer.summarize(arcs, settings.STORY_SUMMARY_TOKENS) if arcs else ""
+
+    async def _update_recent(self, db: AsyncSession, story_id: str, text: str, new_tokens: int) -> StorySummary:
+        node = await self._node(db, story_id, "recent", 0)
+        merged = f"{node.content}\n\n{text}" if node.content else text
+        self._set(node, truncate_to_tokens(merged, recent_token_budget()))
+        node.source_tokens = (node.source_tokens or 0) + new_tokens
+        return node
+
+    async def add_segment(self, db: AsyncSession, story_id: str, text: str, chapter: Optional[int] = None) -> str:
+        """Fold ``text`` into the hierarchy and return the composed context.
+
+        ``chapter`` defaults to the latest chapter seen for the story. Nothing
+        is committed; the caller owns the transaction.
+        """
+        if chapter is None:
+            chapter = await self.current_chapter(db, story_id)
+        new_tokens = count_tokens(text)
+
+        chapter_node = await self._update_chapter(db, story_id, chapter, text, new_tokens)
+        arc_node = await self._update_arc(db, story_id, arc_for_chapter(chapter))
+        story_node = await self._update_story(db, story_id, arc_node)
+        recent_node = await self._update_recent(db, story_id, text, new_tokens)
+        return self.compose(story_node, arc_node, chapter_node, recent_node)
+
+    @staticmethod
+    def compose(story: StorySummary, arc: StorySummary, chapter: StorySummary, recent: StorySummary) -> str:
+        """Render the context: summaries from coarse to fine, then raw recent text.
+
+        While all content still fits in the recent tail it is returned as is.
+        Levels identical to the one below them are skipped.
+        """
+        if (recent.source_tokens or 0) <= recent.token_count:
+            return recent.content
+        sections: List[str] = []
+        levels = [("story", story), ("arc", arc), ("chapter", chapter)]
+        for index, (level, node) in enumerate(levels):
+            below = levels[index + 1][1].content if index + 1 < len(levels) else None
+            if node.content and node.content != below:
+                sections.append(SECTION_HEADERS[level] + node.content)
+        sections.append(SECTION_HEADERS["recent"] + recent.content)
+        return "\n\n".join(sections)
+
+    async def get_tree(self, db: AsyncSession, story_id: str) -> List[StorySummary]:
+        result = await db.execute(
+            select(StorySummary)
+            .where(StorySummary.story_id == story_id)
+            .order_by(StorySummary.level, StorySummary.position)
+        )
+        return list(result.scalars().all())
+
+
+# Global instance
+summary_store = SummaryStore()
@@ -0,0 +1,135 @@
+"""Pluggable summarisers for the hierarchical summary store.
+
+``ExtractiveSummarizer`` runs locally and picks the most representative
+sentences; ``LLMSummarizer`` asks the AI service for an abstractive summary
+and falls back to extraction if that call fails. ``settings.SUMMARIZER``
+selects which one the service uses.
+"""
+from __future__ import annotations
+
+import logging
+import re
+from collections import Counter
+from typing import List, Optional
+
+import httpx
+
+from app.core import settings
+from app.tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n\s*\n")
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_STOPWORDS = frozenset(
+    "the a an and or but of to in on at for with from by as is was were are be been it its "
+    "he she they them his her their this that these those i you we our your not had has have "
+    "then than so into out up down over there here when what which who would could should".split()
+)
+
+
+class Summarizer:
+    """Reduce text to at most ``max_tokens`` tokens."""
+
+    async def summarize(self, text: str, max_tokens: int) -> str:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        return None
+
+
+class ExtractiveSummarizer(Summarizer):
+    """Keep the highest-scoring sentences, in their original order.
+
+    Sentences are scored by the document frequency of their content words,
+    normalised by length, with a small boost for the opening sentence.
+    Runs in near-linear time in the input.
+    """
+
+    async def summarize(self, text: str, max_tokens: int) -> str:
+        text = text.strip()
+        if count_tokens(text) <= max_tokens:
+            return text
+        sentences = [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+        if not sentences:
+            return ""
+
+        words = [[w.lower() for w in _WORD_RE.findall(s)] for s in sentences]
+        freq = Counter(w for ws in words for w in ws if w not in _STOPWORDS and len(w) > 2)
+        scores = []
+        for index, ws in enumerate(words):
+            content = [w for w in ws if w in freq]
+            score = sum(freq[w] for w in content) / (len(ws) + 1) if content else 0.0
+            if index == 0:
+                score *= 1.5
+            scores.append(score)
+
+        chosen: List[int] = []
+        seen = set()
+        used = 0
+        for index in sorted(range(len(sentences)), key=lambda i: (-scores[i], i)):
+            cost = count_tokens(sentences[index]) + 1
+            if sentences[index] in seen or used + cost > max_tokens:
+                continue
+            chosen.append(index)
+            seen.add(sentences[index])
+            used += cost
+        if not chosen:
+            return truncate_to_tokens(sentences[0], max_tokens, keep="start")
+        return " ".join(sentences[i] for i in sorted(chosen))
+
+
+class LLMSummarizer(Summarizer):
+    """Summarise through the AI service's generate endpoint."""
+
+    PROMPT = (
+        "Summarise the following story material in at most {words} words. Keep names, "
+        "relationships, unresolved threads and facts later chapters depend on.\n\n{text}"
+    )
+
+    def __init__(self, base_url: str, model: str = "groq", timeout: float = 30.0, fallback: Optional[Summarizer] = None):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.fallback = fallback or ExtractiveSummarizer()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def summarize(self, text: str, max_tokens: int) -> str:
+        if count_tokens(text) <= max_tokens:
+            return text.strip()
+        payload = {
+            "prompt": self.PROMPT.format(words=max(1, int(max_tokens * 0.7)), text=text),
+            "system_prompt": "You write faithful, compact summaries of fiction for continuity tracking.",
+            "max_tokens": max_tokens,
+        }
+        try:
+            response = await self._get_client().post(
+                f"{self.base_url}/api/v1/generate", params={"model": self.model}, json=payload
+            )
+            response.raise_for_status()
+            summary = response.json().get("content", "").strip()
+            if summary:
+                return truncate_to_tokens(summary, max_tokens, keep="start")
+        except Exception as exc:
+            logger.warning("LLM summarisation failed, using extractive summary: %s", exc)
+        return await self.fallback.summarize(text, max_tokens)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def get_summarizer() -> Summarizer:
+    if settings.SUMMARIZER == "llm":
+        return LLMSummarizer(settings.AI_SERVICE_URL, model=settings.SUMMARIZER_MODEL)
+    return ExtractiveSummarizer()
+
+
+# Global instance
+summarizer = get_summarizer()
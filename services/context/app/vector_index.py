@@ -0,0 +1,212 @@
+"""In-process vector index used when Qdrant is unavailable.
+
+Each story gets a contiguous float32 matrix that grows by doubling, so an
+insert is amortised O(1) and a search is one matrix-vector product plus a
+partial sort. Above ``ivf_threshold`` vectors, an inverted-file (IVF)
+coarse quantiser limits the product to the rows of the ``nprobe`` nearest
+clusters. Indexes are snapshotted to ``snapshot_dir`` and reloaded lazily,
+so the fallback survives restarts.
+
+Vectors are expected to be L2-normalised, which makes the inner product
+the cosine similarity.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class StoryIndex:
+    def __init__(self, dimension: int, ivf_threshold: int = 4096, nprobe: int = 8):
+        self.dimension = dimension
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.count = 0
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.vectors = np.zeros((16, dimension), dtype=np.float32)
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(16, dtype=np.int32)
+        self._trained_at = 0
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.vectors)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        vectors = np.zeros((capacity, self.dimension), dtype=np.float32)
+        vectors[: self.count] = self.vectors[: self.count]
+        assignments = np.zeros(capacity, dtype=np.int32)
+        assignments[: self.count] = self.assignments[: self.count]
+        self.vectors, self.assignments = vectors, assignments
+
+    def add(self, ids: List[str], texts: List[str], vectors) -> None:
+        batch = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        start, end = self.count, self.count + len(batch)
+        self._grow(end)
+        self.vectors[start:end] = batch
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.count = end
+        self.dirty = True
+
+        if self.count >= self.ivf_threshold and self.count >= 2 * self._trained_at:
+            self._train()
+        elif self.centroids is not None:
+            self.assignments[start:end] = np.argmax(batch @ self.centroids.T, axis=1)
+
+    def _train(self, iterations: int = 8) -> None:
+        """Spherical k-means over the current vectors, ~sqrt(n) clusters."""
+        data = self.vectors[: self.count]
+        nlist = max(1, int(np.sqrt(self.count)))
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(self.count, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            filled = norms[:, 0] > 0
+            centroids[filled] = sums[filled] / norms[filled]
+        self.centroids = centroids
+        self.assignments[: self.count] = np.argmax(data @ centroids.T, axis=1)
+        self._trained_at = self.count
+
+    def search(self, query, k: int) -> List[Dict[str, object]]:
+        if self.count == 0:
+            return []
+        q = np.asarray(query, dtype=np.float32).reshape(self.dimension)
+        candidates: Optional[np.ndarray] = None
+        if self.centroids is not None:
+            probe = np.argsort(-(self.centroids @ q))[: self.nprobe]
+            candidates = np.flatnonzero(np.isin(self.assignments[: self.count], probe))
+            if len(candidates) < k:
+                candidates = None
+
+        if candidates is None:
+            scores = self.vectors[: self.count] @ q
+            rows = np.arange(self.count)
+        else:
+            scores = self.vectors[candidates] @ q
+            rows = candidates
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"id": self.ids[rows[i]], "text": self.texts[rows[i]], "score": float(scores[i])} for i in top]
+
+    def export(self):
+        """Copy of the index contents for writing out; marks it clean."""
+        self.dirty = False
+        return self.vectors[: self.count].copy(), list(self.ids), list(self.texts)
+
+    @staticmethod
+    def write(path: str, vectors: np.ndarray, ids: List[str], texts: List[str]) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as fh:
+            np.savez(fh, vectors=vectors)
+        with open(f"{tmp}.json", "w", encoding="utf-8") as fh:
+            json.dump({"ids": ids, "texts": texts}, fh)
+        os.replace(f"{tmp}.json", f"{path}.json")
+        os.replace(tmp, path)
+
+    def save(self, path: str) -> None:
+        self.write(path, *self.export())
+
+    @classmethod
+    def load(cls, path: str, dimension: int, **kwargs) -> Optional["StoryIndex"]:
+        try:
+            with np.load(path) as data:
+                vectors = data["vectors"]
+            with open(f"{path}.json", encoding="utf-8") as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning("Ignoring unreadable vector index snapshot %s: %s", path, exc)
+            return None
+        if vectors.ndim != 2 or vectors.shape[1] != dimension or len(vectors) != len(meta["ids"]):
+            logger.info("Discarding vector index snapshot %s built for another embedder", path)
+            return None
+        index = cls(dimension, **kwargs)
+        if len(vectors):
+            index.add(meta["ids"], meta["texts"], vectors)
+        index.dirty = False
+        return index
+
+
+class VectorIndex:
+    """Per-story :class:`StoryIndex` shards with disk snapshots."""
+
+    def __init__(self, dimension: int, snapshot_dir: Optional[str] = None, ivf_threshold: int = 4096, nprobe: int = 8):
+        self.dimension = dimension
+        self.snapshot_dir = snapshot_dir
+        self.options = {"ivf_threshold": ivf_threshold, "nprobe": nprobe}
+        self._stories: Dict[str, StoryIndex] = {}
+
+    def _path(self, story_id: str) -> Optional[str]:
+        if not self.snapshot_dir:
+            return None
+        name = hashlib.sha1(story_id.encode()).hexdigest()
+        return os.path.join(self.snapshot_dir, f"{name}.npz")
+
+    def story(self, story_id: str) -> StoryIndex:
+        index = self._stories.get(story_id)
+        if index is None:
+            path = self._path(story_id)
+            if path and os.path.exists(path):
+                index = StoryIndex.load(path, self.dimension, **self.options)
+            if index is None:
+                index = StoryIndex(self.dimension, **self.options)
+            self._stories[story_id] = index
+        return index
+
+    def add(self, story_id: str, ids: List[str], texts: List[str], vectors) -> None:
+        self.story(story_id).add(ids, texts, vectors)
+
+    def search(self, story_id: str, query, k: int) -> List[Dict[str, object]]:
+        return self.story(story_id).search(query, k)
+
+    def collect_dirty(self) -> List[tuple]:
+        """Export every changed story as ``(path, vectors, ids, texts)``.
+
+        Cheap copies taken on the event loop, so :meth:`write_snapshots` can
+        run in a worker thread while the index keeps changing.
+        """
+        if not self.snapshot_dir:
+            return []
+        return [(self._path(story_id), *index.export()) for story_id, index in self._stories.items() if index.dirty]
+
+    def write_snapshots(self, pending: List[tuple]) -> int:
+        if not pending:
+            return 0
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        written = 0
+        for path, vectors, ids, texts in pending:
+            try:
+                StoryIndex.write(path, vectors, ids, texts)
+                written += 1
+            except OSError as exc:
+                logger.warning("Vector index snapshot %s failed: %s", path, exc)
+        return written
+
+    def snapshot(self) -> int:
+        """Write every changed story index to disk; returns how many were written."""
+        return self.write_snapshots(self.collect_dirty())
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "stories": len(self._stories),
+            "vectors": sum(len(i) for i in self._stories.values()),
+            "ivf_stories": sum(1 for i in self._stories.values() if i.centroids is not None),
+        }
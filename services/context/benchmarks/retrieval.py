@@ -0,0 +1,104 @@
+"""Recall and latency of segment search: substring vs vector vs BM25 vs hybrid.
+
+Builds a synthetic manuscript in which each segment mentions a few unique
+character and place names, then queries for those names in the forms
+writers type them: exact, re-ordered, partial and lower-cased.
+
+    cd services/context && python benchmarks/retrieval.py --segments 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.embeddings import HashingEmbedder  # noqa: E402
+from app.lexical import BM25Shard, fuse  # noqa: E402
+from app.vector_index import StoryIndex  # noqa: E402
+
+FILLER = (
+    "the wind moved through the old streets while lanterns flickered and somebody laughed "
+    "far away as rain gathered over roofs and the night watch changed at the gate"
+).split()
+SYLLABLES = ["ka", "ri", "ven", "tor", "mi", "sha", "lo", "dra", "qu", "el", "bor", "is", "an", "wyn"]
+
+
+def _name(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+
+def build_corpus(n, rng):
+    segments, queries = [], []
+    for i in range(n):
+        person, place = f"{_name(rng)} {_name(rng)}", f"{_name(rng)} Hollow"
+        words = rng.sample(FILLER, 12) + [person, "reached", place] + rng.sample(FILLER, 12)
+        segments.append(" ".join(words).capitalize() + ".")
+        first, last = person.split()
+        queries.extend([
+            (person, i),  # exact
+            (f"{last} {first}", i),  # re-ordered
+            (last, i),  # partial
+            (f"{person.lower()} at {place.lower()}", i),  # lower-cased phrase
+        ])
+    rng.shuffle(queries)
+    return segments, queries
+
+
+def substring_search(segments, query, k):
+    lowered = query.lower()
+    scored = [(1.0 if lowered in s.lower() else 0.0, i) for i, s in enumerate(segments)]
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [i for _, i in scored[:k]]
+
+
+async def main(n_segments, n_queries, k):
+    rng = random.Random(7)
+    segments, queries = build_corpus(n_segments, rng)
+    queries = queries[:n_queries]
+    position = {text: i for i, text in enumerate(segments)}
+
+    embedder = HashingEmbedder(384)
+    vectors = await embedder.embed(segments)
+    index = StoryIndex(384)
+    index.add([str(i) for i in range(len(segments))], segments, vectors)
+    bm25 = BM25Shard()
+    for text in segments:
+        bm25.add(text)
+
+    async def vector(q, limit):
+        return index.search(await embedder.embed_one(q), limit)
+
+    async def lexical(q, limit):
+        return bm25.search(q, limit)
+
+    async def hybrid(q, limit):
+        return fuse(await vector(q, limit * 4), await lexical(q, limit * 4), limit)
+
+    async def substring(q, limit):
+        return [{"text": segments[i]} for i in substring_search(segments, q, limit)]
+
+    print(f"{len(segments)} segments, {len(queries)} queries, recall@{k}")
+    print(f"{'method':<10} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, search in (("substring", substring), ("vector", vector), ("bm25", lexical), ("hybrid", hybrid)):
+        hits, latencies = 0, []
+        for query, target in queries:
+            start = time.perf_counter()
+            results = await search(query, k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += any(position.get(r["text"]) == target for r in results)
+        latencies.sort()
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        print(f"{name:<10} {hits / len(queries):>7.3f} {statistics.median(latencies):>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.segments, args.queries, args.k))
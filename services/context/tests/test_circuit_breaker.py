@@ -0,0 +1,153 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app import core
+from app.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.outbox import Outbox
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_probes_once_and_backs_off():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, base_delay=1.0, max_delay=8.0, jitter=0.0, clock=clock)
+
+    breaker.record_failure(RuntimeError("timeout"))
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure(RuntimeError("timeout"))
+    assert breaker.state == OPEN and not breaker.allow()
+
+    clock.now = 1.0
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_failure(RuntimeError("still down"))
+    assert breaker.state == OPEN and breaker.retry_at == 3.0  # backoff doubled
+
+    clock.now = 3.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.metrics()["recovered"] == 1
+
+
+def test_breaker_reopens_when_probe_never_reports():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, base_delay=1.0, jitter=0.0, probe_timeout=5.0, clock=clock)
+    breaker.trip()
+
+    clock.now = 1.0
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    clock.now = 5.9
+    assert not breaker.allow()  # probe still in flight
+
+    clock.now = 6.0  # probe deadline passed without a report
+    assert not breaker.allow()
+    assert breaker.state == OPEN and breaker.retry_at == 8.0  # next backoff
+
+    clock.now = 8.0
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_outbox_survives_restart_and_keeps_failed_batches(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+    outbox = Outbox(path)
+    await outbox.add("s1", ["a", "b", "c"], ["one", "two", "three"])
+
+    reloaded = Outbox(path)
+    assert len(reloaded) == 3
+
+    sent = []
+
+    async def send(batch):
+        if sent:
+            raise ConnectionError("down again")
+        sent.append([e["id"] for e in batch])
+
+    with pytest.raises(ConnectionError):
+        await reloaded.replay(send, batch_size=2)
+    assert sent == [["a", "b"]]
+    remaining = Outbox(path)
+    assert len(remaining) == 1 and "c" in remaining._entries
+
+
+@pytest.mark.asyncio
+async def test_outbox_keeps_an_entry_requeued_during_replay(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+    outbox = Outbox(path)
+    await outbox.add("s1", ["p"], ["old text"])
+
+    sent = []
+
+    async def send(batch):
+        sent.extend(e["text"] for e in batch)
+        if len(sent) == 1:
+            await outbox.add("s1", ["p"], ["new text"])
+
+    assert await outbox.replay(send) == 2
+    assert sent == ["old text", "new text"]
+    assert len(outbox) == 0 and len(Outbox(path)) == 0
+
+
+class FakeQdrant:
+    def __init__(self):
+        self.up = True
+        self.points = {}
+
+    def _check(self):
+        if not self.up:
+            raise ConnectionError("qdrant unreachable")
+
+    async def get_collection(self, name):
+        self._check()
+        return SimpleNamespace(config=SimpleNamespace(params=SimpleNamespace(vectors=SimpleNamespace(size=core.settings.EMBEDDING_SIZE))))
+
+    async def upsert(self, collection_name, wait, points):
+        self._check()
+        for point in points:
+            self.points[point["id"]] = point
+
+    async def search(self, collection_name, query_vector, query_filter, limit, with_payload):
+        self._check()
+        return [SimpleNamespace(payload=p["payload"], score=1.0) for p in list(self.points.values())[:limit]]
+
+
+@pytest.mark.asyncio
+async def test_segments_written_during_outage_are_replayed(monkeypatch, tmp_path):
+    client = FakeQdrant()
+    fake_models = SimpleNamespace(
+        PointStruct=lambda **kw: kw,
+        Filter=lambda **kw: kw,
+        FieldCondition=lambda **kw: kw,
+        MatchValue=lambda **kw: kw,
+    )
+    clock = Clock()
+    monkeypatch.setattr(core, "qdrant_client", client)
+    monkeypatch.setattr(core, "qmodels", fake_models)
+    monkeypatch.setattr(core, "breaker", CircuitBreaker(failure_threshold=1, base_delay=5.0, jitter=0.0, clock=clock))
+    monkeypatch.setattr(core, "_outbox", Outbox(str(tmp_path / "outbox.jsonl")))
+    monkeypatch.setattr(core, "_fallback_index", None)
+    monkeypatch.setattr(core.settings, "VECTOR_INDEX_DIR", None)
+
+    first = await core.store_context_segment("s1", "Before the outage.")
+    client.up = False
+    during = await core.store_context_segment("s1", "During the outage.")
+    assert core.breaker.state == OPEN
+    # While open, Qdrant is not called at all and searches use the fallback.
+    assert [r["text"] for r in await core.search_story_segments("s1", "outage")] == ["During the outage."]
+
+    client.up = True
+    assert await core.recover_vector_store() == 0  # still backing off
+    clock.now = 5.0
+    assert await core.recover_vector_store() == 1
+    assert core.breaker.state == CLOSED
+    assert set(client.points) == {first, during}
+    assert len(core.get_outbox()) == 0
@@ -0,0 +1,54 @@
+import math
+
+import pytest
+
+from app.embeddings import CachedEmbedder, HashingEmbedder
+
+
+def _cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+@pytest.mark.asyncio
+async def test_hashing_embedder_is_normalised_and_lexically_meaningful():
+    embedder = HashingEmbedder(dimension=256)
+    vectors = await embedder.embed([
+        "The dragon attacked the castle at dawn.",
+        "At dawn a dragon attacks the castles.",
+        "Quarterly revenue figures were revised upward.",
+    ])
+    assert all(len(v) == 256 for v in vectors)
+    assert all(math.isclose(math.sqrt(sum(x * x for x in v)), 1.0) for v in vectors)
+    assert _cosine(vectors[0], vectors[1]) > 0.5
+    assert _cosine(vectors[0], vectors[1]) > _cosine(vectors[0], vectors[2]) + 0.3
+    assert vectors[0] == await embedder.embed_one("The dragon attacked the castle at dawn.")
+
+
+@pytest.mark.asyncio
+async def test_cached_embedder_only_sends_misses_to_backend():
+    calls = []
+
+    class Recording(HashingEmbedder):
+        async def embed(self, texts):
+            calls.append(list(texts))
+            return await super().embed(texts)
+
+    embedder = CachedEmbedder(Recording(dimension=32), max_entries=2)
+    first = await embedder.embed(["a", "b", "a"])
+    assert calls == [["a", "b"]]
+    assert first[0] == first[2]
+
+    await embedder.embed(["b", "c"])
+    assert calls[-1] == ["c"]
+    assert embedder.metrics()["entries"] == 2  # "a" evicted
+    await embedder.embed(["a"])
+    assert calls[-1] == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_cached_embedder_batch_larger_than_cache():
+    embedder = CachedEmbedder(HashingEmbedder(dimension=32), max_entries=2)
+    await embedder.embed(["a", "b"])
+    vectors = await embedder.embed(["a", "b", "c", "d", "e"])
+    assert vectors == await HashingEmbedder(dimension=32).embed(["a", "b", "c", "d", "e"])
+    assert embedder.metrics()["entries"] == 2
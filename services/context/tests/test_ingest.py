@@ -0,0 +1,30 @@
+from app.ingest import chunk_text
+from app.tokens import count_tokens
+
+
+def test_paragraph_chunks_respect_budget_and_keep_paragraphs_whole():
+    paragraphs = [f"Paragraph {i} tells of the lighthouse keeper and the long winter." for i in range(20)]
+    chunks = chunk_text("\n\n".join(paragraphs), max_tokens=60)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 60 for chunk in chunks)
+    assert [p for chunk in chunks for p in chunk.split("\n\n")] == paragraphs
+
+
+def test_oversized_units_are_split_on_words():
+    text = " ".join(f"word{i}" for i in range(500))
+    chunks = chunk_text(text, max_tokens=50, mode="tokens")
+
+    assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_overlap_repeats_trailing_sentences():
+    text = " ".join(f"Sentence number {i} is here." for i in range(12))
+    chunks = chunk_text(text, max_tokens=30, mode="tokens", overlap_tokens=8)
+
+    assert len(chunks) > 2
+    for previous, current in zip(chunks, chunks[1:]):
+        last_sentence = previous.rsplit(". ", 1)[-1]
+        assert current.startswith(last_sentence.rstrip("."))
+    assert chunk_text("   \n\n  ") == []
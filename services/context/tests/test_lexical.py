@@ -0,0 +1,56 @@
+import pytest
+
+from app.lexical import BM25Shard, LexicalIndex, fuse
+
+
+def test_bm25_prefers_rare_names_and_exact_phrases():
+    shard = BM25Shard()
+    shard.add("The harbour was quiet that night.")
+    shard.add("Captain Ilsa Varn walked the harbour at night.")
+    shard.add("Night fell over the quiet harbour town.")
+    assert not shard.add("The harbour was quiet that night.")  # duplicates stored once
+
+    assert shard.search("Varn", 3)[0]["text"].startswith("Captain Ilsa Varn")
+    results = shard.search("quiet harbour", 3)
+    assert results[0]["text"] == "Night fell over the quiet harbour town."
+    assert shard.search("nonexistent", 3) == []
+
+
+@pytest.mark.asyncio
+async def test_lexical_index_loads_lazily_then_updates_incrementally():
+    index = LexicalIndex()
+    index.add("s", "Dropped because the shard is not loaded yet.")
+
+    async def loader():
+        return ["The lighthouse keeper Oren.", "Storms over the bay."]
+
+    await index.ensure_loaded("s", loader)
+    index.add("s", "Oren lit the lamp.")
+    assert {r["text"] for r in index.search("s", "Oren", 5)} == {"The lighthouse keeper Oren.", "Oren lit the lamp."}
+
+
+@pytest.mark.asyncio
+async def test_segments_added_while_a_shard_loads_are_kept():
+    index = LexicalIndex()
+
+    async def loader():
+        # Committed after the loader's snapshot was taken
+        index.add("s", "Oren rowed out at dawn.")
+        index.add("s", "The lighthouse keeper Oren.")
+        return ["The lighthouse keeper Oren."]
+
+    await index.ensure_loaded("s", loader)
+    assert len(index._shards["s"]) == 2
+    assert {r["text"] for r in index.search("s", "Oren", 5)} == {"The lighthouse keeper Oren.", "Oren rowed out at dawn."}
+    assert index._buffered == {}
+
+
+def test_rrf_fusion_rewards_agreement():
+    vector = [{"text": "a", "score": 0.9}, {"text": "b", "score": 0.8}]
+    lexical = [{"text": "b", "score": 12.0}, {"text": "c", "score": 3.0}]
+    fused = fuse(vector, lexical, 3)
+    assert [r["text"] for r in fused] == ["b", "a", "c"]
+    assert fused[0]["sources"] == ["vector", "lexical"]
+
+    weighted = fuse(vector, lexical, 3, method="weighted", vector_weight=0.9)
+    assert weighted[0]["text"] == "a"
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from app.vector_index import StoryIndex, VectorIndex
+
+
+def _unit(rows):
+    rows = np.asarray(rows, dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_brute_force_top_k_matches_exact_ranking():
+    rng = np.random.default_rng(1)
+    data = _unit(rng.normal(size=(500, 32)))
+    index = StoryIndex(32)
+    for start in range(0, 500, 50):  # grows past the initial capacity
+        index.add([str(i) for i in range(start, start + 50)], [f"t{i}" for i in range(start, start + 50)], data[start : start + 50])
+
+    query = data[7]
+    results = index.search(query, 5)
+    expected = np.argsort(-(data @ query))[:5]
+    assert [r["id"] for r in results] == [str(i) for i in expected]
+    assert results[0]["id"] == "7" and results[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_ivf_index_keeps_high_recall():
+    rng = np.random.default_rng(2)
+    centers = _unit(rng.normal(size=(20, 16)))
+    data = _unit(centers[rng.integers(0, 20, 3000)] + 0.1 * rng.normal(size=(3000, 16)))
+    index = StoryIndex(16, ivf_threshold=1000, nprobe=8)
+    index.add([str(i) for i in range(3000)], [""] * 3000, data)
+    assert index.centroids is not None
+
+    hits = 0
+    for q in range(50):
+        exact = set(np.argsort(-(data @ data[q]))[:10].astype(str))
+        hits += len(exact & {r["id"] for r in index.search(data[q], 10)})
+    assert hits / 500 >= 0.9
+
+
+def test_snapshot_round_trip(tmp_path):
+    index = VectorIndex(4, snapshot_dir=str(tmp_path))
+    index.add("story", ["a", "b"], ["dragon", "castle"], _unit([[1, 0, 0, 0], [0, 1, 0, 0]]))
+    assert index.snapshot() == 1
+    assert index.snapshot() == 0  # nothing changed since
+
+    restored = VectorIndex(4, snapshot_dir=str(tmp_path))
+    assert restored.search("story", [0, 1, 0, 0], 1)[0]["text"] == "castle"
+    assert len(VectorIndex(8, snapshot_dir=str(tmp_path)).story("story")) == 0  # other embedder width
+
+
+@pytest.mark.asyncio
+async def test_fallback_search_ranks_by_similarity(monkeypatch):
+    from app import core
+    from app.vector_index import VectorIndex
+
+    monkeypatch.setattr(core, "qdrant_client", None)
+    monkeypatch.setattr(core, "_fallback_index", VectorIndex(core.settings.EMBEDDING_SIZE))
+    await core.store_context_segment("s", "The market square was busy with traders.")
+    await core.store_context_segment("s", "Dragons circled the mountain fortress.")
+    await core.store_context_segment("other", "Dragons everywhere.")
+
+    results = await core.search_story_segments("s", "dragon over the fortress", limit=2)
+    assert results[0]["text"] == "Dragons circled the mountain fortress."
+    assert results[0]["score"] > results[1]["score"]
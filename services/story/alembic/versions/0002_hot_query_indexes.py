@@ -0,0 +1,24 @@
+"""Indexes for hot story-service queries
+
+Also merges the two initial heads.
+"""
+from alembic import op
+
+revision = '0002'
+down_revision = ('0001', '0001_add_merge_fields')
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_chapters_story_position', 'chapters', ['story_id', 'position'])
+    op.create_index('ix_chapters_branch_position', 'chapters', ['branch_id', 'position'])
+    op.create_index('ix_stories_user_created', 'stories', ['user_id', 'created_at'])
+    op.create_index('ix_branches_story_main', 'branches', ['story_id', 'is_main'])
+    op.create_index('ix_characters_story_name', 'characters', ['story_id', 'name'])
+
+def downgrade():
+    op.drop_index('ix_characters_story_name', table_name='characters')
+    op.drop_index('ix_branches_story_main', table_name='branches')
+    op.drop_index('ix_stories_user_created', table_name='stories')
+    op.drop_index('ix_chapters_branch_position', table_name='chapters')
+    op.drop_index('ix_chapters_story_position', table_name='chapters')
@@ -0,0 +1,34 @@
+"""Chapter aggregates on stories and branches
+
+Adds chapter_count, word_count and last_modified_at and fills them from
+the existing chapters.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def _backfill(table, key):
+    op.execute(f"""
+        UPDATE {table} SET
+            chapter_count = (SELECT COUNT(*) FROM chapters WHERE chapters.{key} = {table}.id),
+            word_count = (SELECT COALESCE(SUM(word_count), 0) FROM chapters WHERE chapters.{key} = {table}.id),
+            last_modified_at = (SELECT MAX(COALESCE(updated_at, created_at)) FROM chapters WHERE chapters.{key} = {table}.id)
+    """)
+
+def upgrade():
+    for table in ('stories', 'branches'):
+        op.add_column(table, sa.Column('chapter_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('word_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('last_modified_at', sa.DateTime(timezone=True), nullable=True))
+    _backfill('stories', 'story_id')
+    _backfill('branches', 'branch_id')
+
+def downgrade():
+    for table in ('branches', 'stories'):
+        op.drop_column(table, 'last_modified_at')
+        op.drop_column(table, 'word_count')
+        op.drop_column(table, 'chapter_count')
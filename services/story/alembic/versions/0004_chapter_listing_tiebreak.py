@@ -0,0 +1,19 @@
+"""Add chapter id to the story listing index
+
+Chapter listings order by (position, id) because positions need not be
+unique, so the index covers both to keep the sort out of the query.
+"""
+from alembic import op
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.drop_index('ix_chapters_story_position', table_name='chapters')
+    op.create_index('ix_chapters_story_position', 'chapters', ['story_id', 'position', 'id'])
+
+def downgrade():
+    op.drop_index('ix_chapters_story_position', table_name='chapters')
+    op.create_index('ix_chapters_story_position', 'chapters', ['story_id', 'position'])
@@ -10,6 +10,7 @@ from app.models.branch import Branch
 from app.models.chapter import Chapter
 from app.models.story import Story
 from app.schemas.branch import BranchCreate, BranchUpdate, BranchResponse
+from app.services import story_stats
 from app.core.security import get_current_user
 
 router = APIRouter()
@@ -27,10 +28,18 @@ async def create_branch(
     if not story:
         raise HTTPException(status_code=404, detail="Story not found")
 
+    parent_branch_id = branch.parent_branch_id
+    if parent_branch_id is None:
+        # New branches fork from the main line unless told otherwise.
+        result = await db.execute(
+            select(Branch.id).where(Branch.story_id == branch.story_id, Branch.is_main.is_(True))
+        )
+        parent_branch_id = result.scalars().first()
+
     db_branch = Branch(
         id=str(uuid.uuid4()),
         story_id=branch.story_id,
-        parent_branch_id=branch.parent_branch_id,
+        parent_branch_id=parent_branch_id,
         name=branch.name,
         description=branch.description,
         status=branch.status or "active",
@@ -121,6 +130,7 @@ async def merge_branch(
     if not parent:
         raise HTTPException(status_code=404, detail="Parent branch not found")
 
+    await story_stats.record_merge(db, branch.story_id, branch.id, parent.id)
     await db.execute(
         update(Chapter)
         .where(Chapter.branch_id == branch.id)
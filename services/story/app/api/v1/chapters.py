@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional, Union
+import hashlib
 
 from app.db.database import get_db
-from app.services.chapter_service import ChapterService
+from app.services.chapter_service import AIRateLimited, ChapterService, Cursor
 from app.schemas.chapter import (
     ChapterCreate, ChapterUpdate, ChapterResponse,
-    ChapterListResponse, GenerateChapterRequest
+    ChapterListResponse, ChapterMove, ChapterSummaryResponse, GenerateChapterRequest
 )
 from app.core.security import get_current_user
 
@@ -63,16 +66,62 @@ async def delete_chapter(
         raise HTTPException(status_code=404, detail="Chapter not found")
     return {"message": "Chapter deleted successfully"}
 
-@router.get("/story/{story_id}", response_model=List[ChapterListResponse])
+_CHAPTER_LIST = TypeAdapter(List[ChapterListResponse])
+_CHAPTER_SUMMARIES = TypeAdapter(List[ChapterSummaryResponse])
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as If-None-Match requires
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def _parse_cursor(value: str) -> Cursor:
+    position, _, chapter_id = value.partition(":")
+    try:
+        return int(position), chapter_id or None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/story/{story_id}", response_model=Union[List[ChapterListResponse], List[ChapterSummaryResponse]])
 async def get_story_chapters(
     story_id: str,
+    view: str = Query("full", pattern="^(full|summary)$", description="summary leaves out chapter content"),
+    after: Optional[str] = Query(None, description="Cursor from X-Next-Cursor, or a position"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    if_none_match: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_current_user)
 ):
-    """Get all chapters for a story"""
+    """Get chapters for a story.
+
+    The ETag is a hash of the listing itself, so sending it back in
+    ``If-None-Match`` gets a 304 until something shown changes. When a page
+    is full, ``X-Next-Cursor`` is the ``<position>:<id>`` cursor to pass as
+    ``after`` for the next one. A bare position is accepted too.
+    """
+    cursor = _parse_cursor(after) if after is not None else None
     service = ChapterService(db)
-    chapters = await service.get_chapters_by_story(story_id)
-    return chapters
+    summary = view == "summary"
+    chapters = await service.get_chapters_by_story(story_id, summary=summary, after=cursor, offset=offset, limit=limit)
+
+    adapter = _CHAPTER_SUMMARIES if summary else _CHAPTER_LIST
+    items = adapter.validate_python(chapters, from_attributes=True)
+    first = offset + 1
+    if cursor is not None and items:
+        first += await service.count_chapters_before(story_id, cursor)
+    for number, item in enumerate(items, start=first):
+        item.number = number
+    body = adapter.dump_json(items)
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if limit is not None and len(chapters) == limit:
+        headers["X-Next-Cursor"] = f"{chapters[-1].position}:{chapters[-1].id}"
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.post("/generate", response_model=ChapterResponse)
 async def generate_chapter(
@@ -84,11 +133,32 @@ async def generate_chapter(
     """Generate a new chapter using AI"""
     service = ChapterService(db)
     try:
-        chapter = await service.generate_chapter_with_ai(request, model=model)
+        chapter = await service.generate_chapter_with_ai(request, model=model, user_id=user_id)
         return chapter
+    except AIRateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate-stream")
+async def generate_chapter_stream(
+    request: GenerateChapterRequest,
+    model: str = Query("groq", description="AI model to use: claude, groq, gpt"),
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_current_user)
+):
+    """Generate a new chapter using AI, streaming text as it is written"""
+    service = ChapterService(db)
+    started = await service.start_streamed_generation(request, model=model)
+    if started is None:
+        raise HTTPException(status_code=404, detail="Story not found")
+    chapter, ai_request = started
+    return StreamingResponse(
+        service.stream_generation(chapter, ai_request, model=model, user_id=user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.put("/story/{story_id}/reorder")
 async def reorder_chapters(
     story_id: str,
@@ -96,9 +166,26 @@ async def reorder_chapters(
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_current_user)
 ):
-    """Reorder chapters in a story"""
+    """Set chapter positions in a story from a ``{chapter_id: position}`` map"""
     service = ChapterService(db)
     success = await service.reorder_chapters(story_id, chapter_positions)
     if not success:
         raise HTTPException(status_code=400, detail="Failed to reorder chapters")
     return {"message": "Chapters reordered successfully"}
+
+@router.post("/{chapter_id}/move", response_model=ChapterResponse)
+async def move_chapter(
+    chapter_id: str,
+    move: ChapterMove,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_current_user)
+):
+    """Move a chapter to just after another one, or to the start of the story"""
+    service = ChapterService(db)
+    try:
+        chapter = await service.move_chapter(chapter_id, after_id=move.after_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not chapter:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    return chapter
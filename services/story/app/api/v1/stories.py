@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import Any, Dict, List
 
 from app.db.database import get_db
 from app.models.story import Story
 from app.models.branch import Branch
-from app.models.chapter import Chapter
-from app.schemas.story import StoryCreate, StoryUpdate, StoryResponse
+from app.schemas.story import StoryCreate, StoryUpdate, StoryResponse, StoryStatsResponse, BranchStats
+from app.services import story_stats
+from app.services.export_service import EXPORT_FORMATS, StoryInfo, stream_export
 from app.core.security import get_current_user
 
 router = APIRouter()
@@ -57,6 +59,7 @@ async def list_stories(
     result = await db.execute(
         select(Story)
         .where(Story.user_id == user_id)
+        .order_by(Story.created_at.desc())
         .offset(skip)
         .limit(limit)
     )
@@ -128,39 +131,64 @@ async def delete_story(
     return {"message": "Story deleted successfully"}
 
 
-@router.get("/{story_id}/export")
-async def export_story(
+@router.get("/{story_id}/stats", response_model=StoryStatsResponse)
+async def get_story_stats(
     story_id: str,
     db: AsyncSession = Depends(get_db),
     user_id: str = Depends(get_current_user),
 ):
-    """Export a story and its chapters as Markdown"""
+    """Word and chapter counts for a story and its branches, without reading any chapter"""
     result = await db.execute(
-        select(Story).where(Story.id == story_id, Story.user_id == user_id)
+        select(Story.id, Story.chapter_count, Story.word_count, Story.last_modified_at)
+        .where(Story.id == story_id, Story.user_id == user_id)
     )
-    story = result.scalar_one_or_none()
-
+    story = result.one_or_none()
     if not story:
         raise HTTPException(status_code=404, detail="Story not found")
 
-    chapters_result = await db.execute(
-        select(Chapter)
-        .where(Chapter.story_id == story_id)
-        .order_by(Chapter.position)
+    result = await db.execute(
+        select(Branch.id, Branch.name, Branch.chapter_count, Branch.word_count, Branch.last_modified_at)
+        .where(Branch.story_id == story_id)
+    )
+    return StoryStatsResponse(
+        **story._mapping,
+        branches=[BranchStats(**branch._mapping) for branch in result.all()],
     )
-    chapters = chapters_result.scalars().all()
 
-    md_parts = [f"# {story.title}\n"]
-    if story.description:
-        md_parts.append(f"{story.description}\n")
+@router.post("/{story_id}/stats/reconcile")
+async def reconcile_story_stats(
+    story_id: str,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+) -> Dict[str, Any]:
+    """Recount a story's aggregates from its chapters and repair any drift"""
+    result = await db.execute(
+        select(Story.id).where(Story.id == story_id, Story.user_id == user_id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Story not found")
+    return {"repaired": await story_stats.reconcile(db, story_id)}
 
-    for chapter in chapters:
-        md_parts.append(f"## Chapter {chapter.position}: {chapter.title}\n")
-        md_parts.append(chapter.content + "\n")
 
-    markdown = "\n".join(md_parts)
+@router.get("/{story_id}/export")
+async def export_story(
+    story_id: str,
+    format: str = Query("markdown", pattern="^(markdown|text|epub|docx)$", description="markdown, text, epub or docx"),
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_current_user),
+):
+    """Export a story and its chapters, streamed chapter by chapter"""
+    result = await db.execute(
+        select(Story).where(Story.id == story_id, Story.user_id == user_id)
+    )
+    story = result.scalar_one_or_none()
+
+    if not story:
+        raise HTTPException(status_code=404, detail="Story not found")
 
+    media_type, extension, _ = EXPORT_FORMATS[format]
+    info = StoryInfo(id=story.id, title=story.title, description=story.description, genre=story.genre, author=user_id)
     headers = {
-        "Content-Disposition": f"attachment; filename={story.title.replace(' ', '_')}.md"
+        "Content-Disposition": f"attachment; filename={story.title.replace(' ', '_')}.{extension}"
     }
-    return Response(content=markdown, media_type="text/markdown", headers=headers)
+    return StreamingResponse(stream_export(info, format), media_type=media_type, headers=headers)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     # Database
@@ -18,6 +18,32 @@ class Settings(BaseSettings):
     
     # Service
     SERVICE_NAME: str = "story-service"
+
+    # Upstream services
+    AI_SERVICE_URL: str = "http://ai-service:8000"
+    # Shared with the AI service so it trusts the X-User-Id we send
+    AI_SERVICE_TOKEN: Optional[str] = None
+    AI_GENERATION_TIMEOUT: float = 60.0
+    GENERATION_CONTEXT_CHAPTERS: int = 10
+    # Latest chapters still being revised; older ones go in the cached prompt prefix
+    GENERATION_VOLATILE_CHAPTERS: int = 2
+    GENERATION_SAVE_INTERVAL: float = 2.0  # seconds between partial saves while streaming
+
+    # Spacing between chapter positions when a story is renumbered, so a
+    # moved chapter can usually take a free position between its neighbours
+    CHAPTER_POSITION_GAP: int = 1024
+
+    # Export: chapters fetched per round trip from the server-side cursor
+    EXPORT_BATCH_SIZE: int = 20
+
+    # Inter-service HTTP client pool
+    HTTP_TIMEOUT: float = 10.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = True
+    HTTP_UPSTREAM_MAX_CONNECTIONS: Dict[str, int] = {}
     
     class Config:
         env_file = ".env"
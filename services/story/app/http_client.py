@@ -0,0 +1,58 @@
+"""Pooled HTTP clients for calls to other Quantum Writer services.
+
+One ``httpx.AsyncClient`` is kept per upstream so keep-alive connections are
+reused across requests instead of opening a new pool (and paying for DNS and
+the TCP handshake) on every call. Clients are created lazily and closed by
+the application lifespan.
+"""
+import importlib.util
+from typing import Dict
+
+import httpx
+
+from app.core.config import settings
+
+# HTTP/2 needs the optional ``h2`` package; fall back to HTTP/1.1 without it.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class ServiceClients:
+    """Registry of long-lived HTTP clients keyed by upstream name."""
+
+    def __init__(self) -> None:
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _build(self, upstream: str) -> httpx.AsyncClient:
+        max_connections = settings.HTTP_UPSTREAM_MAX_CONNECTIONS.get(
+            upstream, settings.HTTP_MAX_CONNECTIONS
+        )
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(settings.HTTP_MAX_KEEPALIVE_CONNECTIONS, max_connections),
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+        return httpx.AsyncClient(
+            limits=limits,
+            timeout=timeout,
+            http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+        )
+
+    def get(self, upstream: str) -> httpx.AsyncClient:
+        """Return the pooled client for ``upstream``, creating it on first use."""
+        client = self._clients.get(upstream)
+        if client is None or client.is_closed:
+            client = self._build(upstream)
+            self._clients[upstream] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Close every pooled client; called on application shutdown."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+# Global instance
+service_clients = ServiceClients()
@@ -5,6 +5,7 @@ from contextlib import asynccontextmanager
 from app.api.v1 import stories, chapters, branches
 from app.core.config import settings
 from app.db.database import engine, Base
+from app.http_client import service_clients
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -13,6 +14,7 @@ async def lifespan(app: FastAPI):
         await conn.run_sync(Base.metadata.create_all)
     yield
     # Shutdown
+    await service_clients.aclose()
     await engine.dispose()
 
 app = FastAPI(
@@ -1,11 +1,14 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, JSON, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, DateTime, Integer, ForeignKey, JSON, Boolean, Index
+from sqlalchemy.orm import backref, relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
 import uuid
 
 class Branch(Base):
     __tablename__ = "branches"
+    __table_args__ = (
+        Index("ix_branches_story_main", "story_id", "is_main"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     story_id = Column(String, ForeignKey("stories.id"), nullable=False)
@@ -19,6 +22,11 @@ class Branch(Base):
     status = Column(String(50), default="active")  # active, merged, abandoned
     branch_metadata = Column(JSON, default={})
     
+    # Same aggregates as the story's, over this branch's chapters only
+    chapter_count = Column(Integer, nullable=False, default=0, server_default="0")
+    word_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_modified_at = Column(DateTime(timezone=True), nullable=True)
+    
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -26,4 +34,7 @@ class Branch(Base):
     # Relationships
     story = relationship("Story", back_populates="branches")
     chapters = relationship("Chapter", back_populates="branch")
-    child_branches = relationship("Branch", backref="parent_branch", remote_side=[id])
\ No newline at end of file
+    # Forks of this branch; merged_into_id also points at branches, so name the key
+    child_branches = relationship(
+        "Branch", backref=backref("parent_branch", remote_side=[id]), foreign_keys=[parent_branch_id]
+    )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, Integer, ForeignKey, JSON
+from sqlalchemy import Column, String, Text, DateTime, Integer, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -6,6 +6,13 @@ import uuid
 
 class Chapter(Base):
     __tablename__ = "chapters"
+    __table_args__ = (
+        # Listings, next-position lookups and context windows: story, in
+        # position order with the id breaking ties between equal positions
+        Index("ix_chapters_story_position", "story_id", "position", "id"),
+        # Branch merges move a branch's chapters
+        Index("ix_chapters_branch_position", "branch_id", "position"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     story_id = Column(String, ForeignKey("stories.id"), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, Integer, ForeignKey, JSON
+from sqlalchemy import Column, String, Text, DateTime, Integer, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -6,6 +6,10 @@ import uuid
 
 class Story(Base):
     __tablename__ = "stories"
+    __table_args__ = (
+        # A user's stories, newest first; also serves ownership checks by id
+        Index("ix_stories_user_created", "user_id", "created_at"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     title = Column(String(255), nullable=False)
@@ -16,6 +20,11 @@ class Story(Base):
     # User relationship
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     
+    # Aggregates over all chapters, kept current by every chapter write (app.services.story_stats)
+    chapter_count = Column(Integer, nullable=False, default=0, server_default="0")
+    word_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_modified_at = Column(DateTime(timezone=True), nullable=True)
+    
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -27,5 +27,8 @@ class BranchResponse(BranchBase):
     is_main: bool = False
     merged_into_id: Optional[str] = None
     merged_at: Optional[datetime] = None
+    chapter_count: int = 0
+    word_count: int = 0
+    last_modified_at: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
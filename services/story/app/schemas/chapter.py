@@ -29,15 +29,26 @@ class ChapterResponse(ChapterBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-class ChapterListResponse(BaseModel):
+class ChapterSummaryResponse(BaseModel):
+    """Chapter listing without the body, e.g. for a table of contents"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     title: str
-    content: str
     position: int
+    # 1-based chapter number; positions are only a sort key and may have gaps
+    number: Optional[int] = None
     word_count: int
+    version: int
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+class ChapterListResponse(ChapterSummaryResponse):
+    content: str
+
+class ChapterMove(BaseModel):
+    after_id: Optional[str] = Field(default=None, description="Chapter to place it after; omit to make it the first")
+
 class GenerateChapterRequest(BaseModel):
     story_id: str
     title: str = Field(..., description="Title for the new chapter")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 class StoryBase(BaseModel):
@@ -22,6 +22,9 @@ class StoryResponse(StoryBase):
     
     id: str
     user_id: str
+    chapter_count: int = 0
+    word_count: int = 0
+    last_modified_at: Optional[datetime] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -31,4 +34,23 @@ class StoryListResponse(BaseModel):
     genre: Optional[str] = None
     description: Optional[str] = None
     created_at: datetime
-    updated_at: Optional[datetime] = None
\ No newline at end of file
+    updated_at: Optional[datetime] = None
+
+class BranchStats(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    name: str
+    chapter_count: int
+    word_count: int
+    last_modified_at: Optional[datetime] = None
+
+class StoryStatsResponse(BaseModel):
+    """Chapter aggregates for a story and each of its branches"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    chapter_count: int
+    word_count: int
+    last_modified_at: Optional[datetime] = None
+    branches: List[BranchStats] = []
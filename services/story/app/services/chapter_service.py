@@ -1,13 +1,62 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
-from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from sqlalchemy import and_, case, delete, func, not_, or_, select, update
+from sqlalchemy.orm import load_only, selectinload
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import json
+import time
 import uuid
+
 import httpx
 
+from app.core.config import settings
+from app.db import database
+from app.http_client import service_clients
 from app.models.chapter import Chapter
 from app.models.story import Story
-from app.schemas.chapter import ChapterCreate, ChapterUpdate, GenerateChapterRequest
+from app.models.character import Character
+from app.schemas.chapter import ChapterCreate, ChapterResponse, ChapterUpdate, GenerateChapterRequest
+from app.services import story_stats
+
+# Columns a chapter listing needs; the body stays in the database
+SUMMARY_COLUMNS = (
+    Chapter.id, Chapter.title, Chapter.position, Chapter.word_count, Chapter.version, Chapter.created_at, Chapter.updated_at
+)
+
+DEFAULT_SYSTEM_PROMPT = "You are a creative writing assistant continuing a story. Maintain consistency with the existing narrative and characters. Write compelling, original fiction."
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+# Listing cursor: the (position, id) of the last chapter already seen
+Cursor = Tuple[int, Optional[str]]
+
+
+def _after_cursor(cursor: Cursor):
+    position, chapter_id = cursor
+    if chapter_id is None:
+        return Chapter.position > position
+    return or_(Chapter.position > position, and_(Chapter.position == position, Chapter.id > chapter_id))
+
+
+def _ai_headers(user_id: Optional[str]) -> Dict[str, str]:
+    # The AI service rate limits per user rather than per calling service,
+    # but only believes the user id alongside the shared service token
+    headers = {"X-User-Id": user_id} if user_id else {}
+    if headers and settings.AI_SERVICE_TOKEN:
+        headers["X-Service-Token"] = settings.AI_SERVICE_TOKEN
+    return headers
+
+
+class AIRateLimited(Exception):
+    """The AI service refused the generation because the user is over a limit."""
+
+    def __init__(self, retry_after: str):
+        super().__init__(f"AI generation rate limit exceeded; retry after {retry_after}s")
+        self.retry_after = retry_after
+
 
 class ChapterService:
     def __init__(self, db: AsyncSession):
@@ -38,6 +87,7 @@ class ChapterService:
         )
         
         self.db.add(chapter)
+        await story_stats.record_change(self.db, chapter.story_id, chapter.branch_id, chapters=1, words=word_count)
         await self.db.commit()
         await self.db.refresh(chapter)
         return chapter
@@ -49,13 +99,31 @@ class ChapterService:
         )
         return result.scalar_one_or_none()
     
-    async def get_chapters_by_story(self, story_id: str) -> List[Chapter]:
-        """Get all chapters for a story, ordered by position"""
-        result = await self.db.execute(
-            select(Chapter)
-            .where(Chapter.story_id == story_id)
-            .order_by(Chapter.position)
-        )
+    async def get_chapters_by_story(
+        self,
+        story_id: str,
+        summary: bool = False,
+        after: Optional[Cursor] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[Chapter]:
+        """Get chapters for a story, ordered by position and then id.
+
+        Positions need not be unique, so the id breaks ties. ``summary``
+        loads only the listing columns and leaves ``content`` unloaded.
+        ``after`` is a ``(position, id)`` cursor: only chapters ordered after
+        it are returned. With no id, every chapter at that position is skipped.
+        """
+        stmt = select(Chapter).where(Chapter.story_id == story_id).order_by(Chapter.position, Chapter.id)
+        if summary:
+            stmt = stmt.options(load_only(*SUMMARY_COLUMNS, raiseload=True))
+        if after is not None:
+            stmt = stmt.where(_after_cursor(after))
+        if offset:
+            stmt = stmt.offset(offset)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        result = await self.db.execute(stmt)
         return list(result.scalars().all())
     
     async def update_chapter(self, chapter_id: str, chapter_data: ChapterUpdate) -> Optional[Chapter]:
@@ -71,11 +139,13 @@ class ChapterService:
             update_data['word_count'] = len(update_data['content'].split())
         
         if update_data:
+            words = update_data.get('word_count', chapter.word_count or 0) - (chapter.word_count or 0)
             await self.db.execute(
                 update(Chapter)
                 .where(Chapter.id == chapter_id)
                 .values(**update_data)
             )
+            await story_stats.record_change(self.db, chapter.story_id, chapter.branch_id, words=words)
             await self.db.commit()
             await self.db.refresh(chapter)
         
@@ -84,53 +154,190 @@ class ChapterService:
     async def delete_chapter(self, chapter_id: str) -> bool:
         """Delete a chapter"""
         result = await self.db.execute(
+            select(Chapter.story_id, Chapter.branch_id, Chapter.word_count).where(Chapter.id == chapter_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return False
+        story_id, branch_id, word_count = row
+        await self.db.execute(
             delete(Chapter).where(Chapter.id == chapter_id)
         )
+        await story_stats.record_change(self.db, story_id, branch_id, chapters=-1, words=-(word_count or 0))
         await self.db.commit()
-        return result.rowcount > 0
+        return True
     
     async def reorder_chapters(self, story_id: str, chapter_positions: dict) -> bool:
-        """Reorder chapters in a story"""
+        """Set the positions of several chapters in a story in one statement"""
+        if any(isinstance(position, bool) or not isinstance(position, int) for position in chapter_positions.values()):
+            return False
+        positions = {str(chapter_id): position for chapter_id, position in chapter_positions.items()}
+        if not positions:
+            return True
         try:
-            for chapter_id, position in chapter_positions.items():
-                await self.db.execute(
-                    update(Chapter)
-                    .where(Chapter.id == chapter_id, Chapter.story_id == story_id)
-                    .values(position=position)
-                )
+            await self._set_positions(story_id, positions)
             await self.db.commit()
             return True
         except Exception:
             await self.db.rollback()
             return False
-    
-    async def generate_chapter_with_ai(self, request: GenerateChapterRequest, model: str = "groq") -> Chapter:
-        """Generate a new chapter using AI service"""
-        # Get story context for AI generation
-        chapters = await self.get_chapters_by_story(request.story_id)
-        context = ""
-        
-        if chapters:
-            # Build context from previous chapters
-            context_parts = []
-            for chapter in chapters[-3:]:  # Use last 3 chapters for context
-                context_parts.append(f"Chapter {chapter.position}: {chapter.title}\n{chapter.content}")
-            context = "\n\n".join(context_parts)
-        
-        # Call AI service with model parameter
-        ai_url = f"http://ai-service:8000/api/v1/generate?model={model}"  # Internal docker network
-        ai_request = {
+
+    async def _set_positions(self, story_id: str, positions: Dict[str, int]) -> None:
+        await self.db.execute(
+            update(Chapter)
+            .where(Chapter.story_id == story_id, Chapter.id.in_(list(positions)))
+            .values(position=case(positions, value=Chapter.id))
+            .execution_options(synchronize_session=False)
+        )
+
+    async def count_chapters_before(self, story_id: str, cursor: Cursor) -> int:
+        """Number of chapters ordered at or before ``cursor``"""
+        result = await self.db.execute(
+            select(func.count())
+            .select_from(Chapter)
+            .where(Chapter.story_id == story_id, not_(_after_cursor(cursor)))
+        )
+        return result.scalar() or 0
+
+    async def move_chapter(self, chapter_id: str, after_id: Optional[str] = None) -> Optional[Chapter]:
+        """Move a chapter to just after ``after_id``, or to the start.
+
+        The chapter takes the free position halfway between its new
+        neighbours, so a move normally updates only that chapter. When the
+        neighbours are adjacent, the story is renumbered with
+        ``CHAPTER_POSITION_GAP`` between chapters in a single statement.
+        Raises ValueError if ``after_id`` is not another chapter of the story.
+        """
+        chapter = await self.get_chapter(chapter_id)
+        if not chapter:
+            return None
+        story_id = chapter.story_id
+
+        lower = 0
+        if after_id is not None:
+            if after_id == chapter_id:
+                raise ValueError("A chapter cannot be moved after itself")
+            result = await self.db.execute(
+                select(Chapter.position).where(Chapter.id == after_id, Chapter.story_id == story_id)
+            )
+            lower = result.scalar_one_or_none()
+            if lower is None:
+                raise ValueError("Chapter to move after is not in this story")
+
+        stmt = select(func.min(Chapter.position)).where(Chapter.story_id == story_id, Chapter.id != chapter_id)
+        if after_id is not None:
+            stmt = stmt.where(Chapter.position > lower)
+        upper = (await self.db.execute(stmt)).scalar()
+
+        gap = settings.CHAPTER_POSITION_GAP
+        if upper is None:
+            position = lower + gap
+        elif upper - lower > 1:
+            position = (lower + upper) // 2
+        else:
+            position = None
+
+        if position is not None:
+            if position != chapter.position:
+                await self._set_positions(story_id, {chapter_id: position})
+        else:
+            result = await self.db.execute(
+                select(Chapter.id)
+                .where(Chapter.story_id == story_id, Chapter.id != chapter_id)
+                .order_by(Chapter.position)
+            )
+            order = list(result.scalars().all())
+            order.insert(order.index(after_id) + 1 if after_id is not None else 0, chapter_id)
+            await self._set_positions(story_id, {cid: (i + 1) * gap for i, cid in enumerate(order)})
+
+        await self.db.commit()
+        await self.db.refresh(chapter)
+        return chapter
+
+    async def build_context_pieces(self, story_id: str) -> List[Dict[str, Any]]:
+        """Collect prioritised context pieces for the next chapter.
+
+        The newest chapters rank highest; older ones fall below the story
+        summary, hidden notes and character sheets. Only the last
+        ``GENERATION_CONTEXT_CHAPTERS`` chapters are loaded. Everything but
+        the last ``GENERATION_VOLATILE_CHAPTERS`` chapters is marked
+        cacheable, so the AI service can send it as a cached prompt prefix.
+        """
+        pieces: List[Dict[str, Any]] = []
+
+        story = await self.db.get(Story, story_id)
+        if story:
+            if story.description:
+                pieces.append({"name": "summary", "kind": "summary", "priority": 80, "keep": "start",
+                               "text": f"Story: {story.title}\n{story.description}"})
+            notes = (story.story_metadata or {}).get("notes")
+            if notes:
+                pieces.append({"name": "notes", "kind": "notes", "priority": 75, "keep": "start",
+                               "text": f"Author notes (do not reveal directly):\n{notes}"})
+
+        result = await self.db.execute(
+            select(Character).where(Character.story_id == story_id).order_by(Character.name)
+        )
+        for character in result.scalars().all():
+            sheet = [f"{character.name} ({character.role or 'character'})"]
+            if character.description:
+                sheet.append(character.description)
+            if character.traits:
+                sheet.append("Traits: " + ", ".join(str(t) for t in character.traits))
+            if character.arc:
+                sheet.append(f"Arc: {character.arc}")
+            pieces.append({"name": f"character:{character.name}", "kind": "character", "priority": 70,
+                           "keep": "start", "text": "\n".join(sheet)})
+
+        result = await self.db.execute(
+            select(Chapter)
+            .where(Chapter.story_id == story_id)
+            .order_by(Chapter.position.desc(), Chapter.id.desc())
+            .limit(settings.GENERATION_CONTEXT_CHAPTERS)
+        )
+        recent = list(result.scalars().all())
+        # Positions may have gaps; number the chapters as the reader sees them
+        first = await self.count_chapters_before(story_id, (recent[-1].position, recent[-1].id)) if recent else 1
+        for age, chapter in enumerate(reversed(recent)):
+            number = first + age
+            pieces.append({
+                "name": f"chapter:{number}",
+                "kind": "chapter",
+                "priority": 90 - (len(recent) - 1 - age) * 5,
+                "keep": "end",
+                "cacheable": age < len(recent) - settings.GENERATION_VOLATILE_CHAPTERS,
+                "text": f"Chapter {number}: {chapter.title}\n{chapter.content or ''}",
+            })
+        return pieces
+
+    async def _ai_request(self, request: GenerateChapterRequest) -> Dict[str, Any]:
+        # The AI service packs these into the model's token budget by priority
+        context_pieces = await self.build_context_pieces(request.story_id)
+        return {
             "prompt": request.prompt,
-            "context": context,
-            "system_prompt": request.system_prompt or "You are a creative writing assistant continuing a story. Maintain consistency with the existing narrative and characters. Write compelling, original fiction."
+            "story_id": request.story_id,
+            "context_pieces": context_pieces,
+            "system_prompt": request.system_prompt or DEFAULT_SYSTEM_PROMPT,
         }
+
+    async def generate_chapter_with_ai(self, request: GenerateChapterRequest, model: str = "groq", user_id: Optional[str] = None) -> Chapter:
+        """Generate a new chapter using AI service"""
+        # Call AI service with model parameter
+        ai_url = f"{settings.AI_SERVICE_URL}/api/v1/generate?model={model}"  # Internal docker network
+        ai_request = await self._ai_request(request)
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(ai_url, json=ai_request, timeout=60.0)
-                response.raise_for_status()
-                ai_response = response.json()
-                generated_content = ai_response.get("content", "")
+            client = service_clients.get("ai")
+            response = await client.post(
+                ai_url, json=ai_request, headers=_ai_headers(user_id), timeout=settings.AI_GENERATION_TIMEOUT
+            )
+            if response.status_code == 429:
+                raise AIRateLimited(response.headers.get("Retry-After", "1"))
+            response.raise_for_status()
+            ai_response = response.json()
+            generated_content = ai_response.get("content", "")
+        except AIRateLimited:
+            raise
         except Exception as e:
             raise Exception(f"Failed to generate content with AI: {str(e)}")
         
@@ -142,4 +349,92 @@ class ChapterService:
             position=request.position
         )
         
-        return await self.create_chapter(chapter_data)
\ No newline at end of file
+        return await self.create_chapter(chapter_data)
+
+    async def start_streamed_generation(
+        self, request: GenerateChapterRequest, model: str = "groq"
+    ) -> Optional[Tuple[Chapter, Dict[str, Any]]]:
+        """Create an empty chapter to stream into; ``None`` if the story is missing."""
+        if await self.db.get(Story, request.story_id) is None:
+            return None
+        ai_request = await self._ai_request(request)
+        chapter = await self.create_chapter(ChapterCreate(
+            story_id=request.story_id,
+            title=request.title,
+            content="",
+            position=request.position,
+        ))
+        chapter.chapter_metadata = {"generation": {"status": "streaming", "model": model}}
+        await self.db.commit()
+        return chapter, ai_request
+
+    @staticmethod
+    async def _save_generated(chapter_id: str, parts: List[str], status: str, model: str, error: Optional[str] = None) -> Optional[Chapter]:
+        """Write generated text so far; uses its own session so it also runs after the request's is gone."""
+        content = "".join(parts)
+        generation: Dict[str, Any] = {"status": status, "model": model}
+        if error:
+            generation["error"] = error
+        async with database.AsyncSessionLocal() as db:
+            chapter = await db.get(Chapter, chapter_id)
+            if chapter is None:
+                return None
+            word_count = len(content.split())
+            await story_stats.record_change(db, chapter.story_id, chapter.branch_id, words=word_count - (chapter.word_count or 0))
+            chapter.content = content
+            chapter.word_count = word_count
+            chapter.chapter_metadata = {**(chapter.chapter_metadata or {}), "generation": generation}
+            await db.commit()
+            await db.refresh(chapter)
+            return chapter
+
+    @staticmethod
+    async def stream_generation(
+        chapter: Chapter, ai_request: Dict[str, Any], model: str = "groq", user_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Proxy the AI service's token stream as server-sent events.
+
+        Emits a ``chapter`` event with the new chapter's id, then the AI
+        service's ``data`` events as they arrive, then ``complete`` with the
+        saved chapter (or ``error``). Partial text is saved every
+        ``GENERATION_SAVE_INTERVAL`` seconds. If the client goes away, the
+        upstream request is closed with this generator and the partial text
+        is kept with status ``cancelled``.
+        """
+        yield _sse("chapter", {"id": chapter.id, "story_id": chapter.story_id, "position": chapter.position})
+
+        ai_url = f"{settings.AI_SERVICE_URL}/api/v1/generate-stream?model={model}"
+        timeout = httpx.Timeout(settings.AI_GENERATION_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+        parts: List[str] = []
+        status, error = "cancelled", None
+        saved_at = time.monotonic()
+        try:
+            client = service_clients.get("ai")
+            async with client.stream("POST", ai_url, json=ai_request, headers=_ai_headers(user_id), timeout=timeout) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    chunk = json.loads(line[5:])
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    if chunk.get("done"):
+                        break
+                    if not chunk.get("content"):
+                        continue
+                    parts.append(chunk["content"])
+                    yield f"{line}\n\n"
+                    if time.monotonic() - saved_at >= settings.GENERATION_SAVE_INTERVAL:
+                        await ChapterService._save_generated(chapter.id, parts, "streaming", model)
+                        saved_at = time.monotonic()
+            status = "completed"
+        except Exception as e:
+            status, error = "failed", f"Failed to generate content with AI: {str(e)}"
+        finally:
+            # Shielded so a client disconnect cannot cut the final write short.
+            saved = await asyncio.shield(ChapterService._save_generated(chapter.id, parts, status, model, error))
+
+        if error:
+            yield _sse("error", {"detail": error, "chapter_id": chapter.id})
+        elif saved is not None:
+            yield _sse("complete", ChapterResponse.model_validate(saved).model_dump(mode="json"))
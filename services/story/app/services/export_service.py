@@ -0,0 +1,276 @@
+"""Streaming story export.
+
+Chapters are read through a server-side cursor a few rows at a time, and
+each writer turns them into output as they arrive, so memory use depends
+on the largest chapter rather than on the length of the story. EPUB and
+DOCX are zip archives written to an unseekable sink (sizes and checksums go
+in data descriptors after each entry), which is drained after every
+chapter.
+"""
+import html
+import uuid
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db import database
+from app.models.chapter import Chapter
+
+
+@dataclass
+class StoryInfo:
+    id: str
+    title: str
+    description: Optional[str] = None
+    genre: Optional[str] = None
+    author: Optional[str] = None
+
+
+@dataclass
+class ChapterRow:
+    number: int
+    title: str
+    content: str
+
+
+async def iter_chapters(story_id: str, batch_size: Optional[int] = None) -> AsyncIterator[ChapterRow]:
+    """Chapters in order, fetched ``batch_size`` rows at a time.
+
+    Uses its own session: the export body is sent after the request's
+    session has been closed.
+    """
+    stmt = (
+        select(Chapter.title, Chapter.content)
+        .where(Chapter.story_id == story_id)
+        .order_by(Chapter.position)
+        .execution_options(yield_per=batch_size or settings.EXPORT_BATCH_SIZE)
+    )
+    async with database.AsyncSessionLocal() as db:
+        result = await db.stream(stmt)
+        number = 0
+        async for title, content in result:
+            # Positions may have gaps after a move; headings use the chapter number
+            number += 1
+            yield ChapterRow(number=number, title=title, content=content or "")
+
+
+def _paragraphs(text: str) -> Iterable[str]:
+    for block in text.replace("\r\n", "\n").split("\n\n"):
+        block = block.strip()
+        if block:
+            yield block
+
+
+async def write_markdown(story: StoryInfo, chapters: AsyncIterator[ChapterRow]) -> AsyncIterator[bytes]:
+    yield f"# {story.title}\n".encode()
+    if story.description:
+        yield f"\n{story.description}\n".encode()
+    async for chapter in chapters:
+        yield f"\n## Chapter {chapter.number}: {chapter.title}\n\n{chapter.content}\n".encode()
+
+
+async def write_text(story: StoryInfo, chapters: AsyncIterator[ChapterRow]) -> AsyncIterator[bytes]:
+    yield f"{story.title}\n{'=' * len(story.title)}\n".encode()
+    if story.description:
+        yield f"\n{story.description}\n".encode()
+    async for chapter in chapters:
+        heading = f"Chapter {chapter.number}: {chapter.title}"
+        yield f"\n\n{heading}\n{'-' * len(heading)}\n\n{chapter.content}\n".encode()
+
+
+class _Sink:
+    """Write-only, unseekable file object that hands its bytes out on demand."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _zip() -> Tuple[zipfile.ZipFile, _Sink]:
+    sink = _Sink()
+    return zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED), sink  # type: ignore[arg-type]
+
+
+def _xhtml_paragraph(text: str) -> str:
+    return "<p>" + html.escape(text).replace("\n", "<br/>") + "</p>\n"
+
+
+_EPUB_CONTAINER = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>
+</container>
+"""
+
+
+_EPUB_PAGE_END = "</body>\n</html>\n"
+
+
+def _epub_page_start(title: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE html>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">\n'
+        f'<head><meta charset="utf-8"/><title>{html.escape(title)}</title></head>\n<body>\n'
+    )
+
+
+def _epub_page(title: str, body: str) -> str:
+    return _epub_page_start(title) + body + _EPUB_PAGE_END
+
+
+async def write_epub(story: StoryInfo, chapters: AsyncIterator[ChapterRow]) -> AsyncIterator[bytes]:
+    """EPUB 3. The package document and table of contents go last, since
+    only then are all chapters known; only their titles are kept."""
+    archive, sink = _zip()
+    archive.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+    archive.writestr("META-INF/container.xml", _EPUB_CONTAINER)
+
+    title = html.escape(story.title)
+    intro = f"<h1>{title}</h1>\n" + "".join(_xhtml_paragraph(p) for p in _paragraphs(story.description or ""))
+    archive.writestr("OEBPS/title.xhtml", _epub_page(story.title, intro))
+    yield sink.drain()
+
+    toc: List[Tuple[str, str]] = []
+    async for chapter in chapters:
+        name = f"chapter-{len(toc) + 1:05d}.xhtml"
+        heading = f"Chapter {chapter.number}: {chapter.title}"
+        with archive.open(f"OEBPS/{name}", "w") as entry:
+            entry.write(f"{_epub_page_start(heading)}<h2>{html.escape(heading)}</h2>\n".encode())
+            for paragraph in _paragraphs(chapter.content):
+                entry.write(_xhtml_paragraph(paragraph).encode())
+            entry.write(_EPUB_PAGE_END.encode())
+        toc.append((name, heading))
+        yield sink.drain()
+
+    nav = "".join(f'<li><a href="{name}">{html.escape(heading)}</a></li>\n' for name, heading in toc)
+    archive.writestr(
+        "OEBPS/nav.xhtml",
+        _epub_page("Contents", f'<nav epub:type="toc"><h1>Contents</h1>\n<ol>\n{nav}</ol></nav>\n'),
+    )
+    manifest = "".join(
+        f'<item id="c{i}" href="{name}" media-type="application/xhtml+xml"/>\n' for i, (name, _) in enumerate(toc, 1)
+    )
+    spine = "".join(f'<itemref idref="c{i}"/>\n' for i in range(1, len(toc) + 1))
+    modified = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    archive.writestr(
+        "OEBPS/content.opf",
+        f"""<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">
+<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+<dc:identifier id="book-id">urn:uuid:{uuid.uuid5(uuid.NAMESPACE_URL, story.id)}</dc:identifier>
+<dc:title>{title}</dc:title>
+<dc:language>en</dc:language>
+{f"<dc:creator>{html.escape(story.author)}</dc:creator>" if story.author else ""}
+<meta property="dcterms:modified">{modified}</meta>
+</metadata>
+<manifest>
+<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+<item id="title" href="title.xhtml" media-type="application/xhtml+xml"/>
+{manifest}</manifest>
+<spine>
+<itemref idref="title"/>
+{spine}</spine>
+</package>
+""",
+    )
+    archive.close()
+    yield sink.drain()
+
+
+_DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>
+</Types>
+"""
+
+_DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>
+"""
+
+_DOCX_DOCUMENT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>
+"""
+
+_DOCX_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:pPr><w:spacing w:after="160"/></w:pPr></w:style>
+<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/><w:rPr><w:b/><w:sz w:val="56"/></w:rPr></w:style>
+<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/><w:pPr><w:pageBreakBefore/><w:outlineLvl w:val="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="36"/></w:rPr></w:style>
+</w:styles>
+"""
+
+
+def _docx_paragraph(text: str, style: Optional[str] = None) -> str:
+    props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    lines = html.escape(text, quote=False).split("\n")
+    runs = "<w:br/>".join(f'<w:t xml:space="preserve">{line}</w:t>' for line in lines)
+    return f"<w:p>{props}<w:r>{runs}</w:r></w:p>\n"
+
+
+async def write_docx(story: StoryInfo, chapters: AsyncIterator[ChapterRow]) -> AsyncIterator[bytes]:
+    """WordprocessingML; ``word/document.xml`` stays open while chapters are appended."""
+    archive, sink = _zip()
+    archive.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+    archive.writestr("_rels/.rels", _DOCX_RELS)
+    archive.writestr("word/_rels/document.xml.rels", _DOCX_DOCUMENT_RELS)
+    archive.writestr("word/styles.xml", _DOCX_STYLES)
+
+    with archive.open("word/document.xml", "w") as document:
+        document.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>\n'
+        )
+        document.write(_docx_paragraph(story.title, "Title").encode())
+        for paragraph in _paragraphs(story.description or ""):
+            document.write(_docx_paragraph(paragraph).encode())
+        yield sink.drain()
+
+        async for chapter in chapters:
+            document.write(_docx_paragraph(f"Chapter {chapter.number}: {chapter.title}", "Heading1").encode())
+            for paragraph in _paragraphs(chapter.content):
+                document.write(_docx_paragraph(paragraph).encode())
+            yield sink.drain()
+
+        document.write(b"<w:sectPr/></w:body></w:document>\n")
+    archive.close()
+    yield sink.drain()
+
+
+Writer = Callable[[StoryInfo, AsyncIterator[ChapterRow]], AsyncIterator[bytes]]
+
+# format -> (media type, file extension, writer)
+EXPORT_FORMATS: Dict[str, Tuple[str, str, Writer]] = {
+    "markdown": ("text/markdown; charset=utf-8", "md", write_markdown),
+    "text": ("text/plain; charset=utf-8", "txt", write_text),
+    "epub": ("application/epub+zip", "epub", write_epub),
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "docx", write_docx),
+}
+
+
+async def stream_export(story: StoryInfo, fmt: str) -> AsyncIterator[bytes]:
+    """Encoded export of ``story`` in ``fmt``, chunk by chunk."""
+    _, _, writer = EXPORT_FORMATS[fmt]
+    async for chunk in writer(story, iter_chapters(story.id)):
+        if chunk:
+            yield chunk
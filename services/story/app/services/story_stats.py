@@ -0,0 +1,86 @@
+"""Chapter aggregates on stories and branches.
+
+``chapter_count``, ``word_count`` and ``last_modified_at`` are adjusted by
+relative UPDATEs in the same transaction as the chapter write that changes
+them, so reading them never touches the chapters table. ``reconcile``
+recounts from the chapters and repairs any row that has drifted.
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.branch import Branch
+from app.models.chapter import Chapter
+from app.models.story import Story
+
+
+async def record_change(
+    db: AsyncSession, story_id: str, branch_id: Optional[str], chapters: int = 0, words: int = 0
+) -> None:
+    """Add a chapter write to the story's and its branch's aggregates; does not commit."""
+    for model, key in ((Story, story_id), (Branch, branch_id)):
+        if key is None:
+            continue
+        await db.execute(
+            update(model)
+            .where(model.id == key)
+            .values(
+                chapter_count=model.chapter_count + chapters,
+                word_count=model.word_count + words,
+                last_modified_at=func.now(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def record_merge(db: AsyncSession, story_id: str, branch_id: str, parent_id: str) -> None:
+    """Move a branch's aggregates to its parent; call before its chapters are moved."""
+    result = await db.execute(
+        select(func.count(), func.coalesce(func.sum(Chapter.word_count), 0)).where(Chapter.branch_id == branch_id)
+    )
+    chapters, words = result.one()
+    await record_change(db, story_id, branch_id, -chapters, -words)
+    await record_change(db, story_id, parent_id, chapters, words)
+
+
+def _counts(key):
+    return (
+        select(func.count()).where(key).scalar_subquery(),
+        select(func.coalesce(func.sum(Chapter.word_count), 0)).where(key).scalar_subquery(),
+    )
+
+
+async def reconcile(db: AsyncSession, story_id: str) -> List[Dict[str, Any]]:
+    """Recount a story's aggregates and repair the rows that drifted.
+
+    Returns one entry per repaired row with the stored and actual values.
+    """
+    drift: List[Dict[str, Any]] = []
+    rows = (
+        (Story, Story.id == story_id, Chapter.story_id == Story.id),
+        (Branch, Branch.story_id == story_id, Chapter.branch_id == Branch.id),
+    )
+    for model, where, key in rows:
+        chapters, words = _counts(key)
+        result = await db.execute(
+            select(model.id, model.chapter_count, model.word_count, chapters, words)
+            .where(where)
+            .where((model.chapter_count != chapters) | (model.word_count != words))
+        )
+        for row_id, stored_chapters, stored_words, actual_chapters, actual_words in result.all():
+            drift.append({
+                "story_id": story_id,
+                "branch_id": row_id if model is Branch else None,
+                "chapter_count": {"stored": stored_chapters, "actual": actual_chapters},
+                "word_count": {"stored": stored_words, "actual": actual_words},
+            })
+            # Recount in the UPDATE itself so writes since the check are not lost
+            await db.execute(
+                update(model)
+                .where(model.id == row_id)
+                .values(chapter_count=chapters, word_count=words)
+                .execution_options(synchronize_session=False)
+            )
+    await db.commit()
+    return drift
@@ -2,12 +2,12 @@ import pytest
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 from app.db import database as db
 from app.models.branch import Branch
 from app.models.user import User
 from app.models.chapter import Chapter
-from app.main import app
 
 @pytest.fixture
 async def test_app(monkeypatch):
@@ -121,3 +121,26 @@ async def test_branch_merge(test_app):
         assert len(chapters) == 1
         assert chapters[0].branch_id == main_branch_id
         assert chapters[0].version == 2
+
+
+@pytest.mark.asyncio
+async def test_branches_fork_from_main_unless_a_parent_is_given(test_app):
+    app, SessionLocal = test_app
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        story_id = (await ac.post("/api/v1/stories/", json={"title": "My Story"})).json()["id"]
+        main_id = (await ac.get(f"/api/v1/branches/story/{story_id}")).json()[0]["id"]
+
+        side = (await ac.post("/api/v1/branches/", json={"story_id": story_id, "name": "side"})).json()
+        nested = (await ac.post(
+            "/api/v1/branches/", json={"story_id": story_id, "name": "nested", "parent_branch_id": side["id"]},
+        )).json()
+
+    assert side["parent_branch_id"] == main_id
+    assert nested["parent_branch_id"] == side["id"]
+
+    # child_branches follows parent_branch_id, not merged_into_id
+    async with SessionLocal() as session:
+        result = await session.execute(
+            select(Branch).where(Branch.id == side["id"]).options(selectinload(Branch.child_branches))
+        )
+        assert [child.id for child in result.scalar_one().child_branches] == [nested["id"]]
@@ -0,0 +1,116 @@
+import io
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.db import database as db
+from app.models.user import User
+
+@pytest.fixture
+async def test_app(monkeypatch):
+    test_engine = create_async_engine("sqlite+aiosqlite:///:memory:", future=True)
+    TestSessionLocal = async_sessionmaker(test_engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def override_get_db():
+        async with TestSessionLocal() as session:
+            yield session
+
+    import app.main as app_main
+    monkeypatch.setattr(db, "engine", test_engine, raising=False)
+    monkeypatch.setattr(db, "AsyncSessionLocal", TestSessionLocal, raising=False)
+    monkeypatch.setattr(app_main, "engine", test_engine, raising=False)
+    app_main.app.dependency_overrides[db.get_db] = override_get_db
+
+    from app.core import security
+    app_main.app.dependency_overrides[security.get_current_user] = lambda: "user1"
+
+    async with test_engine.begin() as conn:
+        await conn.run_sync(db.Base.metadata.create_all)
+        await conn.execute(User.__table__.insert().values(id="user1"))
+
+    yield app_main.app, TestSessionLocal
+
+    app_main.app.dependency_overrides.clear()
+    await test_engine.dispose()
+
+
+async def _create_story(app):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.post("/api/v1/stories/", json={"title": "My Story", "genre": "fantasy", "description": "desc"})
+    return resp.json()["id"]
+
+
+async def _add_chapters(app, story_id, count):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        for position in range(1, count + 1):
+            await ac.post(
+                "/api/v1/chapters/",
+                json={
+                    "story_id": story_id,
+                    "title": f"Part {position} & more",
+                    "content": f"First paragraph of {position}.\n\nSecond <paragraph>.",
+                    "position": position,
+                },
+            )
+
+
+@pytest.mark.asyncio
+async def test_export_markdown_streams_chapters_in_order(test_app, monkeypatch):
+    from app.core.config import settings
+
+    app, _ = test_app
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    story_id = await _create_story(app)
+    await _add_chapters(app, story_id, 5)
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.get(f"/api/v1/stories/{story_id}/export")
+        text = await ac.get(f"/api/v1/stories/{story_id}/export", params={"format": "text"})
+        invalid = await ac.get(f"/api/v1/stories/{story_id}/export", params={"format": "pdf"})
+        missing = await ac.get("/api/v1/stories/nope/export")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/markdown")
+    assert resp.headers["content-disposition"] == "attachment; filename=My_Story.md"
+    assert resp.text.startswith("# My Story\n\ndesc\n\n## Chapter 1: Part 1 & more\n\nFirst paragraph of 1.")
+    assert [line for line in resp.text.split("\n") if line.startswith("## ")] == [
+        f"## Chapter {n}: Part {n} & more" for n in range(1, 6)
+    ]
+    assert text.text.startswith("My Story\n========\n")
+    assert invalid.status_code == 422
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_export_epub_and_docx_are_valid_archives(test_app):
+    app, _ = test_app
+    story_id = await _create_story(app)
+    await _add_chapters(app, story_id, 3)
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        epub = await ac.get(f"/api/v1/stories/{story_id}/export", params={"format": "epub"})
+        docx = await ac.get(f"/api/v1/stories/{story_id}/export", params={"format": "docx"})
+
+    assert epub.headers["content-type"] == "application/epub+zip"
+    with zipfile.ZipFile(io.BytesIO(epub.content)) as archive:
+        assert archive.testzip() is None
+        names = archive.namelist()
+        assert names[0] == "mimetype"
+        assert archive.read("mimetype") == b"application/epub+zip"
+        assert [n for n in names if n.startswith("OEBPS/chapter-")] == [f"OEBPS/chapter-{i:05d}.xhtml" for i in (1, 2, 3)]
+        for name in names:
+            if name.endswith((".xhtml", ".opf", ".xml")):
+                ElementTree.fromstring(archive.read(name))
+        assert b"Second &lt;paragraph&gt;." in archive.read("OEBPS/chapter-00002.xhtml")
+
+    with zipfile.ZipFile(io.BytesIO(docx.content)) as archive:
+        assert archive.testzip() is None
+        document = ElementTree.fromstring(archive.read("word/document.xml"))
+        ns = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
+        texts = ["".join(t.text or "" for t in p.iterfind(".//w:t", ns)) for p in document.iterfind(".//w:p", ns)]
+        assert texts[0] == "My Story"
+        assert "Chapter 3: Part 3 & more" in texts
+        assert texts.count("Second <paragraph>.") == 3
@@ -0,0 +1,186 @@
+"""Query-plan regression tests.
+
+The hot endpoints run against a seeded database while every SELECT and
+UPDATE they issue is recorded; each one is then EXPLAINed and the test
+fails if a hot table is read by a full scan or sorted without an index.
+Runs on SQLite; set STORY_TEST_POSTGRES_URL (postgresql+asyncpg://...) to
+run the same checks against Postgres.
+"""
+import json
+import os
+import uuid
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.db import database as db
+from app.models.branch import Branch
+from app.models.chapter import Chapter
+from app.models.character import Character
+from app.models.story import Story
+from app.models.user import User
+
+HOT_TABLES = ("chapters", "stories", "branches", "characters")
+
+BACKENDS = ["sqlite+aiosqlite:///:memory:"]
+if os.environ.get("STORY_TEST_POSTGRES_URL"):
+    BACKENDS.append(os.environ["STORY_TEST_POSTGRES_URL"])
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda url: url.split(":", 1)[0])
+async def seeded(request, monkeypatch):
+    engine = create_async_engine(request.param, future=True)
+    SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def override_get_db():
+        async with SessionLocal() as session:
+            yield session
+
+    import app.main as app_main
+    monkeypatch.setattr(db, "engine", engine, raising=False)
+    monkeypatch.setattr(db, "AsyncSessionLocal", SessionLocal, raising=False)
+    monkeypatch.setattr(app_main, "engine", engine, raising=False)
+    app_main.app.dependency_overrides[db.get_db] = override_get_db
+
+    from app.core import security
+    app_main.app.dependency_overrides[security.get_current_user] = lambda: "user0"
+
+    stories = []
+    async with engine.begin() as conn:
+        await conn.run_sync(db.Base.metadata.drop_all)
+        await conn.run_sync(db.Base.metadata.create_all)
+        await conn.execute(User.__table__.insert(), [{"id": f"user{u}"} for u in range(20)])
+        for s in range(200):
+            story_id, branch_id = str(uuid.uuid4()), str(uuid.uuid4())
+            stories.append((story_id, branch_id))
+            await conn.execute(Story.__table__.insert().values(id=story_id, title=f"Story {s}", user_id=f"user{s % 20}"))
+            await conn.execute(Branch.__table__.insert().values(id=branch_id, story_id=story_id, name="main", is_main=True))
+            await conn.execute(Character.__table__.insert(), [
+                {"id": str(uuid.uuid4()), "story_id": story_id, "name": f"Character {c}"} for c in range(3)
+            ])
+            await conn.execute(Chapter.__table__.insert(), [
+                {"id": str(uuid.uuid4()), "story_id": story_id, "branch_id": branch_id, "title": f"Chapter {p}",
+                 "content": "text", "position": p, "word_count": 1}
+                for p in range(1, 21)
+            ])
+        if engine.dialect.name == "sqlite":
+            await conn.exec_driver_sql("ANALYZE")
+        else:
+            for table in HOT_TABLES:
+                await conn.exec_driver_sql(f"ANALYZE {table}")
+
+    yield app_main.app, engine, stories
+
+    app_main.app.dependency_overrides.clear()
+    if engine.dialect.name != "sqlite":
+        async with engine.begin() as conn:
+            await conn.run_sync(db.Base.metadata.drop_all)
+    await engine.dispose()
+
+
+def _record(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE")) and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    return statements, lambda: event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _sqlite_problems(rows):
+    problems = []
+    for row in rows:
+        detail = row[-1]
+        table = detail.split()[1] if detail.startswith(("SCAN", "SEARCH")) else None
+        if table in HOT_TABLES and (detail.startswith("SCAN") or " USING " not in detail):
+            problems.append(detail)
+        if "TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def _postgres_problems(plan):
+    problems = []
+
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in HOT_TABLES:
+            problems.append(f"Seq Scan on {node['Relation Name']}")
+        if node.get("Node Type") == "Sort":
+            problems.append(f"Sort on {node.get('Sort Key')}")
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return problems
+
+
+async def _explain(engine, statements):
+    failures = []
+    async with engine.connect() as conn:
+        if engine.dialect.name != "sqlite":
+            # Tiny seeded tables make a scan cheapest; ask whether an index can serve the query at all.
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+            await conn.exec_driver_sql("SET enable_sort = off")
+        for statement, parameters in statements:
+            if not any(table in statement for table in HOT_TABLES):
+                continue
+            if engine.dialect.name == "sqlite":
+                rows = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)).all()
+                problems = _sqlite_problems(rows)
+            else:
+                raw = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)).scalar()
+                problems = _postgres_problems(json.loads(raw) if isinstance(raw, str) else raw)
+            if problems:
+                failures.append(f"{' '.join(statement.split())}\n  -> {problems}")
+    return failures
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_use_indexes(seeded, monkeypatch):
+    app, engine, stories = seeded
+    story_id, _ = stories[0]
+
+    class FakeResponse:
+        status_code = 200
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"content": "AI text"}
+
+    class FakeClient:
+        async def post(self, url, json=None, headers=None, timeout=None):
+            return FakeResponse()
+
+    from app.http_client import service_clients
+    monkeypatch.setattr(service_clients, "get", lambda upstream: FakeClient())
+
+    statements, stop = _record(engine)
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            assert (await ac.get("/api/v1/stories/", params={"limit": 5})).status_code == 200
+            assert (await ac.get(f"/api/v1/stories/{story_id}")).status_code == 200
+            assert (await ac.get(f"/api/v1/stories/{story_id}/stats")).status_code == 200
+            assert (await ac.get(f"/api/v1/chapters/story/{story_id}", params={"view": "summary", "limit": 10})).status_code == 200
+            assert (await ac.get(f"/api/v1/chapters/story/{story_id}", params={"after": 10})).status_code == 200
+            assert (await ac.post("/api/v1/chapters/", json={"story_id": story_id, "title": "Next", "content": "x"})).status_code == 200
+            assert (await ac.post("/api/v1/chapters/generate", json={"story_id": story_id, "title": "AI", "prompt": "Go"})).status_code == 200
+            listing = (await ac.get(f"/api/v1/chapters/story/{story_id}", params={"view": "summary", "limit": 3})).json()
+            assert (await ac.post(f"/api/v1/chapters/{listing[0]['id']}/move", json={"after_id": listing[2]["id"]})).status_code == 200
+            assert (await ac.put(f"/api/v1/chapters/story/{story_id}/reorder", json={listing[1]["id"]: 2, listing[0]["id"]: 1})).status_code == 200
+            assert (await ac.get(f"/api/v1/branches/story/{story_id}")).status_code == 200
+            child = await ac.post("/api/v1/branches/", json={"story_id": story_id, "name": "alt"})
+            assert child.status_code == 200
+            assert (await ac.post(f"/api/v1/branches/{child.json()['id']}/merge")).status_code == 200
+            assert (await ac.post(f"/api/v1/stories/{story_id}/stats/reconcile")).status_code == 200
+    finally:
+        stop()
+
+    assert statements, "no queries were recorded"
+    failures = await _explain(engine, statements)
+    assert not failures, "queries not served by an index:\n" + "\n".join(failures)
@@ -1,13 +1,12 @@
 import pytest
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy import select
+from sqlalchemy import event, select
 
 from app.db import database as db
 from app.models.branch import Branch
 from app.models.chapter import Chapter
 from app.models.user import User
-from app.main import app
 
 @pytest.fixture
 async def test_app(monkeypatch):
@@ -25,6 +24,9 @@ async def test_app(monkeypatch):
     monkeypatch.setattr(app_main, "engine", test_engine, raising=False)
     app_main.app.dependency_overrides[db.get_db] = override_get_db
 
+    from app.core import security
+    app_main.app.dependency_overrides[security.get_current_user] = lambda: "user1"
+
     async with test_engine.begin() as conn:
         await conn.run_sync(db.Base.metadata.create_all)
         await conn.execute(User.__table__.insert().values(id="user1"))
@@ -76,10 +78,15 @@ async def test_generate_chapter(test_app, monkeypatch):
         def json(self):
             return self._data
 
-    async def fake_post(self, url, json=None, timeout=None):
-        return FakeResponse({"content": "AI generated content"})
+    sent_headers = {}
+
+    class FakeClient:
+        async def post(self, url, json=None, headers=None, timeout=None):
+            sent_headers.update(headers or {})
+            return FakeResponse({"content": "AI generated content"})
 
-    monkeypatch.setattr("httpx.AsyncClient.post", fake_post)
+    from app.http_client import service_clients
+    monkeypatch.setattr(service_clients, "get", lambda upstream: FakeClient())
 
     async with AsyncClient(app=app, base_url="http://test") as ac:
         resp = await ac.post(
@@ -95,9 +102,242 @@ async def test_generate_chapter(test_app, monkeypatch):
     data = resp.json()
     assert data["title"] == "Chapter 1"
     assert data["content"] == "AI generated content"
+    assert sent_headers == {"X-User-Id": "user1"}
 
     async with SessionLocal() as session:
         result = await session.execute(select(Chapter).where(Chapter.story_id == story_id))
         chapters = result.scalars().all()
         assert len(chapters) == 1
         assert chapters[0].title == "Chapter 1"
+
+
+class FakeStream:
+    def __init__(self, chunks, gate=None):
+        self.chunks = chunks
+        self.gate = gate
+        self.closed = False
+        self.request = None
+
+    def stream(self, method, url, json=None, headers=None, timeout=None):
+        self.request = (method, url, json)
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    def raise_for_status(self):
+        pass
+
+    async def aiter_lines(self):
+        import json as jsonlib
+        for i, chunk in enumerate(self.chunks):
+            if self.gate is not None and i == 1:
+                await self.gate.wait()
+            yield "data: " + jsonlib.dumps({"content": chunk, "done": False})
+            yield ""
+        yield "data: " + jsonlib.dumps({"content": "", "done": True})
+
+
+async def _create_story(app):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.post("/api/v1/stories/", json={"title": "My Story", "genre": "fantasy", "description": "desc"})
+    return resp.json()["id"]
+
+
+@pytest.mark.asyncio
+async def test_generate_chapter_stream(test_app, monkeypatch):
+    app, SessionLocal = test_app
+    story_id = await _create_story(app)
+
+    upstream = FakeStream(["Once ", "upon ", "a time."])
+    from app.http_client import service_clients
+    monkeypatch.setattr(service_clients, "get", lambda upstream_name: upstream)
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.post(
+            "/api/v1/chapters/generate-stream",
+            params={"model": "claude"},
+            json={"story_id": story_id, "title": "Chapter 1", "prompt": "Start"},
+        )
+        missing = await ac.post(
+            "/api/v1/chapters/generate-stream",
+            json={"story_id": "nope", "title": "Chapter 1", "prompt": "Start"},
+        )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in resp.text.split("\n\n") if block]
+    assert events[0].startswith("event: chapter")
+    assert [e for e in events if e.startswith("data:")] == [
+        'data: {"content": "Once ", "done": false}',
+        'data: {"content": "upon ", "done": false}',
+        'data: {"content": "a time.", "done": false}',
+    ]
+    assert events[-1].startswith("event: complete")
+    assert upstream.request[1].endswith("/api/v1/generate-stream?model=claude")
+    assert missing.status_code == 404
+
+    async with SessionLocal() as session:
+        chapter = (await session.execute(select(Chapter).where(Chapter.story_id == story_id))).scalar_one()
+    assert chapter.content == "Once upon a time."
+    assert chapter.word_count == 4
+    assert chapter.chapter_metadata["generation"] == {"status": "completed", "model": "claude"}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_stream_closes_upstream_and_keeps_partial_text(test_app, monkeypatch):
+    import asyncio
+    from app.schemas.chapter import GenerateChapterRequest
+    from app.services.chapter_service import ChapterService
+    from app.http_client import service_clients
+
+    app, SessionLocal = test_app
+    story_id = await _create_story(app)
+    upstream = FakeStream(["Partial ", "never sent"], gate=asyncio.Event())
+    monkeypatch.setattr(service_clients, "get", lambda upstream_name: upstream)
+
+    async with SessionLocal() as session:
+        service = ChapterService(session)
+        chapter, ai_request = await service.start_streamed_generation(
+            GenerateChapterRequest(story_id=story_id, title="Draft", prompt="Go")
+        )
+    events = service.stream_generation(chapter, ai_request)
+    assert (await events.__anext__()).startswith("event: chapter")
+    assert "Partial" in await events.__anext__()
+    await events.aclose()  # what the server does when the client disconnects
+
+    assert upstream.closed
+    async with SessionLocal() as session:
+        saved = await session.get(Chapter, chapter.id)
+    assert saved.content == "Partial "
+    assert saved.chapter_metadata["generation"]["status"] == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_chapter_listing_summary_paging_and_etag(test_app):
+    app, _ = test_app
+    story_id = await _create_story(app)
+    url = f"/api/v1/chapters/story/{story_id}"
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        for position in range(1, 6):
+            await ac.post("/api/v1/chapters/", json={
+                "story_id": story_id, "title": f"Chapter {position}", "content": "word " * position, "position": position,
+            })
+
+        full = await ac.get(url)
+        first = await ac.get(url, params={"view": "summary", "limit": 2})
+        second = await ac.get(url, params={"view": "summary", "limit": 2, "after": first.headers["X-Next-Cursor"]})
+        unchanged = await ac.get(url, params={"view": "summary", "limit": 2}, headers={"If-None-Match": first.headers["ETag"]})
+
+        chapter_id = first.json()[0]["id"]
+        await ac.put(f"/api/v1/chapters/{chapter_id}", json={"content": "body only, same summary?"})
+        # Content is not part of the summary listing, but word count is
+        changed = await ac.get(url, params={"view": "summary", "limit": 2}, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert len(full.json()) == 5 and "content" in full.json()[0]
+    assert "X-Next-Cursor" not in full.headers
+    assert [c["position"] for c in first.json()] == [1, 2]
+    assert "content" not in first.json()[0]
+    assert [c["position"] for c in second.json()] == [3, 4]
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == first.headers["ETag"]
+    assert changed.status_code == 200
+    assert changed.json()[0]["word_count"] == 4
+    assert [c["number"] for c in second.json()] == [3, 4]
+
+
+
+@pytest.mark.asyncio
+async def test_chapter_listing_pages_through_shared_positions(test_app):
+    app, _ = test_app
+    story_id = await _create_story(app)
+    url = f"/api/v1/chapters/story/{story_id}"
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        for index in range(5):
+            await ac.post("/api/v1/chapters/", json={
+                "story_id": story_id, "title": f"Chapter {index}", "content": "word", "position": 1 if index < 3 else 2,
+            })
+
+        full = [c["id"] for c in (await ac.get(url, params={"view": "summary"})).json()]
+        paged, after = [], None
+        while True:
+            params = {"view": "summary", "limit": 2, **({"after": after} if after else {})}
+            page = await ac.get(url, params=params)
+            paged += [c["id"] for c in page.json()]
+            numbers = [c["number"] for c in page.json()]
+            assert numbers == list(range(len(paged) - len(numbers) + 1, len(paged) + 1))
+            after = page.headers.get("X-Next-Cursor")
+            if after is None:
+                break
+        bad = await ac.get(url, params={"after": "one"})
+
+    assert len(full) == 5 and paged == full
+    assert bad.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_reorder_is_one_statement_and_move_touches_one_row(test_app):
+    app, _ = test_app
+    story_id = await _create_story(app)
+    url = f"/api/v1/chapters/story/{story_id}"
+
+    updates = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            updates.append(statement)
+
+    event.listen(db.engine.sync_engine, "before_cursor_execute", record)
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            ids = []
+            for position in range(1, 5):
+                resp = await ac.post("/api/v1/chapters/", json={
+                    "story_id": story_id, "title": f"Part {position}", "content": "x", "position": position,
+                })
+                ids.append(resp.json()["id"])
+
+            updates.clear()
+            spaced = {chapter_id: (i + 1) * 100 for i, chapter_id in enumerate(reversed(ids))}
+            assert (await ac.put(f"{url}/reorder", json=spaced)).status_code == 200
+            reorder_updates = list(updates)
+
+            # ids[3]=100, ids[2]=200, ids[1]=300, ids[0]=400: move ids[0] between the first two
+            updates.clear()
+            moved = await ac.post(f"/api/v1/chapters/{ids[0]}/move", json={"after_id": ids[3]})
+            move_updates = list(updates)
+
+            # Moving into the same slot halves the gap each time until it is used up and the story is renumbered
+            updates.clear()
+            squeezed = await ac.post(f"/api/v1/chapters/{ids[1]}/move", json={"after_id": ids[3]})
+            await ac.post(f"/api/v1/chapters/{ids[2]}/move", json={"after_id": ids[3]})
+            await ac.post(f"/api/v1/chapters/{ids[1]}/move", json={"after_id": ids[3]})
+            await ac.post(f"/api/v1/chapters/{ids[2]}/move", json={"after_id": ids[3]})
+            await ac.post(f"/api/v1/chapters/{ids[1]}/move", json={"after_id": ids[3]})
+            await ac.post(f"/api/v1/chapters/{ids[2]}/move", json={"after_id": ids[3]})
+            await ac.post(f"/api/v1/chapters/{ids[1]}/move", json={"after_id": ids[3]})
+            await ac.post(f"/api/v1/chapters/{ids[2]}/move", json={})
+            listing = await ac.get(url, params={"view": "summary"})
+
+            bad = await ac.post(f"/api/v1/chapters/{ids[0]}/move", json={"after_id": ids[0]})
+            invalid = await ac.put(f"{url}/reorder", json={ids[0]: "first"})
+            fractional = await ac.put(f"{url}/reorder", json={ids[0]: 3.7})
+            after_invalid = await ac.get(url, params={"view": "summary"})
+    finally:
+        event.remove(db.engine.sync_engine, "before_cursor_execute", record)
+
+    assert len(reorder_updates) == 1 and "CASE" in reorder_updates[0]
+    assert moved.status_code == 200 and moved.json()["position"] == 150
+    assert len(move_updates) == 1
+    assert squeezed.json()["position"] == 125
+    assert [c["position"] for c in listing.json()] == [512, 1024, 1536, 4096]
+    assert [c["id"] for c in listing.json()] == [ids[2], ids[3], ids[1], ids[0]]
+    assert [c["number"] for c in listing.json()] == [1, 2, 3, 4]
+    assert bad.status_code == 400
+    assert invalid.status_code == 400
+    assert fractional.status_code == 400
+    assert after_invalid.json() == listing.json()
@@ -0,0 +1,102 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.db import database as db
+from app.models.story import Story
+from app.models.user import User
+
+@pytest.fixture
+async def test_app(monkeypatch):
+    test_engine = create_async_engine("sqlite+aiosqlite:///:memory:", future=True)
+    TestSessionLocal = async_sessionmaker(test_engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def override_get_db():
+        async with TestSessionLocal() as session:
+            yield session
+
+    import app.main as app_main
+    monkeypatch.setattr(db, "engine", test_engine, raising=False)
+    monkeypatch.setattr(db, "AsyncSessionLocal", TestSessionLocal, raising=False)
+    monkeypatch.setattr(app_main, "engine", test_engine, raising=False)
+    app_main.app.dependency_overrides[db.get_db] = override_get_db
+
+    from app.core import security
+    app_main.app.dependency_overrides[security.get_current_user] = lambda: "user1"
+
+    async with test_engine.begin() as conn:
+        await conn.run_sync(db.Base.metadata.create_all)
+        await conn.execute(User.__table__.insert().values(id="user1"))
+
+    yield app_main.app, TestSessionLocal
+
+    app_main.app.dependency_overrides.clear()
+    await test_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_stats_follow_chapter_writes_and_merges(test_app):
+    app, _ = test_app
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        story_id = (await ac.post("/api/v1/stories/", json={"title": "My Story"})).json()["id"]
+        main_id = (await ac.get(f"/api/v1/branches/story/{story_id}")).json()[0]["id"]
+        alt_id = (await ac.post("/api/v1/branches/", json={"story_id": story_id, "name": "alt"})).json()["id"]
+
+        async def add(branch_id, content):
+            resp = await ac.post("/api/v1/chapters/", json={
+                "story_id": story_id, "branch_id": branch_id, "title": "Part", "content": content,
+            })
+            return resp.json()["id"]
+
+        first = await add(main_id, "one two three")
+        second = await add(main_id, "four five")
+        await add(alt_id, "six seven eight nine")
+        await ac.put(f"/api/v1/chapters/{first}", json={"content": "one"})
+        await ac.delete(f"/api/v1/chapters/{second}")
+        before_merge = (await ac.get(f"/api/v1/stories/{story_id}/stats")).json()
+
+        await ac.post(f"/api/v1/branches/{alt_id}/merge")
+        stats = (await ac.get(f"/api/v1/stories/{story_id}/stats")).json()
+        story = (await ac.get(f"/api/v1/stories/{story_id}")).json()
+        clean = (await ac.post(f"/api/v1/stories/{story_id}/stats/reconcile")).json()
+
+    branches = {b["id"]: b for b in before_merge["branches"]}
+    assert (before_merge["chapter_count"], before_merge["word_count"]) == (2, 5)
+    assert (branches[main_id]["chapter_count"], branches[main_id]["word_count"]) == (1, 1)
+    assert (branches[alt_id]["chapter_count"], branches[alt_id]["word_count"]) == (1, 4)
+    assert before_merge["last_modified_at"] is not None
+
+    branches = {b["id"]: b for b in stats["branches"]}
+    assert (stats["chapter_count"], stats["word_count"]) == (2, 5)
+    assert (branches[main_id]["chapter_count"], branches[main_id]["word_count"]) == (2, 5)
+    assert (branches[alt_id]["chapter_count"], branches[alt_id]["word_count"]) == (0, 0)
+    assert (story["chapter_count"], story["word_count"]) == (2, 5)
+    assert clean == {"repaired": []}
+
+
+@pytest.mark.asyncio
+async def test_reconcile_repairs_drift(test_app):
+    app, SessionLocal = test_app
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        story_id = (await ac.post("/api/v1/stories/", json={"title": "My Story"})).json()["id"]
+        await ac.post("/api/v1/chapters/", json={"story_id": story_id, "title": "Part", "content": "a b c"})
+
+        async with SessionLocal() as session:
+            await session.execute(update(Story).where(Story.id == story_id).values(chapter_count=7, word_count=1))
+            await session.commit()
+
+        repaired = (await ac.post(f"/api/v1/stories/{story_id}/stats/reconcile")).json()["repaired"]
+        stats = (await ac.get(f"/api/v1/stories/{story_id}/stats")).json()
+        missing = await ac.get("/api/v1/stories/nope/stats")
+
+    assert repaired == [{
+        "story_id": story_id,
+        "branch_id": None,
+        "chapter_count": {"stored": 7, "actual": 1},
+        "word_count": {"stored": 1, "actual": 3},
+    }]
+    assert (stats["chapter_count"], stats["word_count"]) == (1, 3)
+    assert missing.status_code == 404
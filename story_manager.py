@@ -38,12 +38,6 @@ class StoryManager:
         """Persist story data to disk"""
         self.story_data["metadata"]["last_updated"] = datetime.datetime.now().isoformat()
         
-        # Update word count
-        words = 0
-        for chapter in self.story_data["chapters"]:
-            words += len(chapter["content"].split())
-        self.story_data["metadata"]["word_count"] = words
-        
         with open(os.path.join(self.story_dir, "story.json"), "w") as f:
             json.dump(self.story_data, f, indent=2)
             
@@ -63,6 +57,9 @@ class StoryManager:
             "created_at": datetime.datetime.now().isoformat()
         }
         self.story_data["chapters"].append(chapter)
+        # Keep the running total instead of recounting every chapter on save
+        metadata = self.story_data["metadata"]
+        metadata["word_count"] = metadata.get("word_count", 0) + len(content.split())
         self.save_story()
         
     def update_character(self, name: str, details: Dict[str, Any]) -> None: